@@ -1,10 +1,56 @@
 from django.contrib import admin
-from .models import Customer, Product, Role, Order, OrderItem, Return, User
+from .models import Customer, Product, Role, Order, OrderItem, Return, User, StockMovement, StockSnapshot
+
+
+# The __str__ of these models reads related rows: join them instead of one query per listed row
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_select_related = ('customer',)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_select_related = ('order', 'product')
+
+
+@admin.register(Return)
+class ReturnAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'return_date')
+    list_filter = ('status',)
+    list_select_related = ('order_item__product', 'order_item__order')
+
+
+# Stock changes go through the API, which writes the ledger and bumps the version
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    readonly_fields = ('stock_quantity', 'version')
+
+
+# The ledger is append-only: stock_levels() is rebuilt from these rows
+class LedgerAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(LedgerAdmin):
+    list_display = ('product', 'kind', 'quantity', 'created_at')
+    list_filter = ('kind',)
+    list_select_related = ('product',)
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(LedgerAdmin):
+    list_display = ('product', 'quantity', 'taken_at')
+    list_select_related = ('product',)
+
 
 admin.site.register(Customer)
-admin.site.register(Product)
 admin.site.register(Role)
-admin.site.register(Order)
-admin.site.register(OrderItem)
-admin.site.register(Return)
 admin.site.register(User)
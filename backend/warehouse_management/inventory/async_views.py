@@ -0,0 +1,154 @@
+"""
+Async variants of the read endpoints, for ASGI deployments.
+
+With ``settings.ASYNC_READ_VIEWS`` on, ``urls.py`` routes the GET endpoints
+here instead of ``views.py``. Queries go through Django's async ORM
+(``aiterator``, ``aget``, ``acount``), so a worker keeps serving other
+requests while one waits on the database. Responses are the same bytes as
+the DRF views'.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from . import ledger
+from .cache import cached_response
+from .forecast import MAX_SUGGESTION_LIMIT, SUGGESTION_LIMIT, suggestion_page
+from .filters import CUSTOMER_LIST, MOVEMENT_LIST, ORDER_LIST, PRODUCT_LIST, parse_decimal, parse_int, parse_moment
+from .models import Customer, Order, OrderItem, Product, Return, Role, StockMovement
+from .pagination import ListQuery, ListQueryError
+from .renderers import FastJSONRenderer
+from .scan import alookup
+from .serializers import (
+    CustomerSerializer, OrderItemSerializer, OrdersSerializer, ProductSerializer, ProductStockSerializer,
+    ReturnSerializer, RoleSerializer, StockMovementSerializer,
+)
+from .versioning import etag
+from .stats import LOW_STOCK_THRESHOLD, MAX_REVENUE_DAYS, REVENUE_DAYS, dashboard_stats
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json',
+                        headers=headers)
+
+
+def error_response(message, status=400):
+    return json_response({"error": message}, status=status)
+
+
+async def alist_response(request, queryset, serializer_class, related=(), spec=None):
+    """Async ``pagination.list_response``."""
+    try:
+        query = ListQuery(request.GET, queryset, serializer_class, related, spec)
+    except ListQueryError as exc:
+        return error_response(str(exc))
+    return json_response(await query.apayload(request))
+
+
+@require_GET
+async def get_returns(request):
+    return await alist_response(request, Return.objects.all(), ReturnSerializer)
+
+
+@require_GET
+async def get_OrderItems(request):
+    return await alist_response(request, OrderItem.objects.all(), OrderItemSerializer)
+
+
+@cached_response('customers')
+@require_GET
+async def get_customers(request):
+    return await alist_response(request, Customer.objects.all(), CustomerSerializer, spec=CUSTOMER_LIST)
+
+
+@cached_response('products')
+@require_GET
+async def get_products(request):
+    return await alist_response(request, Product.objects.all(), ProductSerializer, spec=PRODUCT_LIST)
+
+
+@require_GET
+async def get_orders(request):
+    return await alist_response(request, Order.objects.all(), OrdersSerializer, related=['customer'], spec=ORDER_LIST)
+
+
+@require_GET
+async def get_stock(request):
+    try:
+        moment = parse_moment(end=True)(request.GET['at']) if 'at' in request.GET else timezone.now()
+    except ListQueryError as exc:
+        return error_response(str(exc))
+    return await alist_response(request, ledger.stock_levels(moment), ProductStockSerializer, spec=PRODUCT_LIST)
+
+
+@require_GET
+async def get_stock_movements(request):
+    return await alist_response(request, StockMovement.objects.all(), StockMovementSerializer, spec=MOVEMENT_LIST)
+
+
+@require_GET
+async def get_stats(request):
+    try:
+        threshold = parse_decimal(request.GET.get('low_stock', LOW_STOCK_THRESHOLD))
+        days = parse_int(request.GET.get('days', REVENUE_DAYS))
+    except ListQueryError as exc:
+        return error_response(str(exc))
+    days = max(1, min(days, MAX_REVENUE_DAYS))
+    return json_response(await sync_to_async(dashboard_stats)(low_stock_threshold=threshold, days=days))
+
+
+@require_GET
+async def get_reorder_suggestions(request):
+    try:
+        limit = parse_int(request.GET.get('limit', SUGGESTION_LIMIT))
+    except ListQueryError as exc:
+        return error_response(str(exc))
+    return json_response(await sync_to_async(suggestion_page)(max(1, min(limit, MAX_SUGGESTION_LIMIT))))
+
+
+@cached_response('roles')
+@require_GET
+async def get_roles(request):
+    return json_response(RoleSerializer([role async for role in Role.objects.all()], many=True).data)
+
+
+@require_GET
+async def get_product(request, id):
+    try:
+        product = await Product.objects.aget(pk=id)
+    except Product.DoesNotExist:
+        return error_response("Product not found", status=404)
+    return json_response(ProductSerializer(product).data, headers={'ETag': etag(product)})
+
+
+@require_GET
+async def scan_product(request, code):
+    found = (await alookup([code])).get(code)
+    if found is None:
+        return error_response("Product not found", status=404)
+    row, tag = found
+    return json_response(row, headers={'ETag': tag})
+
+
+@require_GET
+async def get_customer(request, id):
+    try:
+        customer = await Customer.objects.aget(pk=id)
+    except Customer.DoesNotExist:
+        return error_response("Customer not found", status=404)
+    data = CustomerSerializer(customer).data
+    data['orders'] = await customer.order_set.acount()
+    return json_response(data)
+
+
+@require_GET
+async def get_order(request, id):
+    try:
+        order = await Order.objects.select_related('customer').aget(pk=id)
+    except Order.DoesNotExist:
+        return error_response("Order not found", status=404)
+    data = OrdersSerializer(order).data
+    items = order.orderitem_set.order_by('pk')
+    data['items'] = OrderItemSerializer([item async for item in items.aiterator()], many=True).data
+    return json_response(data, headers={'ETag': etag(order)})
@@ -0,0 +1,444 @@
+"""
+API benchmark harness used by the ``benchmark_api``,
+``benchmark_serializers`` and ``benchmark_connections`` commands.
+
+For each scale the database is seeded with synthetic data (see
+``seeding.py``) inside a transaction that is rolled back at the end, so
+the benchmark leaves no rows behind. Every named route in ``urls.py`` has
+a request plan below; routes without one are reported, so new endpoints
+don't silently escape the benchmark. Each request is timed through the
+Django test client, with its query count and, in a separate untimed run,
+its peak Python memory allocation (tracemalloc).
+
+Because of that transaction, write routes are measured without their
+commit (no fsync, no binlog or WAL flush), and the row locks they take
+are held until the scale ends rather than released after each request.
+Their numbers compare runs of this harness with each other; they are not
+production write latencies, which ``loadtest`` against a running server
+measures.
+"""
+import itertools
+import json
+import math
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import nullcontext
+from wsgiref.util import setup_testing_defaults
+from collections import namedtuple
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import jobs, scan
+from .identifiers import barcode_serials, sku_serials
+from .fastpath import compile_rows
+from .ledger import stock_levels
+from .middleware import QueryTracker
+from .models import Customer, Job, Order, OrderItem, Product, Return, Role
+from .renderers import FastJSONRenderer
+from .serializers import CustomerSerializer, OrderItemSerializer, OrdersSerializer, ProductSerializer, ProductStockSerializer
+from .seeding import seed
+
+DEFAULT_SCALES = (100, 1000, 10000)
+DEFAULT_REPEAT = 20
+DEFAULT_TOLERANCE = 0.25
+
+Call = namedtuple('Call', 'method url data', defaults=(None,))
+
+
+class Fixtures:
+    """Ids from the seeded data and throwaway rows for requests that consume them."""
+
+    def __init__(self, random_seed=0):
+        self.rng = random.Random(random_seed)
+        self.counter = itertools.count()
+        self.product_ids = list(Product.objects.filter(stock_quantity__gte=100).values_list('id', flat=True)[:1000])
+        self.barcodes = list(Product.objects.exclude(barcode=None).values_list('barcode', flat=True)[:1000])
+        self.customer_ids = list(Customer.objects.values_list('id', flat=True)[:1000])
+        self.customer_emails = list(Customer.objects.values_list('email', flat=True)[:1000])
+        self.order_ids = list(Order.objects.values_list('id', flat=True)[:1000])
+        # Only items of shipped orders can be returned to stock
+        self.order_item_ids = list(OrderItem.objects.filter(order__status='SHIPPED').values_list('id', flat=True)[:1000])
+        self.role_id = (Role.objects.first() or Role.objects.create(role_name="Benchmark")).id
+        self.job_id = None
+
+    def number(self):
+        return next(self.counter)
+
+    def product(self):
+        return self.rng.choice(self.product_ids)
+
+    def product_data(self):
+        return {'name': f"Benchmark product {self.number()}", 'category': 'Benchmark',
+                'price': '19.99', 'stock_quantity': '50.00'}
+
+    def customer_data(self):
+        # Every other row updates a seeded customer
+        number = self.number()
+        email = f"bench-{number}@example.com" if number % 2 else self.rng.choice(self.customer_emails)
+        return {'first_name': f"Bench{number}", 'last_name': "Mark", 'email': email}
+
+    def new_product(self):
+        return Product.objects.create(**self.product_data()).id
+
+    def new_order(self):
+        return Order.objects.create(customer_id=self.rng.choice(self.customer_ids), total=Decimal('0')).id
+
+    def new_orders(self, count):
+        return [self.new_order() for _ in range(count)]
+
+    def new_returns(self, count):
+        return [Return.objects.create(order_item_id=item_id).id
+                for item_id in self.rng.sample(self.order_item_ids, min(count, len(self.order_item_ids)))]
+
+    def cold_barcode(self):
+        # Nothing cached in the process: the lookup goes to the database
+        scan.hot.clear()
+        return self.rng.choice(self.barcodes)
+
+    def cold_barcodes(self, count):
+        scan.hot.clear()
+        return self.rng.sample(self.barcodes, min(count, len(self.barcodes)))
+
+    def new_job(self):
+        return jobs.enqueue('export', {'table': 'products'}).id
+
+    def finished_job(self):
+        # One small export, run in this process, serves every result download
+        if self.job_id is None:
+            job = jobs.enqueue('export', {'table': 'customers', 'fields': 'id,email'})
+            Job.objects.filter(pk=job.pk).update(status='RUNNING', attempts=1)
+            jobs.execute(job.pk)
+            self.job_id = job.pk
+        return self.job_id
+
+    def new_role(self):
+        return Role.objects.create(role_name=f"Benchmark role {self.number()}").id
+
+
+def get(name, query='', **kwargs):
+    return lambda fx: Call('GET', reverse(name, kwargs=kwargs or None) + query)
+
+
+def place_order(fx):
+    number = fx.number()
+    return Call('POST', reverse('add_order'), {
+        'customer': {'first_name': f"Bench{number}", 'last_name': "Mark", 'email': f"bench-{number}@example.com"},
+        'items': [{'product': pk, 'quantity': '1'} for pk in fx.rng.sample(fx.product_ids, 3)],
+    })
+
+
+# label -> (url name, request builder, expected status code)
+PLANS = {
+    'get_products': ('get_products', get('get_products'), 200),
+    'get_products?limit=100': ('get_products', get('get_products', '?limit=100'), 200),
+    'get_products?search': ('get_products', get('get_products', '?search=Product&limit=100'), 200),
+    'scan_product cold': ('scan_product', lambda fx: Call(
+        'GET', reverse('scan_product', kwargs={'code': fx.cold_barcode()})), 200),
+    # The same code every time and a real cache backend (WARM_CACHE_PLANS): served from the scan cache after the warm-up
+    'scan_product warm': ('scan_product', lambda fx: Call('GET', reverse('scan_product', kwargs={'code': fx.barcodes[0]})), 200),
+    'scan_products x100 cold': ('scan_products', lambda fx: Call(
+        'POST', reverse('scan_products'), {'codes': fx.cold_barcodes(100)}), 200),
+    'get_customers': ('get_customers', get('get_customers'), 200),
+    'get_product': ('get_product', lambda fx: Call('GET', reverse('get_product', kwargs={'id': fx.product()})), 200),
+    'get_customer': ('get_customer', lambda fx: Call(
+        'GET', reverse('get_customer', kwargs={'id': fx.rng.choice(fx.customer_ids)})), 200),
+    'get_order': ('get_order', lambda fx: Call('GET', reverse('get_order', kwargs={'id': fx.rng.choice(fx.order_ids)})), 200),
+    'get_orders': ('get_orders', get('get_orders'), 200),
+    'get_orders?status&limit=100': ('get_orders', get('get_orders', '?status=PENDING&limit=100'), 200),
+    'get_returns': ('get_returns', get('get_returns'), 200),
+    'get_orderitems?limit=100': ('get_orderitems', get('get_orderitems', '?limit=100'), 200),
+    'get_stats': ('get_stats', get('get_stats'), 200),
+    'get_reorder_suggestions': ('get_reorder_suggestions', get('get_reorder_suggestions'), 200),
+    'get_stock?limit=100': ('get_stock', get('get_stock', '?limit=100'), 200),
+    'get_stock_movements?limit=100': ('get_stock_movements', get('get_stock_movements', '?limit=100'), 200),
+    'get_roles': ('get_roles', get('get_roles'), 200),
+    'export_table products': ('export_table', get('export_table', table='products'), 200),
+    'export_table orders': ('export_table', get('export_table', table='orders'), 200),
+    'metrics': ('metrics', get('metrics'), 200),
+    'post_product': ('post_product', lambda fx: Call('POST', reverse('post_product'), fx.product_data()), 201),
+    'bulk_products x100': ('bulk_products', lambda fx: Call(
+        'POST', reverse('bulk_products'), [fx.product_data() for _ in range(100)]), 201),
+    'add_order': ('add_order', place_order, 201),
+    'bulk_customers x100': ('bulk_customers', lambda fx: Call(
+        'POST', reverse('bulk_customers'), [fx.customer_data() for _ in range(100)]), 201),
+    'update_product': ('update_product', lambda fx: Call(
+        'PUT', reverse('update_product', kwargs={'id': fx.product()}), fx.product_data()), 200),
+    'update_product stock_delta': ('update_product', lambda fx: Call(
+        'PATCH', reverse('update_product', kwargs={'id': fx.product()}), {'stock_delta': '-1'}), 200),
+    'delete_product': ('delete_product', lambda fx: Call(
+        'DELETE', reverse('delete_product', kwargs={'id': fx.new_product()})), 204),
+    'update_customer': ('update_customer', lambda fx: Call(
+        'PATCH', reverse('update_customer', kwargs={'id': fx.rng.choice(fx.customer_ids)}),
+        {'phone': f"+48{fx.number():09d}"}), 200),
+    'update_order': ('update_order', lambda fx: Call(
+        'PUT', reverse('update_order', kwargs={'id': fx.new_order()}), {'status': 'PROCESSING'}), 200),
+    'delete_order': ('delete_order', lambda fx: Call(
+        'DELETE', reverse('delete_order', kwargs={'id': fx.new_order()})), 204),
+    'bulk_order_status x100': ('bulk_order_status', lambda fx: Call(
+        'POST', reverse('bulk_order_status'), {'ids': fx.rng.sample(fx.order_ids, min(100, len(fx.order_ids))), 'status': 'CANCELLED'}), 200),
+    'bulk_delete_orders x100': ('bulk_delete_orders', lambda fx: Call(
+        'DELETE', reverse('bulk_delete_orders'), {'ids': fx.new_orders(100)}), 200),
+    'bulk_return_status x20': ('bulk_return_status', lambda fx: Call(
+        'POST', reverse('bulk_return_status'), {'ids': fx.new_returns(20), 'status': 'APPROVED'}), 200),
+    'create_job export': ('create_job', lambda fx: Call(
+        'POST', reverse('create_job'), {'kind': 'export', 'params': {'table': 'orders', 'format': 'json'}}), 202),
+    'get_job': ('get_job', lambda fx: Call('GET', reverse('get_job', kwargs={'id': fx.new_job()})), 200),
+    'get_job_result': ('get_job_result', lambda fx: Call(
+        'GET', reverse('get_job_result', kwargs={'id': fx.finished_job()})), 200),
+    'create_role': ('create_role', lambda fx: Call(
+        'POST', reverse('create_role'), {'role_name': f"Role {fx.number()}"}), 201),
+    'update_role': ('update_role', lambda fx: Call(
+        'PUT', reverse('update_role', kwargs={'id': fx.role_id}), {'role_name': f"Role {fx.number()}"}), 200),
+    'delete_role': ('delete_role', lambda fx: Call(
+        'DELETE', reverse('delete_role', kwargs={'id': fx.new_role()})), 204),
+}
+
+# Plans measuring a cache hit: they keep a local memory cache even when run() swaps in the dummy one
+WARM_CACHE_PLANS = {'scan_product warm'}
+
+
+def warm_cache():
+    alias = 'benchmark-warm'
+    caches = {**settings.CACHES, alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                         'LOCATION': 'wms-benchmark-warm'}}
+    return override_settings(CACHES=caches, RESPONSE_CACHE_ALIAS=alias)
+
+
+def unplanned_routes():
+    """Names of routes in the root URLconf without a benchmark plan (included URLconfs like admin are skipped)."""
+    planned = {name for name, _, _ in PLANS.values()}
+    return sorted(pattern.name for pattern in get_resolver().url_patterns
+                  if isinstance(pattern, URLPattern) and pattern.name and pattern.name not in planned)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``; shared with the loadtest command."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def send(client, call):
+    response = getattr(client, call.method.lower())(
+        call.url, json.dumps(call.data) if call.data is not None else None, content_type='application/json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    else:
+        response.content
+    return response
+
+
+def measure(client, fixtures, builder, expected_status, repeat):
+    durations, queries, statuses = [], [], []
+    for _ in range(repeat):
+        call = builder(fixtures)
+        tracker = QueryTracker()
+        with connection.execute_wrapper(tracker):
+            start = time.perf_counter()
+            response = send(client, call)
+            durations.append(time.perf_counter() - start)
+        queries.append(tracker.count)
+        statuses.append(response.status_code)
+
+    # tracemalloc slows allocation down, so memory gets its own run
+    call = builder(fixtures)
+    tracemalloc.start()
+    try:
+        send(client, call)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(statistics.median(durations) * 1000, 2),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+        'queries': round(statistics.mean(queries), 1),
+        'peak_kib': round(peak / 1024, 1),
+        'errors': sum(status != expected_status for status in statuses),
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def benchmark_scale(scale, labels, repeat, random_seed=0):
+    """Seed ``scale`` products and orders, run every plan in ``labels``, then roll everything back."""
+    client = Client()
+    results = {}
+    with transaction.atomic():
+        seed(products=scale, customers=max(scale // 10, 1), orders=scale, random_seed=random_seed)
+        fixtures = Fixtures(random_seed)
+        for label in labels:
+            _, builder, expected_status = PLANS[label]
+            with warm_cache() if label in WARM_CACHE_PLANS else nullcontext():
+                send(client, builder(fixtures))  # warm-up
+                results[label] = measure(client, fixtures, builder, expected_status, repeat)
+        transaction.set_rollback(True)
+    # Blocks reserved inside the rolled back transaction are gone; some databases would hand them out again
+    sku_serials.reset()
+    barcode_serials.reset()
+    return results
+
+
+def serializer_querysets():
+    # label -> (queryset, serializer class) of the list endpoints
+    return {
+        'products': (Product.objects.order_by('pk'), ProductSerializer),
+        'orders': (Order.objects.select_related('customer').order_by('pk'), OrdersSerializer),
+        'customers': (Customer.objects.order_by('pk'), CustomerSerializer),
+        'orderitems': (OrderItem.objects.order_by('pk'), OrderItemSerializer),
+        'stock': (stock_levels(timezone.now()).order_by('pk'), ProductStockSerializer),
+    }
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def compare_serializers(scale, repeat=5, random_seed=0):
+    """
+    Time DRF serializers + ``JSONRenderer`` against the fastpath rows +
+    ``FastJSONRenderer`` on ``scale`` seeded orders, checking that both
+    produce the same bytes. Seeded rows are rolled back.
+    """
+    results = {}
+    with transaction.atomic():
+        seed(products=scale, customers=max(scale // 10, 1), orders=scale, random_seed=random_seed)
+        for label, (queryset, serializer_class) in serializer_querysets().items():
+            plan = compile_rows(serializer_class, queryset)
+            standard, expected = best_time(
+                lambda: JSONRenderer().render(serializer_class(queryset.all(), many=True).data), repeat)
+            fast, actual = best_time(lambda: FastJSONRenderer().render(plan.rows(queryset.all())), repeat)
+            results[label] = {
+                'rows': queryset.count(),
+                'serializer_ms': round(standard * 1000, 2),
+                'fastpath_ms': round(fast * 1000, 2),
+                'speedup': round(standard / fast, 1) if fast else None,
+                'identical': expected == actual,
+            }
+        transaction.set_rollback(True)
+    sku_serials.reset()
+    barcode_serials.reset()
+    return results
+
+
+def wsgi_get(handler, url):
+    """GET ``url`` through ``handler`` like a WSGI server would; returns the status code."""
+    path, _, query = url.partition('?')
+    environ = {'PATH_INFO': path, 'QUERY_STRING': query}
+    setup_testing_defaults(environ)
+    status = []
+    body = handler(environ, lambda status_line, headers: status.append(int(status_line.split()[0])))
+    try:
+        b''.join(body)
+    finally:
+        body.close()  # fires request_finished
+    return status[0]
+
+
+def compare_connections(url, requests=200, connect_latency=0.0, max_age=60):
+    """
+    Per-request latency of ``url`` with a new connection per request and
+    with persistent connections (``CONN_MAX_AGE``).
+
+    Requests go through the WSGI handler rather than the test client, so
+    Django closes connections at the end of a request as it does in
+    production. ``connect_latency`` seconds are added to every new
+    connection to stand in for the handshake to a remote database.
+    """
+    handler = WSGIHandler()
+    connection = connections['default']
+    connect = connection.get_new_connection
+    connects = 0
+
+    def get_new_connection(conn_params):
+        nonlocal connects
+        connects += 1
+        time.sleep(connect_latency)
+        return connect(conn_params)
+
+    saved_max_age = connection.settings_dict['CONN_MAX_AGE']
+    connection.get_new_connection = get_new_connection
+    results = {}
+    try:
+        for label, age in (('per request', 0), ('persistent', max_age)):
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = age
+            connects = 0
+            durations, statuses = [], set()
+            for _ in range(requests):
+                start = time.perf_counter()
+                statuses.add(wsgi_get(handler, url))
+                durations.append(time.perf_counter() - start)
+            results[label] = {
+                'p50_ms': round(statistics.median(durations) * 1000, 2),
+                'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+                'connects': connects,
+                'statuses': sorted(statuses),
+            }
+    finally:
+        del connection.get_new_connection
+        connection.settings_dict['CONN_MAX_AGE'] = saved_max_age
+        connection.close()
+    return results
+
+
+def run(scales=DEFAULT_SCALES, labels=None, repeat=DEFAULT_REPEAT, use_cache=False, random_seed=0, progress=None):
+    """
+    Benchmark ``labels`` (all plans by default) at every scale.
+
+    Unless ``use_cache`` is set, the response cache is swapped for a dummy
+    one so list endpoints are measured on their uncached path.
+    """
+    labels = list(labels or PLANS)
+    alias = 'benchmark'
+    backend = 'django.core.cache.backends.locmem.LocMemCache' if use_cache else 'django.core.cache.backends.dummy.DummyCache'
+    caches = {**settings.CACHES, alias: {'BACKEND': backend, 'LOCATION': 'wms-benchmark'}}
+
+    report = {
+        'database': connection.vendor,
+        'repeat': repeat,
+        'cache': use_cache,
+        'scales': {},
+    }
+    # Result files of the jobs run by the benchmark go to a directory removed afterwards
+    with tempfile.TemporaryDirectory() as results, override_settings(
+            CACHES=caches, RESPONSE_CACHE_ALIAS=alias, SLOW_REQUEST_SECONDS=math.inf, JOB_RESULTS_DIR=Path(results)):
+        for scale in scales:
+            if progress:
+                progress(f"Scale {scale}: seeding and running {len(labels)} plans...")
+            report['scales'][str(scale)] = benchmark_scale(scale, labels, repeat, random_seed)
+    return report
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regressions of ``report`` against ``baseline``, as readable strings.
+
+    Latency and memory may grow by ``tolerance`` (a fraction) before they
+    count; query counts are deterministic, so any increase counts.
+    """
+    regressions = []
+    for scale, results in report['scales'].items():
+        for label, current in results.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(label)
+            if previous is None:
+                continue
+            for metric, allowed in (('p95_ms', tolerance), ('peak_kib', tolerance), ('queries', 0)):
+                if metric in previous and current[metric] > previous[metric] * (1 + allowed):
+                    regressions.append(f"{label} @ {scale}: {metric} {previous[metric]} -> {current[metric]}")
+    return regressions
@@ -0,0 +1,149 @@
+from django.db import transaction
+from django.db.models import F, Q
+from rest_framework import serializers
+
+from . import ledger
+from .cache import forget_products, invalidate
+from .identifiers import allocate_barcodes, allocate_skus
+from .models import Product
+from .serializers import ProductSerializer
+
+# Rows per INSERT/UPDATE statement
+BULK_BATCH_SIZE = 500
+MAX_BULK_BATCH_SIZE = 5000
+# Largest payload accepted by one bulk request
+MAX_BULK_ROWS = 50000
+
+
+class BulkResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def add_error(self, index, errors):
+        self.errors.append({'index': index, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'errors': self.errors}
+
+
+def taken_codes(skus, barcodes):
+    """Return ``{(field, value): product_id}`` for codes already stored, in a single query."""
+    taken = {}
+    if not skus and not barcodes:
+        return taken
+    rows = Product.objects.filter(Q(sku__in=skus) | Q(barcode__in=barcodes)).values_list('id', 'sku', 'barcode')
+    for product_id, sku, barcode in rows:
+        taken[('sku', sku)] = product_id
+        if barcode:
+            taken[('barcode', barcode)] = product_id
+    return taken
+
+
+def fill_missing_codes(products):
+    """Give every product without a SKU or barcode a generated one, allocated for the whole batch."""
+    without_sku = [product for product in products if not product.sku]
+    without_barcode = [product for product in products if not product.barcode]
+    for product, sku in zip(without_sku, allocate_skus(len(without_sku))):
+        product.sku = sku
+    for product, barcode in zip(without_barcode, allocate_barcodes(len(without_barcode))):
+        product.barcode = barcode
+
+
+def created_ids(products):
+    """Pair freshly bulk-created products with their ids, looking them up by SKU where the backend returned none."""
+    missing = [product.sku for product in products if product.pk is None]
+    ids = {}
+    for start in range(0, len(missing), BULK_BATCH_SIZE):
+        ids.update(Product.objects.filter(sku__in=missing[start:start + BULK_BATCH_SIZE]).values_list('sku', 'id'))
+    return [(product.pk or ids[product.sku], product) for product in products]
+
+
+def bulk_save_products(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Validate and write a list of product dicts in one transaction.
+
+    Rows with an ``id`` update that product, the others are created. Invalid
+    rows are skipped and reported by index; the valid ones are written with
+    ``bulk_create``/``bulk_update`` in batches of ``batch_size``.
+    """
+    result = BulkResult()
+    validated = []
+    for index, row in enumerate(rows):
+        try:
+            data = ProductSerializer().run_validation(row)
+        except serializers.ValidationError as exc:
+            result.add_error(index, exc.detail)
+            continue
+        product_id = row.get('id')
+        if product_id is not None and (not isinstance(product_id, int) or isinstance(product_id, bool)):
+            result.add_error(index, {'id': ["A valid integer is required."]})
+            continue
+        validated.append((index, product_id, data))
+
+    ids = [product_id for _, product_id, _ in validated if product_id is not None]
+    existing = Product.objects.in_bulk(ids) if ids else {}
+
+    # SKU/barcode given explicitly must be unique both in the payload and in the database
+    supplied = {}
+    for index, product_id, data in validated:
+        for field in ('sku', 'barcode'):
+            if data.get(field):
+                supplied.setdefault((field, data[field]), []).append((index, product_id))
+    taken = taken_codes([value for field, value in supplied if field == 'sku'],
+                        [value for field, value in supplied if field == 'barcode'])
+
+    rejected = {}
+    for (field, value), owners in supplied.items():
+        for index, product_id in owners:
+            if len(owners) > 1:
+                rejected.setdefault(index, {})[field] = [f"Duplicate {field} '{value}' in request."]
+            elif taken.get((field, value), product_id) != product_id:
+                rejected.setdefault(index, {})[field] = [f"Product with {field} '{value}' already exists."]
+
+    to_create, to_update, update_fields = [], [], set()
+    previous_stock = {}
+    for index, product_id, data in validated:
+        if index in rejected:
+            result.add_error(index, rejected[index])
+            continue
+        if product_id is None:
+            to_create.append(Product(**data))
+            continue
+        product = existing.get(product_id)
+        if product is None:
+            result.add_error(index, {'id': [f"Product {product_id} not found."]})
+            continue
+        if product.pk not in previous_stock:
+            previous_stock[product.pk] = product.stock_quantity
+            to_update.append(product)
+        for field, value in data.items():
+            setattr(product, field, value)
+        update_fields.update(data)
+
+    fill_missing_codes(to_create + to_update)
+    if to_update:
+        update_fields.update(('sku', 'barcode', 'version'))
+        for product in to_update:
+            product.version = F('version') + 1
+
+    with transaction.atomic():
+        if to_create:
+            Product.objects.bulk_create(to_create, batch_size=batch_size)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(update_fields), batch_size=batch_size)
+        ledger.record(
+            [ledger.movement(product_id, 'RECEIPT', product.stock_quantity)
+             for product_id, product in created_ids(to_create)]
+            + [ledger.movement(product.pk, 'ADJUSTMENT', product.stock_quantity - previous_stock[product.pk])
+               for product in to_update]
+        )
+        # bulk_create/bulk_update don't send post_save
+        invalidate('products')
+        forget_products([product.pk for product in to_update])
+
+    result.created = len(to_create)
+    result.updated = len(to_update)
+    result.errors.sort(key=lambda error: error['index'])
+    return result
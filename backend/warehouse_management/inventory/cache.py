@@ -0,0 +1,158 @@
+"""
+Read-through cache for GET list endpoints.
+
+Responses are cached per namespace (``products``, ``customers``, ``roles``)
+and full request URL. Every namespace has a version stored in the cache;
+it is part of each key, so ``invalidate()`` drops all cached responses of a
+namespace by writing a new version. Cached responses carry an ETag, and a
+matching ``If-None-Match`` gets a 304 without a body.
+"""
+import hashlib
+import time
+from collections import Counter
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+
+# Hits and misses per namespace since the process started
+hits = Counter()
+misses = Counter()
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def version_key(namespace):
+    return f'wms:version:{namespace}'
+
+
+def namespace_version(namespace):
+    # A fresh timestamp (rather than a counter) can't repeat an old version after eviction
+    return get_cache().get_or_set(version_key(namespace), time.time_ns, timeout=None)
+
+
+async def anamespace_version(namespace):
+    return await get_cache().aget_or_set(version_key(namespace), time.time_ns, timeout=None)
+
+
+def _bump(namespaces):
+    get_cache().set_many({version_key(namespace): time.time_ns() for namespace in namespaces}, timeout=None)
+
+
+def invalidate(*namespaces):
+    """
+    Drop every cached response of ``namespaces``.
+
+    The version is bumped right away and again once the surrounding
+    transaction commits, so a read racing the transaction cannot keep
+    pre-commit data in the cache.
+    """
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def product_key(pk):
+    return f'wms:product:{pk}'
+
+
+def forget_products(pks):
+    """
+    Drop the token of each product in ``pks``, making the entries cached
+    for those products (scan.py) stale. Like ``invalidate()``, once now and
+    once the surrounding transaction commits.
+    """
+    keys = [product_key(pk) for pk in pks]
+    if keys:
+        get_cache().delete_many(keys)
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def response_key(namespace, request, version=None):
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    version = namespace_version(namespace) if version is None else version
+    return f'wms:response:{namespace}:{version}:{digest}'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in (tag.strip() for tag in header.split(','))
+
+
+def make_entry(response):
+    if hasattr(response, 'render'):
+        response.render()
+    etag = '"%s"' % hashlib.md5(response.content, usedforsecurity=False).hexdigest()
+    return response.content, response['Content-Type'], etag
+
+
+def entry_response(request, entry):
+    content, content_type, etag = entry
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    return response
+
+
+def cached_response(namespace):
+    """Decorator caching successful GET responses of a (sync or async) view under ``namespace``."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return async_cached_view(namespace, view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            key = response_key(namespace, request)
+            entry = cache.get(key)
+            if entry is None:
+                misses[namespace] += 1
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                entry = make_entry(response)
+                cache.set(key, entry, cache_timeout())
+            else:
+                hits[namespace] += 1
+            return entry_response(request, entry)
+
+        return wrapped
+
+    return decorator
+
+
+def async_cached_view(namespace, view):
+    @wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await view(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = response_key(namespace, request, await anamespace_version(namespace))
+        entry = await cache.aget(key)
+        if entry is None:
+            misses[namespace] += 1
+            response = await view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            entry = make_entry(response)
+            await cache.aset(key, entry, cache_timeout())
+        else:
+            hits[namespace] += 1
+        return entry_response(request, entry)
+
+    return wrapped
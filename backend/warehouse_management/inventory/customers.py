@@ -0,0 +1,80 @@
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from .bulk import BULK_BATCH_SIZE, BulkResult
+from .cache import invalidate
+from .models import Customer
+from .serializers import CustomerUpsertSerializer
+
+# Columns an import overwrites on customers that already exist (matched by email)
+IMPORT_UPDATE_FIELDS = ['first_name', 'last_name', 'phone', 'address', 'updated_at']
+
+
+def customer_by_email(email):
+    return Customer.objects.filter(email=email)
+
+
+def resolve_customer(data):
+    """
+    Return the customer with ``data['email']``, creating it from ``data`` if there is none.
+
+    An existing customer is one lookup through the unique email index. A
+    new one is inserted with ``INSERT ... ON CONFLICT/ON DUPLICATE KEY
+    UPDATE`` that leaves a row inserted meanwhile unchanged, then read back
+    with SELECT ... FOR UPDATE. Unlike a plain read, the locking read sees
+    the latest committed row even in a REPEATABLE READ transaction that
+    started before it (``add_order`` runs in one), so concurrent first
+    orders of the same customer share one row.
+    """
+    customer = customer_by_email(data['email']).first()
+    if customer is not None:
+        return customer
+    options = {**upsert_options(), 'update_fields': ['email']}
+    Customer.objects.bulk_create([Customer(**data)], **options)
+    invalidate('customers')  # bulk_create doesn't send post_save
+    return customer_by_email(data['email']).select_for_update().get()
+
+
+def upsert_options():
+    options = {'update_conflicts': True, 'update_fields': IMPORT_UPDATE_FIELDS}
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target; it applies to any unique key
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['email']
+    return options
+
+
+def import_customers(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Validate a list of customer dicts and upsert them by email.
+
+    New emails are inserted; existing customers get the other fields of
+    their row. Each batch is one ``INSERT ... ON CONFLICT/ON DUPLICATE KEY
+    UPDATE``. Invalid rows and repeated emails are reported by index.
+    """
+    result = BulkResult()
+    validated = {}
+    for index, row in enumerate(rows):
+        try:
+            data = CustomerUpsertSerializer().run_validation(row)
+        except serializers.ValidationError as exc:
+            result.add_error(index, exc.detail)
+            continue
+        if data['email'] in validated:
+            result.add_error(index, {'email': [f"Duplicate email '{data['email']}' in request."]})
+            continue
+        validated[data['email']] = data
+
+    emails = list(validated)
+    with transaction.atomic():
+        for start in range(0, len(emails), batch_size):
+            batch = emails[start:start + batch_size]
+            existing = set(Customer.objects.filter(email__in=batch).values_list('email', flat=True))
+            Customer.objects.bulk_create([Customer(**validated[email]) for email in batch], **upsert_options())
+            result.updated += len(existing)
+            result.created += len(batch) - len(existing)
+        if emails:
+            # bulk_create doesn't send post_save
+            invalidate('customers')
+
+    result.errors.sort(key=lambda error: error['index'])
+    return result
@@ -0,0 +1,128 @@
+from django.db import router
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .models import Customer, Order, OrderItem, Product, Return
+from .fastpath import compile_rows
+from .pagination import ListQueryError, parse_fields
+from .renderers import FastJSONRenderer
+from .serializers import CustomerSerializer, OrderItemSerializer, OrdersSerializer, ProductSerializer, ReturnSerializer
+
+# Rows fetched per SELECT while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+# table name -> (model, serializer, relations joined for nested serializers)
+EXPORTS = {
+    'products': (Product, ProductSerializer, ()),
+    'customers': (Customer, CustomerSerializer, ()),
+    'orders': (Order, OrdersSerializer, ('customer',)),
+    'orderitems': (OrderItem, OrderItemSerializer, ()),
+    'returns': (Return, ReturnSerializer, ()),
+}
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def iter_chunks(queryset, chunk_size=None):
+    """
+    Yield lists of at most ``chunk_size`` objects, walking the primary key.
+
+    Each chunk is its own ``WHERE id > last_id ORDER BY id LIMIT n`` query.
+    ``QuerySet.iterator()`` is not enough here: mysqlclient buffers the whole
+    result set on the client, so memory would still grow with the table.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def iter_plan_rows(queryset, plan, chunk_size=None):
+    """Same keyset walk as ``iter_chunks``, yielding rows built by a fastpath.RowPlan."""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = plan.rows(page[:chunk_size], extra=('pk',))
+        for row, _ in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1][1][0]
+
+
+def iter_rows(queryset, serializer_class, fields=None, chunk_size=None):
+    plan = compile_rows(serializer_class, queryset, fields)
+    if plan is not None:
+        yield from iter_plan_rows(queryset, plan, chunk_size)
+        return
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield from serializer_class(chunk, many=True, fields=fields).data
+
+
+def stream_ndjson(rows):
+    renderer = FastJSONRenderer()
+    for row in rows:
+        yield renderer.render(row) + b'\n'
+
+
+def stream_json(rows):
+    renderer = FastJSONRenderer()
+    separator = b'['
+    for row in rows:
+        yield separator + renderer.render(row)
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+def export_queryset(table, params):
+    """Return ``(queryset, serializer_class, fields)`` for an export of ``table``."""
+    model, serializer_class, related = EXPORTS[table]
+    fields = parse_fields(params, serializer_class)
+    queryset = model.objects.all()
+    if fields:
+        related = [name for name in related if name in fields]
+        queryset = queryset.only(*fields)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset, serializer_class, fields
+
+
+@require_GET
+def export_table(request, table):
+    """
+    Stream a whole table as NDJSON (default) or as a JSON array.
+
+    Query parameters: ``format=ndjson|json`` and ``fields=a,b``. Memory use
+    and time to first byte do not depend on the size of the table.
+    """
+    if table not in EXPORTS:
+        raise Http404(f"Unknown table: {table}")
+
+    output_format = request.GET.get('format', 'ndjson')
+    if output_format not in CONTENT_TYPES:
+        return JsonResponse({"error": "format must be 'ndjson' or 'json'"}, status=400)
+    try:
+        queryset, serializer_class, fields = export_queryset(table, request.GET)
+    except ListQueryError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    # The body is produced after the view returns, outside the request's routing context,
+    # so the database (a replica, see routers.py) is chosen now
+    queryset = queryset.using(router.db_for_read(queryset.model))
+
+    rows = iter_rows(queryset, serializer_class, fields)
+    stream = stream_ndjson(rows) if output_format == 'ndjson' else stream_json(rows)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[output_format])
+    response['Content-Disposition'] = f'attachment; filename="{table}.{output_format}"'
+    return response
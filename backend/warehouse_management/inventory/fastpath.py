@@ -0,0 +1,173 @@
+"""
+Read-only fast path for list serializers.
+
+``compile_rows`` turns a serializer class into a ``RowPlan``: the columns to
+fetch with ``values_list()`` and a precompiled converter per field, which
+reproduces what the field's ``to_representation`` would return. Building
+dicts from tuples skips model instantiation and DRF's per-field machinery;
+the rendered JSON is the same, byte for byte, as the serializer's.
+
+Serializers with fields the plan doesn't understand (method fields,
+dotted sources, many-related fields, ...) get ``None`` and stay on the
+regular serializer.
+"""
+import decimal
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import fields as drf_fields, relations, serializers
+from rest_framework.settings import api_settings
+
+# Rows per database round trip of aiterator()
+ASYNC_CHUNK_SIZE = 2000
+
+
+class RowPlan:
+    def __init__(self, columns, build):
+        self.columns = columns
+        self.build = build
+
+    def rows(self, queryset, extra=()):
+        """Serialized rows of ``queryset``; with ``extra`` columns, pairs of (row, extra values)."""
+        build = self.build
+        if not extra:
+            return [build(values) for values in queryset.values_list(*self.columns)]
+        width = len(self.columns)
+        return [(build(values), values[width:]) for values in queryset.values_list(*self.columns, *extra)]
+
+    async def arows(self, queryset, extra=()):
+        """``rows()`` for async views, fetched with ``aiterator()``."""
+        build = self.build
+        # named=True: the plain tuple iterable of Django 5.1 runs its query
+        # before aiterator() moves it to a thread (SynchronousOnlyOperation)
+        values_list = queryset.values_list(*self.columns, *extra, named=True).aiterator(chunk_size=ASYNC_CHUNK_SIZE)
+        if not extra:
+            return [build(values) async for values in values_list]
+        width = len(self.columns)
+        return [(build(values), values[width:]) async for values in values_list]
+
+
+def skip_none(convert):
+    # Serializer.to_representation renders None without calling the field
+    def getter(index):
+        def get(values):
+            value = values[index]
+            return None if value is None else convert(value)
+        return get
+    return getter
+
+
+def decimal_converter(field):
+    if (field.decimal_places is None or field.localize or field.normalize_output
+            or not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)):
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if not settings.USE_TZ or output_format is None or output_format.lower() != drf_fields.ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+    def convert(value):
+        if isinstance(value, str):
+            return value
+        text = value.astimezone(field_timezone).isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+    return convert
+
+
+def choice_converter(field):
+    mapping = field.choice_strings_to_values
+    return lambda value: mapping.get(str(value), value) if value != '' else value
+
+
+def field_getter(field, index):
+    """Getter of ``field``'s representation from column ``index``, or None if the field isn't supported."""
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return None if field.pk_field is not None else itemgetter(index)
+    if isinstance(field, (relations.RelatedField, relations.ManyRelatedField, serializers.BaseSerializer,
+                          drf_fields.SerializerMethodField, drf_fields.HiddenField)):
+        return None
+    if isinstance(field, drf_fields.DecimalField):
+        return skip_none(decimal_converter(field))(index)
+    if isinstance(field, drf_fields.DateTimeField):
+        return skip_none(datetime_converter(field))(index)
+    if isinstance(field, drf_fields.ChoiceField):
+        return skip_none(choice_converter(field))(index)
+    if type(field) in (drf_fields.IntegerField, drf_fields.CharField, drf_fields.EmailField):
+        # Database values are already int/str, so to_representation would return them unchanged
+        return itemgetter(index)
+    return skip_none(field.to_representation)(index)
+
+
+def model_field(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.concrete else None
+
+
+def compile_fields(serializer, model, annotations, prefix, columns):
+    """Append the columns of ``serializer`` to ``columns`` and return its (name, getter) pairs."""
+    entries = []
+    for field in serializer._readable_fields:
+        source = field.source
+        column = model_field(model, source)
+        if column is None and source not in annotations:
+            # Properties, methods, reverse relations, ...
+            return None
+        if isinstance(field, serializers.Serializer) and not isinstance(field, serializers.ListSerializer):
+            if column is None or not column.is_relation or column.many_to_many:
+                return None
+            # Nested object: None when the foreign key is empty
+            key_index = len(columns)
+            columns.append(prefix + source)
+            nested = compile_fields(field, column.related_model, (), f'{prefix}{source}__', columns)
+            if nested is None:
+                return None
+            entries.append((field.field_name, nested_getter(key_index, nested)))
+            continue
+        getter = field_getter(field, len(columns))
+        if getter is None:
+            return None
+        columns.append(prefix + source)
+        entries.append((field.field_name, getter))
+    return entries
+
+
+def nested_getter(key_index, entries):
+    def get(values):
+        if values[key_index] is None:
+            return None
+        return {name: getter(values) for name, getter in entries}
+    return get
+
+
+def compile_rows(serializer_class, queryset, fields=None):
+    """
+    ``RowPlan`` rendering ``queryset`` like ``serializer_class(queryset, many=True, fields=fields)``,
+    or None if the serializer isn't supported.
+    """
+    serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+    columns = []
+    entries = compile_fields(serializer, queryset.model, queryset.query.annotations, '', columns)
+    if entries is None:
+        return None
+
+    def build(values):
+        return {name: getter(values) for name, getter in entries}
+    return RowPlan(columns, build)
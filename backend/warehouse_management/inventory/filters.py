@@ -0,0 +1,146 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, StockMovement
+from .pagination import ListQueryError
+
+
+def parse_decimal(value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ListQueryError(f"'{value}' is not a number")
+    if not number.is_finite():
+        raise ListQueryError(f"'{value}' is not a number")
+    return number
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ListQueryError(f"'{value}' is not an integer")
+
+
+def parse_choices(choices):
+    """Parser for a comma separated list of choice values, e.g. ``?status=pending,processing``."""
+    allowed = dict(choices)
+
+    def parse(value):
+        values = [item.strip().upper() for item in value.split(',') if item.strip()]
+        invalid = [item for item in values if item not in allowed]
+        if invalid or not values:
+            raise ListQueryError(f"Invalid choice: {', '.join(invalid) or value!r}")
+        return values
+
+    return parse
+
+
+def parse_moment(end=False):
+    """
+    Parser for a date or datetime bound.
+
+    A bare date used as an upper bound covers that whole day, so it is turned
+    into midnight of the following day and paired with a ``__lt`` lookup;
+    comparing against a plain column keeps the index usable, unlike ``__date``.
+    """
+    def parse(value):
+        try:
+            day = parse_date(value)
+            moment = None if day else parse_datetime(value)
+        except ValueError:
+            day = moment = None
+        if day is not None:
+            if end:
+                day += datetime.timedelta(days=1)
+            moment = datetime.datetime.combine(day, datetime.time.min)
+        elif moment is None:
+            raise ListQueryError(f"'{value}' is not a date")
+        elif end:
+            moment += datetime.timedelta(microseconds=1)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    return parse
+
+
+class ListSpec:
+    """
+    Declares the query parameters a list endpoint understands.
+
+    ``filters`` maps a parameter to ``(lookup, parser)``, ``search`` lists the
+    lookups OR-ed together for ``?search=`` and ``ordering`` the non-null,
+    indexed fields allowed in ``?ordering=`` (prefix with ``-`` to reverse).
+    """
+
+    def __init__(self, filters=None, search=(), ordering=()):
+        self.filters = filters or {}
+        self.search = search
+        self.ordering = ('id',) + tuple(ordering)
+
+    def filter(self, queryset, params):
+        for param, (lookup, parse) in self.filters.items():
+            value = params.get(param)
+            if value not in (None, ''):
+                queryset = queryset.filter(**{lookup: parse(value)})
+
+        term = params.get('search', '').strip()
+        if term and self.search:
+            condition = Q()
+            for lookup in self.search:
+                condition |= Q(**{lookup: term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def parse_ordering(self, params):
+        """Return ``(field, descending)`` for ``?ordering=``; the default is ascending id."""
+        raw = params.get('ordering', '').strip() or 'id'
+        field = raw.lstrip('-')
+        if field == 'pk':
+            field = 'id'
+        if field not in self.ordering:
+            raise ListQueryError(f"Cannot order by '{raw}'; allowed: {', '.join(self.ordering)}")
+        return field, raw.startswith('-')
+
+
+PRODUCT_LIST = ListSpec(
+    filters={
+        'category': ('category', str),
+        'low_stock': ('stock_quantity__lte', parse_decimal),
+        'min_price': ('price__gte', parse_decimal),
+        'max_price': ('price__lte', parse_decimal),
+    },
+    search=('name__istartswith', 'sku__istartswith', 'barcode__startswith'),
+    ordering=('name', 'sku'),
+)
+
+ORDER_LIST = ListSpec(
+    filters={
+        'status': ('status__in', parse_choices(Order.STATUS_CHOICES)),
+        'customer': ('customer_id', parse_int),
+        'date_from': ('order_date__gte', parse_moment()),
+        'date_to': ('order_date__lt', parse_moment(end=True)),
+    },
+    search=('customer__email__istartswith', 'customer__last_name__istartswith'),
+    ordering=('order_date',),
+)
+
+CUSTOMER_LIST = ListSpec(
+    search=('email__istartswith', 'last_name__istartswith', 'first_name__istartswith'),
+    ordering=('last_name', 'email'),
+)
+
+MOVEMENT_LIST = ListSpec(
+    filters={
+        'product': ('product_id', parse_int),
+        'kind': ('kind__in', parse_choices(StockMovement.KIND_CHOICES)),
+        'date_from': ('created_at__gte', parse_moment()),
+        'date_to': ('created_at__lt', parse_moment(end=True)),
+    },
+    ordering=('created_at',),
+)
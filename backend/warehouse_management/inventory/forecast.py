@@ -0,0 +1,144 @@
+"""
+Reorder suggestions from order history.
+
+Daily demand per product over the last ``FORECAST_HISTORY_DAYS`` comes
+from one grouped query over ``OrderItem`` joined with ``Order``
+(cancelled orders excluded). It is laid out as a products x days NumPy
+matrix, and the statistics of all products are computed at once:
+
+* average daily demand, and the 7 and 28 day moving averages (trend);
+* standard deviation of daily demand;
+* reorder point = demand over the lead time + safety stock
+  (``z * std * sqrt(lead time)``);
+* days of cover = stock / average daily demand;
+* suggested quantity: enough to get back above the reorder point and
+  cover the review period.
+
+The result is stored as a ``ReorderForecast`` row, so a refresh by the
+``refresh_reorder_suggestions`` command or the ``refresh_forecast`` job
+(in another process, or on another machine) serves every web worker.
+A request finding no result younger than ``FORECAST_MAX_AGE_SECONDS``
+computes one itself. Stock levels are those at ``computed_at``.
+"""
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import OrderItem, Product, ReorderForecast
+
+# Suggestions per response, by default and at most
+SUGGESTION_LIMIT = 100
+MAX_SUGGESTION_LIMIT = 1000
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def daily_demand(days, today=None):
+    """
+    Return ``(product_ids, matrix)``: quantity sold per product (rows) and day (columns).
+
+    The last column is ``today``. Only products sold in the period have a row.
+    """
+    today = today or timezone.localdate()
+    start = today - datetime.timedelta(days=days - 1)
+    # A datetime bound, not __date, so the order_date index can be used
+    since = timezone.make_aware(datetime.datetime.combine(start, datetime.time()))
+    rows = list(
+        OrderItem.objects
+        .filter(order__order_date__gte=since)
+        .exclude(order__status='CANCELLED')
+        .annotate(day=TruncDate('order__order_date'))
+        .values('product_id', 'day')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+        .values_list('product_id', 'day', 'quantity')
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, days))
+
+    product_column, day_column, quantity_column = zip(*rows)
+    product_ids, product_index = np.unique(np.array(product_column, dtype=np.int64), return_inverse=True)
+    day_index = (np.array(day_column, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    inside = (day_index >= 0) & (day_index < days)  # order dates past today (clock skew)
+    matrix = np.zeros((len(product_ids), days))
+    np.add.at(matrix, (product_index[inside], day_index[inside]), np.array(quantity_column, dtype=np.float64)[inside])
+    return product_ids, matrix
+
+
+def compute_suggestions(today=None, now=None):
+    """Reorder suggestions for every product at or below its reorder point, most urgent first."""
+    days = setting('FORECAST_HISTORY_DAYS', 90)
+    lead_time = setting('REORDER_LEAD_TIME_DAYS', 7)
+    review = setting('REORDER_REVIEW_DAYS', 14)
+    z = setting('REORDER_SERVICE_Z', 1.65)
+
+    product_ids, matrix = daily_demand(days, today)
+    # The whole table in one scan, rather than an IN list of every product sold
+    products = {pk: (sku, name, stock) for pk, sku, name, stock in
+                Product.objects.values_list('pk', 'sku', 'name', 'stock_quantity').iterator()}
+    # Products deleted since they were sold drop out
+    known = np.array([pk in products for pk in product_ids.tolist()], dtype=bool)
+    product_ids, matrix = product_ids[known], matrix[known]
+    stock = np.array([float(products[pk][2]) for pk in product_ids.tolist()])
+
+    average = matrix.mean(axis=1)
+    std = matrix.std(axis=1, ddof=1) if days > 1 else np.zeros(len(product_ids))
+    recent = matrix[:, -7:].mean(axis=1)
+    month = matrix[:, -28:].mean(axis=1)
+    reorder_point = average * lead_time + z * std * np.sqrt(lead_time)
+    with np.errstate(divide='ignore'):
+        cover = np.where(average > 0, stock / average, np.inf)
+    suggested = np.ceil(np.maximum(reorder_point + average * review - stock, 0))
+
+    due = np.flatnonzero(stock <= reorder_point)
+    due = due[np.argsort(cover[due], kind='stable')]
+    suggestions = [{
+        'product': pk,
+        'sku': products[pk][0],
+        'name': products[pk][1],
+        'stock_quantity': str(products[pk][2]),
+        'average_daily_demand': round(float(average[i]), 2),
+        'demand_7d': round(float(recent[i]), 2),
+        'demand_28d': round(float(month[i]), 2),
+        'demand_std': round(float(std[i]), 2),
+        'days_of_cover': round(float(cover[i]), 1) if np.isfinite(cover[i]) else None,
+        'reorder_point': round(float(reorder_point[i]), 2),
+        'suggested_quantity': int(suggested[i]),
+    } for i, pk in zip(due.tolist(), product_ids[due].tolist())]
+
+    return {
+        'computed_at': (now or timezone.now()).isoformat(),
+        'history_days': days,
+        'lead_time_days': lead_time,
+        'review_days': review,
+        'products_analysed': len(product_ids),
+        'suggestions': suggestions,
+    }
+
+
+def refresh_suggestions():
+    """Compute the suggestions and store them as the latest forecast, dropping older ones."""
+    now = timezone.now()
+    result = compute_suggestions(now=now)
+    forecast = ReorderForecast.objects.create(computed_at=now, result=result)
+    ReorderForecast.objects.filter(computed_at__lt=now).exclude(pk=forecast.pk).delete()
+    return result
+
+
+def reorder_suggestions():
+    """The latest stored suggestions; computed now if there are none younger than ``FORECAST_MAX_AGE_SECONDS``."""
+    since = timezone.now() - datetime.timedelta(seconds=setting('FORECAST_MAX_AGE_SECONDS', 3600))
+    latest = ReorderForecast.objects.filter(computed_at__gte=since).order_by('-computed_at').first()
+    return latest.result if latest is not None else refresh_suggestions()
+
+
+def suggestion_page(limit=SUGGESTION_LIMIT):
+    """The cached result with its ``limit`` most urgent suggestions and the total count."""
+    result = reorder_suggestions()
+    return {**result, 'count': len(result['suggestions']), 'suggestions': result['suggestions'][:limit]}
@@ -0,0 +1,105 @@
+"""
+Unique SKU and barcode generation.
+
+Serial numbers are handed out in blocks of ``BLOCK_SIZE``. A block is
+reserved by inserting a ``CodeBlock`` row: block ``n`` owns the serials
+``n * BLOCK_SIZE`` to ``(n + 1) * BLOCK_SIZE - 1``. Auto-increment ids are
+never reissued, even when the inserting transaction rolls back, so every
+worker process owns its blocks exclusively and codes need no uniqueness
+lookup. Only one INSERT is needed per ``BLOCK_SIZE`` codes. (SQLite does
+reuse ids after a rollback, which only matters for throwaway test databases.)
+
+Generated SKUs are ``SKU-`` followed by 10 base-36 digits, and barcodes are
+EAN-13 codes in the in-store range ``20``. Neither can collide with the
+8-character random SKUs or the 12-digit random barcodes generated before.
+"""
+import threading
+
+from .models import CodeBlock
+
+# Serials per reserved block. It may be raised, but never lowered: a smaller
+# block size would map new block ids onto serials that were already issued.
+BLOCK_SIZE = 1000
+
+SKU_PREFIX = "SKU-"
+SKU_WIDTH = 10
+BARCODE_PREFIX = "20"
+BARCODE_SERIAL_WIDTH = 10
+
+BASE36_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def ean13_check_digit(digits):
+    """Check digit for the first 12 digits of an EAN-13 code."""
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def to_base36(number, width):
+    chars = []
+    while number:
+        number, remainder = divmod(number, 36)
+        chars.append(BASE36_DIGITS[remainder])
+    return ''.join(reversed(chars)).rjust(width, '0')
+
+
+def format_sku(serial):
+    return SKU_PREFIX + to_base36(serial, SKU_WIDTH)
+
+
+def format_barcode(serial):
+    body = BARCODE_PREFIX + str(serial).zfill(BARCODE_SERIAL_WIDTH)
+    return body + ean13_check_digit(body)
+
+
+class SerialAllocator:
+    """Thread-safe source of serial numbers backed by reserved blocks."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def reserve_block(self):
+        block = CodeBlock.objects.create(name=self.name)
+        # Older rows are not needed; keeping the newest one preserves the
+        # auto-increment high-water mark across MySQL restarts.
+        CodeBlock.objects.filter(name=self.name, pk__lt=block.pk).delete()
+        return block.pk * BLOCK_SIZE, (block.pk + 1) * BLOCK_SIZE
+
+    def take(self, count):
+        serials = []
+        with self._lock:
+            while len(serials) < count:
+                if self._next >= self._end:
+                    self._next, self._end = self.reserve_block()
+                step = min(count - len(serials), self._end - self._next)
+                serials.extend(range(self._next, self._next + step))
+                self._next += step
+        return serials
+
+    def reset(self):
+        # Forget the current block, e.g. after the transaction that reserved it was rolled back
+        with self._lock:
+            self._next = self._end = 0
+
+
+sku_serials = SerialAllocator('sku')
+barcode_serials = SerialAllocator('barcode')
+
+
+def allocate_skus(count):
+    return [format_sku(serial) for serial in sku_serials.take(count)]
+
+
+def allocate_barcodes(count):
+    return [format_barcode(serial) for serial in barcode_serials.take(count)]
+
+
+def next_sku():
+    return allocate_skus(1)[0]
+
+
+def next_barcode():
+    return allocate_barcodes(1)[0]
@@ -0,0 +1,260 @@
+"""
+Database-backed background jobs.
+
+Heavy operations (imports, full-table exports, recomputations) are queued
+as ``Job`` rows and the request returns the job id at once. The
+``run_jobs`` command claims due jobs with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of workers can poll the same table without a
+broker, and runs them in a pool of processes. A failed job is retried
+with exponential backoff up to its ``max_attempts``; a job whose worker
+stopped sending heartbeats is queued again. Handlers may write one result
+file under ``JOB_RESULTS_DIR``, served by the job result endpoint.
+"""
+import datetime
+import logging
+import threading
+import time
+import traceback
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+
+from .bulk import MAX_BULK_ROWS, bulk_save_products
+from .customers import import_customers
+from .export import CONTENT_TYPES, EXPORT_CHUNK_SIZE, EXPORTS, export_queryset, iter_rows, stream_json, stream_ndjson
+from .forecast import refresh_suggestions
+from .models import Job
+from .pagination import ListQueryError
+from .totals import TOTAL_CHUNK_SIZE, recompute_totals
+
+logger = logging.getLogger('inventory.jobs')
+
+Handler = namedtuple('Handler', 'run validate')
+
+# kind -> Handler; run(params, job_run) returns the JSON result of the job
+HANDLERS = {}
+
+
+def handler(kind, validate=None):
+    """
+    Register ``run(params, job_run)`` as the handler of ``kind`` jobs.
+
+    ``validate(params)`` runs when the job is queued; it returns the params
+    to store or raises ``serializers.ValidationError``.
+    """
+    def register(run):
+        HANDLERS[kind] = Handler(run, validate)
+        return run
+    return register
+
+
+def results_dir():
+    return Path(getattr(settings, 'JOB_RESULTS_DIR', settings.BASE_DIR / 'job_results'))
+
+
+def heartbeat_seconds():
+    return getattr(settings, 'JOB_HEARTBEAT_SECONDS', 30)
+
+
+def stale_after():
+    # A running job without a heartbeat for this long has lost its worker
+    return datetime.timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 300))
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=getattr(settings, 'JOB_RETRY_SECONDS', 30) * 2 ** (attempts - 1))
+
+
+def enqueue(kind, params=None, max_attempts=3):
+    if kind not in HANDLERS:
+        raise serializers.ValidationError({'kind': [f"Unknown job kind '{kind}'."]})
+    params = params or {}
+    validate = HANDLERS[kind].validate
+    if validate is not None:
+        params = validate(params)
+    return Job.objects.create(kind=kind, params=params, max_attempts=max_attempts)
+
+
+def claim(worker, limit=1):
+    """Mark up to ``limit`` due jobs as running on ``worker``; returns their ids, oldest first."""
+    now = timezone.now()
+    due = Job.objects.filter(status='QUEUED', run_after__lte=now).order_by('run_after', 'pk')
+    with transaction.atomic():
+        # Rows locked by another worker's claim are skipped, not waited for
+        locked = due.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        ids = list(locked.values_list('pk', flat=True)[:limit])
+        if ids:
+            Job.objects.filter(pk__in=ids).update(
+                status='RUNNING', worker=worker, attempts=F('attempts') + 1, started_at=now, heartbeat_at=now)
+    return ids
+
+
+def requeue(queryset, error):
+    """Queue the running jobs of ``queryset`` again, or fail those out of attempts; returns how many."""
+    now = timezone.now()
+    running = queryset.filter(status='RUNNING')
+    count = running.filter(attempts__lt=F('max_attempts')).update(status='QUEUED', run_after=now, error=error)
+    return count + running.update(status='FAILED', finished_at=now, error=error)
+
+
+def requeue_stale():
+    """Requeue running jobs without a recent heartbeat: their worker is gone."""
+    stale = Job.objects.filter(heartbeat_at__lt=timezone.now() - stale_after())
+    return requeue(stale, "Worker stopped responding")
+
+
+class Heartbeat(threading.Thread):
+    """Refreshes ``heartbeat_at`` of a running job from a thread of its own."""
+
+    def __init__(self, job_id, interval):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(pk=self.job_id, status='RUNNING').update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    # A dead heartbeat would get the job requeued and run twice; try again next interval
+                    logger.exception("Heartbeat of job %s failed", self.job_id)
+                    close_old_connections()
+        finally:
+            connection.close()  # the thread's own connection
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class JobRun:
+    """What a handler gets besides its params: progress reporting and a result file."""
+
+    def __init__(self, job):
+        self.job = job
+        self.result_file = ''
+        self._reported = 0.0
+
+    def progress(self, done, total):
+        # At most one UPDATE a second; 100 is written when the job finishes
+        now = time.monotonic()
+        if total and now - self._reported >= 1:
+            self._reported = now
+            Job.objects.filter(pk=self.job.pk).update(progress=min(99, done * 100 // total))
+
+    def result_path(self, name):
+        directory = results_dir() / str(self.job.pk)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.result_file = f'{self.job.pk}/{name}'
+        return directory / name
+
+
+def execute(job_id):
+    """Run a claimed job and record its outcome; returns the job's new status."""
+    job = Job.objects.get(pk=job_id)
+    job_run = JobRun(job)
+    heartbeat = Heartbeat(job.pk, heartbeat_seconds())
+    heartbeat.start()
+    try:
+        result = HANDLERS[job.kind].run(job.params, job_run)
+    except Exception:
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            changes = {'status': 'QUEUED', 'run_after': now + retry_delay(job.attempts)}
+        else:
+            changes = {'status': 'FAILED', 'finished_at': now}
+        Job.objects.filter(pk=job.pk, status='RUNNING').update(error=traceback.format_exc(), **changes)
+        return changes['status']
+    finally:
+        heartbeat.stop()
+    Job.objects.filter(pk=job.pk, status='RUNNING').update(
+        status='DONE', progress=100, result=result, result_file=job_run.result_file,
+        finished_at=timezone.now(), error='')
+    return 'DONE'
+
+
+def result_content_type(path):
+    return CONTENT_TYPES.get(Path(path).suffix.lstrip('.'), 'application/octet-stream')
+
+
+def validate_export(params):
+    table = params.get('table')
+    output_format = params.get('format', 'ndjson')
+    fields = params.get('fields') or ''
+    if not isinstance(table, str) or table not in EXPORTS:
+        raise serializers.ValidationError({'table': [f"Unknown table: {table}"]})
+    if not isinstance(output_format, str) or output_format not in CONTENT_TYPES:
+        raise serializers.ValidationError({'format': ["format must be 'ndjson' or 'json'"]})
+    if not isinstance(fields, str):
+        raise serializers.ValidationError({'fields': ["Expected a comma separated string."]})
+    try:
+        export_queryset(table, {'fields': fields})
+    except ListQueryError as exc:
+        raise serializers.ValidationError({'fields': [str(exc)]})
+    return {'table': table, 'format': output_format, 'fields': fields}
+
+
+@handler('export', validate_export)
+def run_export(params, job_run):
+    # Same rows as the export_table endpoint, written to the job's result file
+    queryset, serializer_class, fields = export_queryset(params['table'], params)
+    total = queryset.count()
+    written = 0
+
+    def counted(rows):
+        nonlocal written
+        for written, row in enumerate(rows, 1):
+            if written % EXPORT_CHUNK_SIZE == 0:
+                job_run.progress(written, total)
+            yield row
+
+    stream = stream_ndjson if params['format'] == 'ndjson' else stream_json
+    with open(job_run.result_path(f"{params['table']}.{params['format']}"), 'wb') as output:
+        for chunk in stream(counted(iter_rows(queryset, serializer_class, fields))):
+            output.write(chunk)
+    return {'rows': written}
+
+
+def validate_rows(params):
+    rows = params.get('rows')
+    if not isinstance(rows, list) or not rows:
+        raise serializers.ValidationError({'rows': ["Expected a non-empty list."]})
+    if len(rows) > MAX_BULK_ROWS:
+        raise serializers.ValidationError({'rows': [f"At most {MAX_BULK_ROWS} rows per job."]})
+    return {'rows': rows}
+
+
+# Both imports write in one transaction, so a retry never sees half an import
+@handler('import_products', validate_rows)
+def run_product_import(params, job_run):
+    return bulk_save_products(params['rows']).as_dict()
+
+
+@handler('import_customers', validate_rows)
+def run_customer_import(params, job_run):
+    return import_customers(params['rows']).as_dict()
+
+
+def validate_chunk_size(params):
+    chunk_size = params.get('chunk_size', TOTAL_CHUNK_SIZE)
+    if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or chunk_size < 1:
+        raise serializers.ValidationError({'chunk_size': ["Expected a positive integer."]})
+    return {'chunk_size': chunk_size}
+
+
+@handler('recompute_totals', validate_chunk_size)
+def run_total_recomputation(params, job_run):
+    return recompute_totals(params['chunk_size'], progress=job_run.progress)
+
+
+@handler('refresh_forecast')
+def run_forecast_refresh(params, job_run):
+    result = refresh_suggestions()
+    return {'computed_at': result['computed_at'], 'suggestions': len(result['suggestions'])}
@@ -0,0 +1,76 @@
+"""
+Append-only stock ledger.
+
+Every change of ``Product.stock_quantity`` made through the API appends a
+``StockMovement`` row. ``Product.stock_quantity`` stays the current stock
+level. ``StockSnapshot`` rows record each product's stock at a point in
+time, so the stock at any moment is the nearest earlier snapshot plus the
+movements recorded after it. No report has to replay the full history.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+
+# Snapshots are taken this far in the past, so that every transaction that
+# recorded a movement before the snapshot moment has committed by then.
+SNAPSHOT_LAG = datetime.timedelta(minutes=5)
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+QUANTITY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def movement(product_id, kind, quantity, **extra):
+    return StockMovement(product_id=product_id, kind=kind, quantity=quantity, **extra)
+
+
+def record(movements):
+    """Append movements, skipping the ones that don't change the stock."""
+    movements = [item for item in movements if item.quantity]
+    if movements:
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+def stock_levels(moment, products=None):
+    """
+    Annotate ``products`` (all by default) with ``stock_at``: their stock at ``moment``.
+
+    A single query: correlated subqueries pick the latest snapshot at or
+    before ``moment`` and sum the movements between it and ``moment``,
+    both through the (product, date) indexes.
+    """
+    products = Product.objects.all() if products is None else products
+    latest = StockSnapshot.objects.filter(product=OuterRef('pk'), taken_at__lte=moment).order_by('-taken_at')
+    products = products.annotate(
+        snapshot_at=Subquery(latest.values('taken_at')[:1]),
+        snapshot_quantity=Subquery(latest.values('quantity')[:1]),
+    )
+    since_snapshot = StockMovement.objects.filter(
+        product=OuterRef('pk'),
+        created_at__gt=Coalesce(OuterRef('snapshot_at'), Value(EPOCH)),
+        created_at__lte=moment,
+    )
+    delta = since_snapshot.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    return products.annotate(
+        stock_at=Coalesce('snapshot_quantity', Value(Decimal('0')), output_field=QUANTITY)
+        + Coalesce(Subquery(delta), Value(Decimal('0')), output_field=QUANTITY),
+        moved_since_snapshot=Exists(since_snapshot),
+    )
+
+
+def take_snapshots(moment=None):
+    """
+    Snapshot the stock of every product that moved since its last snapshot.
+
+    ``moment`` defaults to ``SNAPSHOT_LAG`` ago. Returns the number of
+    snapshots written.
+    """
+    moment = moment or timezone.now() - SNAPSHOT_LAG
+    rows = stock_levels(moment).filter(moved_since_snapshot=True).values_list('pk', 'stock_at')
+    snapshots = [StockSnapshot(product_id=pk, taken_at=moment, quantity=quantity) for pk, quantity in rows.iterator()]
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API route at several data scales: p50/p95 latency, queries per request and peak memory. "
+        "Synthetic data is seeded in a transaction that is rolled back, but run it against a disposable database. "
+        "Writes are therefore timed without a commit and their row locks are held until the scale ends: "
+        "compare write routes between runs, not with production latencies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(map(str, benchmarks.DEFAULT_SCALES)),
+                            help="Comma separated numbers of seeded products/orders")
+        parser.add_argument('--repeat', type=int, default=benchmarks.DEFAULT_REPEAT, help="Timed requests per plan")
+        parser.add_argument('--only', action='append', help="Benchmark only this plan label (repeatable)")
+        parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic data")
+        parser.add_argument('--output', help="Write the results as JSON to this file (e.g. a new baseline)")
+        parser.add_argument('--baseline', help="Compare against a JSON file written by --output")
+        parser.add_argument('--tolerance', type=float, default=benchmarks.DEFAULT_TOLERANCE,
+                            help="Allowed relative growth of latency and memory over the baseline")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(value) for value in options['scales'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError("--scales must be a comma separated list of integers")
+        if not scales or min(scales) < 1 or options['repeat'] < 1:
+            raise CommandError("--scales and --repeat must be positive")
+        unknown = set(options['only'] or ()) - set(benchmarks.PLANS)
+        if unknown:
+            raise CommandError(f"Unknown plans: {', '.join(sorted(unknown))}")
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+
+        for name in benchmarks.unplanned_routes():
+            self.stderr.write(self.style.WARNING(f"Route '{name}' has no benchmark plan"))
+
+        report = benchmarks.run(scales, labels=options['only'], repeat=options['repeat'],
+                                use_cache=options['cache'], random_seed=options['seed'], progress=self.stdout.write)
+
+        for scale, results in report['scales'].items():
+            self.stdout.write(f"\nScale {scale} ({report['database']})")
+            self.stdout.write(f"{'plan':<34}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>11}  status")
+            for label, row in results.items():
+                status = ','.join(map(str, row['statuses']))
+                line = (f"{label:<34}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['queries']:>9}"
+                        f"{row['peak_kib']:>11}  {status}")
+                self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"\nResults written to {options['output']}")
+
+        if baseline is not None:
+            regressions = benchmarks.compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request latency with a new database connection per request and with persistent "
+        "connections. --connect-latency-ms simulates the handshake to a remote database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/get/orders/?limit=100', help="Path (and query) of a GET endpoint")
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--connect-latency-ms', type=float, default=0.0,
+                            help="Delay added to every new connection, e.g. 30 for a TLS handshake to a proxy")
+        parser.add_argument('--max-age', type=int, default=60, help="CONN_MAX_AGE of the persistent run")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['connect_latency_ms'] < 0 or options['max_age'] < 1:
+            raise CommandError("--requests and --max-age must be positive, --connect-latency-ms not negative")
+
+        results = benchmarks.compare_connections(options['url'], options['requests'],
+                                                 options['connect_latency_ms'] / 1000, options['max_age'])
+        self.stdout.write(f"{'connections':<14}{'p50 ms':>10}{'p95 ms':>10}{'connects':>10}  status")
+        for label, row in results.items():
+            status = ','.join(map(str, row['statuses']))
+            self.stdout.write(f"{label:<14}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['connects']:>10}  {status}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Compare DRF list serialization with the values_list() fast path (seeded rows are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=10000, help="Number of seeded products and orders")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per variant; the best one is reported")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the synthetic data")
+
+    def handle(self, *args, **options):
+        if options['scale'] < 1 or options['repeat'] < 1:
+            raise CommandError("--scale and --repeat must be positive")
+
+        results = benchmarks.compare_serializers(options['scale'], options['repeat'], options['seed'])
+        self.stdout.write(f"{'list':<12}{'rows':>8}{'serializer ms':>15}{'fastpath ms':>13}{'speedup':>9}")
+        for label, row in results.items():
+            self.stdout.write(f"{label:<12}{row['rows']:>8}{row['serializer_ms']:>15}{row['fastpath_ms']:>13}"
+                              f"{row['speedup']:>8}x")
+        different = [label for label, row in results.items() if not row['identical']]
+        if different:
+            raise CommandError(f"Fast path output differs from the serializer for: {', '.join(different)}")
+        self.stdout.write(self.style.SUCCESS("Fast path output is byte-identical."))
@@ -0,0 +1,133 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from inventory.customers import customer_by_email
+from inventory.filters import CUSTOMER_LIST, MOVEMENT_LIST, ORDER_LIST, PRODUCT_LIST
+from inventory.models import Customer, Order, OrderItem, Product, Return, StockMovement
+from inventory.pagination import DEFAULT_PAGE_SIZE, ListQuery, encode_cursor
+from inventory.scan import products_matching
+from inventory.serializers import (
+    CustomerSerializer, OrderItemSerializer, OrdersSerializer, ProductSerializer, ReturnSerializer,
+    StockMovementSerializer,
+)
+
+
+# Case-insensitive prefix LIKE can only use an index on MySQL's *_ci collations
+MYSQL_ONLY = {'product search', 'customer search', 'orders by customer search'}
+
+
+def list_page(queryset, serializer_class, params=None, related=(), spec=None):
+    """
+    The page a list view fetches for ``params``, built by the view's own ``ListQuery``.
+
+    Without ``ordering`` it is a next page (``id > 1``): SQLite reports the
+    first page, a LIMIT in primary key order, as a scan although it stops
+    after one page.
+    """
+    params = {'limit': str(DEFAULT_PAGE_SIZE), **(params or {})}
+    if 'ordering' not in params:
+        params.setdefault('cursor', encode_cursor({'pk': 1}))
+    query = ListQuery(params, queryset, serializer_class, related, spec)
+    return query.queryset[:query.page_size + 1]
+
+
+def query_patterns():
+    """(label, queryset) pairs built through the code paths of the views, with representative parameters."""
+    products = lambda **params: list_page(Product.objects.all(), ProductSerializer, params, spec=PRODUCT_LIST)
+    orders = lambda **params: list_page(Order.objects.all(), OrdersSerializer, params, ['customer'], ORDER_LIST)
+    return [
+        ('get_products next page', products()),
+        ('get_products by category', products(category='x')),
+        ('get_products by name, next page',
+         products(ordering='name', cursor=encode_cursor({'pk': 1, 'ordering': 'name', 'value': 'x'}))),
+        ('product search', products(search='x')),
+        ('scan_products', products_matching(['x', 'y'])),
+        ('place_order lock', Product.objects.filter(pk__in=[1, 2]).order_by('pk')),
+        ('get_customers next page', list_page(Customer.objects.all(), CustomerSerializer, spec=CUSTOMER_LIST)),
+        ('customer search', list_page(Customer.objects.all(), CustomerSerializer, {'search': 'x'}, spec=CUSTOMER_LIST)),
+        ('add_order customer by email', customer_by_email('x@example.com')),
+        ('get_orders next page', orders()),
+        ('orders by status, newest first', orders(status='PENDING,PROCESSING', ordering='-order_date')),
+        ('orders in a date range', orders(date_from='2025-01-01', date_to='2025-01-31', ordering='-order_date')),
+        ('orders of a customer', orders(customer='1')),
+        ('orders by customer search', orders(search='x')),
+        ('update_order', Order.objects.select_related('customer').filter(pk=1)),
+        ('get_OrderItems next page', list_page(OrderItem.objects.all(), OrderItemSerializer)),
+        ('order items of an order', OrderItem.objects.filter(order_id=1)),
+        ('get_returns next page', list_page(Return.objects.all(), ReturnSerializer)),
+        ('stock movements of a product', list_page(
+            StockMovement.objects.all(), StockMovementSerializer, {'product': '1', 'ordering': '-created_at'},
+            spec=MOVEMENT_LIST)),
+    ]
+
+
+def mysql_full_scans(plan):
+    """Tables read with access_type ALL in a MySQL JSON plan."""
+    found = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('access_type') == 'ALL':
+                found.append(node.get('table_name', '?'))
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(json.loads(plan))
+    return found
+
+
+def sqlite_full_scans(plan):
+    """Tables read with a bare SCAN (no index) in an SQLite query plan."""
+    found = []
+    for line in plan.splitlines():
+        detail = line.split(' ', 3)[-1]
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            found.append(detail.split()[1])
+    return found
+
+
+def postgresql_full_scans(plan):
+    return [line.split(' on ', 1)[1].split()[0] for line in plan.splitlines() if 'Seq Scan on ' in line]
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the queries issued by the API views and fail if any of them scans a whole table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        vendor = connection.vendor
+        if vendor == 'mysql':
+            explain, full_scans = {'format': 'json'}, mysql_full_scans
+        elif vendor == 'sqlite':
+            explain, full_scans = {}, sqlite_full_scans
+        elif vendor == 'postgresql':
+            explain, full_scans = {}, postgresql_full_scans
+        else:
+            raise CommandError(f"Unsupported database vendor: {vendor}")
+
+        failures = []
+        for label, queryset in query_patterns():
+            if label in MYSQL_ONLY and vendor != 'mysql':
+                self.stdout.write(f"skipped    {label} (MySQL only)")
+                continue
+            plan = queryset.using(options['database']).explain(**explain)
+            tables = full_scans(plan)
+            if tables:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}: {', '.join(tables)}"))
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+            else:
+                self.stdout.write(f"ok         {label}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} scan a whole table")
+        self.stdout.write(self.style.SUCCESS("No full table scans."))
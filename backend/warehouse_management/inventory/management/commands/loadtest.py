@@ -0,0 +1,120 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.benchmarks import percentile
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams (GET only)."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def get(self, target):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        request = f"GET {target} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: application/json\r\n\r\n"
+        self.writer.write(request.encode())
+        await self.writer.drain()
+        return await asyncio.wait_for(self.read_response(), self.timeout)
+
+    async def read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by the server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+            await self.close()
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def run_level(url, concurrency, total, timeout):
+    """Send ``total`` GETs from ``concurrency`` connections; returns (latencies, errors, seconds)."""
+    parts = urlsplit(url)
+    target = parts.path + (f'?{parts.query}' if parts.query else '')
+    port = parts.port or 80
+    remaining = iter(range(total))
+    latencies, errors = [], []
+
+    async def worker():
+        connection = HTTPConnection(parts.hostname, port, timeout)
+        try:
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    status = await connection.get(target)
+                except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as exc:
+                    errors.append(type(exc).__name__)
+                    await connection.close()
+                    continue
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors.append(str(status))
+        finally:
+            await connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running server (WSGI or ASGI) with concurrent keep-alive connections, "
+        "e.g. loadtest http://127.0.0.1:8000/get/orders/?limit=100 --concurrency 1,10,50"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="http:// URL of a GET endpoint")
+        parser.add_argument('--concurrency', default='1,10,50', help="Comma separated numbers of connections")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per concurrency level")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for one response")
+
+    def handle(self, *args, **options):
+        parts = urlsplit(options['url'])
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError("Only http:// URLs are supported")
+        try:
+            levels = [int(value) for value in options['concurrency'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma separated list of integers")
+        if not levels or min(levels) < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency and --requests must be positive")
+
+        self.stdout.write(f"{'concurrency':>11}{'requests':>10}{'errors':>8}{'req/s':>10}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for concurrency in levels:
+            latencies, errors, elapsed = asyncio.run(
+                run_level(options['url'], concurrency, options['requests'], options['timeout']))
+            if not latencies:
+                raise CommandError(f"No successful requests at concurrency {concurrency}: {', '.join(set(errors))}")
+            self.stdout.write(
+                f"{concurrency:>11}{len(latencies):>10}{len(errors):>8}{len(latencies) / elapsed:>10.1f}"
+                f"{statistics.median(latencies) * 1000:>10.1f}{percentile(latencies, 0.95) * 1000:>10.1f}"
+                f"{max(latencies) * 1000:>10.1f}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.totals import TOTAL_CHUNK_SIZE, recompute_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute Order.total from the order items for every order, one grouped UPDATE per chunk of orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=TOTAL_CHUNK_SIZE, help="Orders per UPDATE")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} orders")
+
+        result = recompute_totals(options['chunk_size'], progress=progress if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {result['orders']} orders, corrected {result['corrected']} totals."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.forecast import refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the reorder suggestions from the order history and store them for every worker "
+        "(schedule it more often than FORECAST_MAX_AGE_SECONDS)."
+    )
+
+    def handle(self, *args, **options):
+        result = refresh_suggestions()
+        self.stdout.write(self.style.SUCCESS(
+            f"Analysed {result['products_analysed']} products, {len(result['suggestions'])} due for reordering."))
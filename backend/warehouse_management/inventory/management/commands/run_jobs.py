@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connections
+
+from inventory import jobs, worker
+from inventory.models import Job
+
+# Longest wait (seconds) after consecutive database errors
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (see inventory/jobs.py) in a pool of worker processes. "
+        "Start one per machine; several workers can share the queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Jobs run in parallel; 0 runs them one by one in this process")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds between looks at an empty queue")
+        parser.add_argument('--once', action='store_true', help="Exit when no job is due instead of waiting")
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0 or options['poll'] <= 0:
+            raise CommandError("--processes must not be negative and --poll must be positive")
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        self.poll = options['poll']
+        self.failures = 0
+        if options['processes'] == 0:
+            self.run_inline(name, options['poll'], options['once'])
+            return
+        while not self.run_pool(name, options['processes'], options['poll'], options['once']):
+            self.stderr.write("A pool process died; starting a new pool.")
+
+    def report(self, job_id, status):
+        style = self.style.SUCCESS if status == 'DONE' else self.style.WARNING
+        self.stdout.write(style(f"Job {job_id}: {status}"))
+
+    def safely(self, function, *args, default=None):
+        """
+        Call ``function``; on a database error (lock timeout, lost connection...)
+        log it, drop the broken connection, back off and return ``default``.
+        """
+        try:
+            result = function(*args)
+        except DatabaseError as exc:
+            self.failures += 1
+            delay = min(MAX_BACKOFF, self.poll * 2 ** (self.failures - 1))
+            self.stderr.write(f"Database error, retrying in {delay:g}s: {exc}")
+            close_old_connections()
+            time.sleep(delay)
+            return default
+        self.failures = 0
+        return result
+
+    def run_inline(self, name, poll, once):
+        while True:
+            self.safely(jobs.requeue_stale)
+            claimed = self.safely(jobs.claim, name, default=[])
+            if not claimed:
+                if once and not self.failures:
+                    return
+                time.sleep(poll)
+                continue
+            status = self.safely(jobs.execute, claimed[0])
+            if status is not None:
+                self.report(claimed[0], status)
+
+    def run_pool(self, name, processes, poll, once):
+        """Run jobs until the queue is empty (with ``once``); returns False if the pool broke."""
+        # Children must not inherit this process's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        running = {}
+        try:
+            with ProcessPoolExecutor(processes, mp_context=context, initializer=worker.init_worker) as pool:
+                while True:
+                    self.safely(jobs.requeue_stale)
+                    free = processes - len(running)
+                    if free:
+                        for job_id in self.safely(jobs.claim, name, free, default=[]):
+                            running[pool.submit(worker.run_job, job_id)] = job_id
+                    if not running:
+                        if once and not self.failures:
+                            return True
+                        time.sleep(poll)
+                        continue
+                    done, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        try:
+                            self.report(job_id, future.result())
+                        except DatabaseError as exc:
+                            # Recording the outcome failed; the job is requeued once its heartbeat goes stale
+                            self.stderr.write(f"Job {job_id}: database error: {exc}")
+        except BrokenProcessPool:
+            # The jobs of a killed process (e.g. out of memory) count as a failed attempt
+            jobs.requeue(Job.objects.filter(pk__in=running.values()), "Worker process died")
+            return False
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.seeding import seed
+
+
+class Command(BaseCommand):
+    help = "Fill the database with synthetic products, customers, orders and returns (bulk inserts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--max-items', type=int, default=5, help="Maximum order lines per order")
+        parser.add_argument('--return-ratio', type=float, default=0.05, help="Share of order lines returned")
+        parser.add_argument('--days', type=int, default=365, help="Spread order dates over this many past days")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, help="Random seed for a reproducible data set")
+
+    def handle(self, *args, **options):
+        counts = [options[name] for name in ('products', 'customers', 'orders', 'max_items', 'days', 'batch_size')]
+        if min(counts) < 0 or options['batch_size'] < 1 or options['max_items'] < 1:
+            raise CommandError("Counts must not be negative; --batch-size and --max-items must be positive")
+        if not 0 <= options['return_ratio'] <= 1:
+            raise CommandError("--return-ratio must be between 0 and 1")
+
+        created = seed(
+            products=options['products'], customers=options['customers'], orders=options['orders'],
+            max_items=options['max_items'], return_ratio=options['return_ratio'], days=options['days'],
+            batch_size=options['batch_size'], random_seed=options['seed'],
+        )
+        summary = ', '.join(f"{count} {name.replace('_', ' ')}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary}."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from inventory.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Snapshot the stock of products that moved since their last snapshot (run periodically, e.g. nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help="ISO datetime of the snapshot; defaults to a few minutes ago")
+
+    def handle(self, *args, **options):
+        moment = None
+        if options['at']:
+            moment = parse_datetime(options['at'])
+            if moment is None or moment.tzinfo is None:
+                raise CommandError("--at must be an ISO datetime with a timezone")
+        count = take_snapshots(moment)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} stock snapshots."))
@@ -0,0 +1,102 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Metrics are kept per worker process; scrape each worker (or run a single
+process per container) to get complete numbers.
+"""
+import threading
+from collections import defaultdict
+
+from django.http import HttpResponse
+
+from . import cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def samples(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+HISTOGRAMS = [
+    ('wms_request_duration_seconds', "Time spent handling the request, including serialization.", LATENCY_BUCKETS),
+    ('wms_request_db_seconds', "Time spent in database queries per request.", LATENCY_BUCKETS),
+    ('wms_request_db_queries', "Database queries per request.", QUERY_BUCKETS),
+    ('wms_response_size_bytes', "Size of the response body.", SIZE_BUCKETS),
+]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._responses = defaultdict(int)
+
+    def observe(self, route, method, status_code, duration, db_time, db_queries, size):
+        key = (route, method)
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = [Histogram(buckets) for _, _, buckets in HISTOGRAMS]
+            for histogram, value in zip(histograms, (duration, db_time, db_queries, size)):
+                histogram.observe(value)
+            self._responses[(route, method, status_code)] += 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for position, (name, help_text, _) in enumerate(HISTOGRAMS):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), histograms in sorted(self._histograms.items()):
+                    labels = f'route="{escape(route)}",method="{method}"'
+                    lines.extend(histograms[position].samples(name, labels))
+
+            lines.append('# HELP wms_responses_total Responses by route, method and status code.')
+            lines.append('# TYPE wms_responses_total counter')
+            for (route, method, status_code), count in sorted(self._responses.items()):
+                lines.append(f'wms_responses_total{{route="{escape(route)}",method="{method}",'
+                             f'status="{status_code}"}} {count}')
+
+        for name, counter in (('hits', cache.hits), ('misses', cache.misses)):
+            lines.append(f'# HELP wms_response_cache_{name}_total Response cache {name} per namespace.')
+            lines.append(f'# TYPE wms_response_cache_{name}_total counter')
+            for namespace, count in sorted(counter.items()):
+                lines.append(f'wms_response_cache_{name}_total{{namespace="{escape(namespace)}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,102 @@
+import heapq
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger('inventory.performance')
+
+# Slowest queries kept for the slow-request log
+SLOW_QUERIES_LOGGED = 5
+
+
+class QueryTracker:
+    """``connection.execute_wrapper`` hook counting and timing the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            entry = (elapsed, self.count, sql)
+            if len(self.slowest) < SLOW_QUERIES_LOGGED:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heappushpop(self.slowest, entry)
+
+
+@contextmanager
+def track_queries(tracker):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(tracker))
+        yield
+
+
+class PerformanceMiddleware:
+    """
+    Record latency, DB query count, DB time and response size per route.
+
+    The numbers feed the ``/metrics`` endpoint and a ``Server-Timing`` header.
+    Requests slower than ``settings.SLOW_REQUEST_SECONDS`` are logged to the
+    ``inventory.performance`` logger together with their slowest queries.
+    Streaming responses are measured up to the first byte. Works in both
+    WSGI and ASGI deployments, so async views stay async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tracker = QueryTracker()
+        start = time.perf_counter()
+        with track_queries(tracker):
+            response = self.get_response(request)
+        return self.finish(request, response, tracker, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        tracker = QueryTracker()
+        start = time.perf_counter()
+        # Connections are per thread and the async ORM runs queries in the
+        # request's sync thread, so the wrapper is installed there
+        queries = track_queries(tracker)
+        await sync_to_async(queries.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.__exit__)(None, None, None)
+        return self.finish(request, response, tracker, time.perf_counter() - start)
+
+    def finish(self, request, response, tracker, duration):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, duration, tracker.duration, tracker.count, size)
+        response['Server-Timing'] = f'db;dur={tracker.duration * 1000:.1f}, total;dur={duration * 1000:.1f}'
+
+        if duration >= getattr(settings, 'SLOW_REQUEST_SECONDS', 1.0):
+            queries = '\n'.join(f'  {elapsed * 1000:.1f} ms  {sql}'
+                                for elapsed, _, sql in sorted(tracker.slowest, reverse=True))
+            logger.warning("Slow request %s %s: %.0f ms, %d queries, %.0f ms in DB\n%s",
+                           request.method, request.get_full_path(), duration * 1000,
+                           tracker.count, tracker.duration * 1000, queries)
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('result', models.JSONField()),
+            ],
+        ),
+    ]
@@ -1,6 +1,5 @@
-import random
-import string
 from django.db import models
+from django.utils import timezone
 
 class Product(models.Model):
     name = models.CharField(max_length=255)                
@@ -9,12 +8,21 @@ class Product(models.Model):
     category = models.CharField(max_length=100, null=True, blank=True)  
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  
     stock_quantity = models.DecimalField(max_digits=10, decimal_places=2, default=0)  
+    version = models.PositiveIntegerField(default=1)  # Bumped by every update, sent as the ETag
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category'], name='product_category_idx'),
+            models.Index(fields=['name'], name='product_name_idx'),
+        ]
 
     def generate_sku(self):
-        return "SKU-" + ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        from .identifiers import next_sku
+        return next_sku()
 
     def generate_barcode(self):
-        return ''.join(random.choices(string.digits, k=12))
+        from .identifiers import next_barcode
+        return next_barcode()
 
     def save(self, *args, **kwargs):
         if not self.sku:
@@ -38,6 +46,13 @@ class Order(models.Model):
     order_date = models.DateTimeField(auto_now_add=True)  # Data zamówienia
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')  # Status zamówienia
     total = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # Całkowita wartość zamówienia
+    version = models.PositiveIntegerField(default=1)  # Bumped by every update, sent as the ETag
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'order_date'], name='order_status_date_idx'),
+            models.Index(fields=['order_date'], name='order_date_idx'),
+        ]
     
     
     def __str__(self):
@@ -63,6 +78,11 @@ class Return(models.Model):
     return_date = models.DateTimeField(auto_now_add=True)  # Data zwrotu
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')  # Status zwrotu
     notes = models.TextField(null=True, blank=True)  # Dodatkowe informacje o zwrocie
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'return_date'], name='return_status_date_idx'),
+        ]
     
     def __str__(self):
         return f"Return for {self.order_item.product.name}"
@@ -75,6 +95,12 @@ class Customer(models.Model):
     address = models.CharField(max_length=255, null=True, blank=True)  # Adres klienta
     created_at = models.DateTimeField(auto_now_add=True)  # Data utworzenia konta
     updated_at = models.DateTimeField(auto_now=True)    # Data ostatniej aktualizacji
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['first_name', 'last_name'], name='customer_name_idx'),
+            models.Index(fields=['last_name'], name='customer_last_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -92,3 +118,94 @@ class Role(models.Model):
     
     def __str__(self):
         return self.role_name
+
+
+class CodeBlock(models.Model):
+    # Each row reserves a block of SKU/barcode serial numbers, see identifiers.py
+    name = models.CharField(max_length=20)
+
+    def __str__(self):
+        return f"{self.name} block {self.id}"
+
+
+class StockMovement(models.Model):
+    KIND_CHOICES = [
+        ('RECEIPT', 'Receipt'),
+        ('SHIPMENT', 'Shipment'),
+        ('RETURN', 'Return'),
+        ('ADJUSTMENT', 'Adjustment'),
+    ]
+
+    product = models.ForeignKey('Product', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)  # Positive into stock, negative out of stock
+    created_at = models.DateTimeField(default=timezone.now)
+    order_item = models.ForeignKey('OrderItem', on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='movement_product_date_idx'),
+            models.Index(fields=['created_at'], name='movement_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity} of {self.product_id}"
+
+
+class StockSnapshot(models.Model):
+    # Stock of a product at taken_at, derived from the previous snapshot and the movements since
+    product = models.ForeignKey('Product', on_delete=models.CASCADE)
+    taken_at = models.DateTimeField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'taken_at'], name='snapshot_product_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} at {self.taken_at}: {self.quantity}"
+
+
+class Job(models.Model):
+    # Background job run by the run_jobs worker command, see jobs.py
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    progress = models.PositiveSmallIntegerField(default=0)  # Percent done
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # Retries wait here until their backoff ends
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Refreshed while running; stale means the worker died
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.CharField(max_length=255, blank=True, default='')  # Relative to JOB_RESULTS_DIR
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job {self.id} ({self.status})"
+
+
+class ReorderForecast(models.Model):
+    # Reorder suggestions computed by forecast.py; the latest row is served to every worker
+    computed_at = models.DateTimeField(db_index=True)
+    result = models.JSONField()
+
+    def __str__(self):
+        return f"Reorder forecast at {self.computed_at}"
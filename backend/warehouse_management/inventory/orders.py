@@ -0,0 +1,185 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, When
+
+from . import ledger
+from .cache import forget_products, invalidate
+from .models import Order, OrderItem, Product
+from .pagination import ListQueryError
+from .totals import to_cents
+
+# Most orders one bulk request may change
+MAX_BULK_ORDERS = 5000
+
+# Status -> statuses an order may move to
+TRANSITIONS = {
+    'PENDING': {'PROCESSING', 'CANCELLED'},
+    'PROCESSING': {'SHIPPED', 'CANCELLED'},
+    'SHIPPED': set(),
+    'CANCELLED': set(),
+}
+
+# Orders whose items still hold the stock reserved when they were placed
+UNSHIPPED = ('PENDING', 'PROCESSING')
+
+
+class OrderPlacementError(Exception):
+    """The order cannot be placed; ``detail`` is returned to the client."""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class InsufficientStock(OrderPlacementError):
+    pass
+
+
+def place_order(customer, items, status='PENDING'):
+    """
+    Create an order with its items and reserve stock, all in one transaction.
+
+    ``items`` is a list of ``{'product': id, 'quantity': Decimal}``; lines for
+    the same product are merged. The affected products are locked with
+    SELECT ... FOR UPDATE in primary key order, so concurrent checkouts
+    always lock in the same order and cannot deadlock. Stock is decremented
+    with a single UPDATE using F() expressions. Unit prices and the total
+    come from the database, never from the client. An order is placed
+    PENDING or PROCESSING: those are the statuses that hold reserved stock.
+    """
+    if status not in UNSHIPPED:
+        raise OrderPlacementError({'status': [f"An order cannot be placed as {status}"]})
+    quantities = defaultdict(Decimal)
+    for item in items:
+        quantities[item['product']] += item['quantity']
+
+    with transaction.atomic():
+        products = list(Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk'))
+
+        missing = sorted(set(quantities) - {product.pk for product in products})
+        if missing:
+            raise OrderPlacementError({'items': [f"Product {pk} not found." for pk in missing]})
+        unpriced = [product.pk for product in products if product.price is None]
+        if unpriced:
+            raise OrderPlacementError({'items': [f"Product {pk} has no price." for pk in unpriced]})
+        shortages = [
+            {'product': product.pk, 'requested': str(quantities[product.pk]), 'available': str(product.stock_quantity)}
+            for product in products if product.stock_quantity < quantities[product.pk]
+        ]
+        if shortages:
+            raise InsufficientStock({'error': "Insufficient stock", 'shortages': shortages})
+
+        Product.objects.filter(pk__in=quantities).update(
+            stock_quantity=F('stock_quantity') - Case(
+                *[When(pk=pk, then=quantity) for pk, quantity in quantities.items()],
+                output_field=Product._meta.get_field('stock_quantity'),
+            ),
+            version=F('version') + 1,
+        )
+        invalidate('products')
+        forget_products(quantities)
+
+        order = Order.objects.create(
+            customer=customer,
+            status=status,
+            total=to_cents(sum((quantities[product.pk] * product.price for product in products), Decimal('0.00'))),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantities[product.pk], price=product.price)
+            for product in products
+        ])
+        # Read back for the ids, which MySQL's bulk insert doesn't return
+        ledger.record([
+            ledger.movement(item.product_id, 'SHIPMENT', -item.quantity, order_item=item)
+            for item in order.orderitem_set.all()
+        ])
+    return order
+
+
+def allowed_sources(target):
+    """Statuses from which an order may move to ``target``."""
+    return sorted(source for source, targets in TRANSITIONS.items() if target in targets)
+
+
+def lock_orders(queryset, *fields):
+    """Lock the selected orders (in primary key order) and return their ``fields``."""
+    rows = list(queryset.select_for_update().order_by('pk').values_list(*fields)[:MAX_BULK_ORDERS + 1])
+    if len(rows) > MAX_BULK_ORDERS:
+        raise ListQueryError(f"The selection matches more than {MAX_BULK_ORDERS} orders")
+    return rows
+
+
+def release_stock(order_ids, reason):
+    """
+    Put the stock reserved by the items of ``order_ids`` back; call it inside the transaction changing them.
+
+    The quantities are summed per product and applied with one
+    ``UPDATE ... SET stock_quantity = stock_quantity + CASE ...``; every
+    item gets an ADJUSTMENT ledger movement noting ``reason``. Returns the
+    quantity released per product.
+    """
+    items = list(OrderItem.objects.filter(order_id__in=order_ids).order_by('pk')
+                 .values_list('pk', 'order_id', 'product_id', 'quantity'))
+    released = defaultdict(Decimal)
+    for _, _, product_id, quantity in items:
+        released[product_id] += quantity
+    if not released:
+        return released
+
+    # Same lock order as place_order
+    list(Product.objects.select_for_update().filter(pk__in=released).order_by('pk').values_list('pk', flat=True))
+    Product.objects.filter(pk__in=released).update(
+        stock_quantity=F('stock_quantity') + Case(
+            *[When(pk=pk, then=quantity) for pk, quantity in released.items()],
+            output_field=Product._meta.get_field('stock_quantity'),
+        ),
+        version=F('version') + 1,
+    )
+    ledger.record([
+        ledger.movement(product_id, 'ADJUSTMENT', quantity, order_item_id=pk, note=f"Order {order_id} {reason}")
+        for pk, order_id, product_id, quantity in items
+    ])
+    invalidate('products')
+    forget_products(released)
+    return released
+
+
+def transition_orders(queryset, target):
+    """
+    Move the orders of ``queryset`` to status ``target`` where ``TRANSITIONS`` allows it.
+
+    The orders are locked with SELECT ... FOR UPDATE and changed with one
+    ``UPDATE ... WHERE id IN (...) AND status IN (allowed sources)``.
+    Cancelled orders give their reserved stock back (``release_stock``).
+    Returns the changed ids and the orders skipped with their status.
+    """
+    sources = allowed_sources(target)
+    with transaction.atomic():
+        rows = lock_orders(queryset, 'pk', 'status')
+        updated = [pk for pk, status in rows if status in sources]
+        if updated:
+            Order.objects.filter(pk__in=updated, status__in=sources).update(status=target, version=F('version') + 1)
+            if target == 'CANCELLED':
+                release_stock(updated, 'cancelled')  # only unshipped orders can be cancelled
+    return {
+        'status': target,
+        'updated': updated,
+        'skipped': [{'id': pk, 'status': status} for pk, status in rows if status not in sources],
+    }
+
+
+def delete_orders(queryset):
+    """
+    Delete the orders of ``queryset`` with their items and returns; returns the deleted ids.
+
+    Orders not shipped yet give their reserved stock back first.
+    """
+    with transaction.atomic():
+        rows = lock_orders(queryset, 'pk', 'status')
+        ids = [pk for pk, _ in rows]
+        if ids:
+            release_stock([pk for pk, status in rows if status in UNSHIPPED], 'deleted')
+            Order.objects.filter(pk__in=ids).delete()
+    return ids
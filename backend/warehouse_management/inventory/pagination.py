@@ -0,0 +1,202 @@
+import base64
+import binascii
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .fastpath import compile_rows
+
+# Rozmiar strony, gdy klient poda cursor bez limitu
+DEFAULT_PAGE_SIZE = 100
+# Górna granica parametru limit
+MAX_PAGE_SIZE = 1000
+
+
+class ListQueryError(ValueError):
+    """Invalid query parameters passed to a list endpoint."""
+
+
+def encode_cursor(position):
+    payload = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ListQueryError("Invalid cursor")
+    if not isinstance(position, dict) or not isinstance(position.get('pk'), int):
+        raise ListQueryError("Invalid cursor")
+    return position
+
+
+def parse_fields(params, serializer_class):
+    """Return the serializer fields requested with ``?fields=``, in serializer order."""
+    raw = params.get('fields')
+    if not raw:
+        return None
+
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    available = serializer_class.Meta.fields
+    unknown = sorted(requested.difference(available))
+    if unknown:
+        raise ListQueryError(f"Unknown fields: {', '.join(unknown)}")
+    return [name for name in available if name in requested]
+
+
+def parse_limit(params):
+    raw = params.get('limit')
+    if raw is None:
+        return None
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ListQueryError("limit must be an integer")
+    if limit < 1:
+        raise ListQueryError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def order_by_keyset(queryset, order_field, descending, position=None):
+    """
+    Order ``queryset`` by ``order_field`` with the primary key as tie-breaker
+    and, given a cursor ``position``, keep only the rows after it:
+    ``WHERE field > v OR (field = v AND id > last_id)`` (reversed when descending).
+    """
+    direction = '-' if descending else ''
+    after = 'lt' if descending else 'gt'
+    if order_field == 'id':
+        queryset = queryset.order_by(f'{direction}pk')
+        if position is not None:
+            queryset = queryset.filter(**{f'pk__{after}': position['pk']})
+        return queryset
+
+    queryset = queryset.order_by(f'{direction}{order_field}', f'{direction}pk')
+    if position is not None:
+        if 'value' not in position:
+            raise ListQueryError("Invalid cursor")
+        value = position['value']
+        try:
+            queryset = queryset.filter(
+                Q(**{f'{order_field}__{after}': value}) | Q(**{order_field: value, f'pk__{after}': position['pk']})
+            )
+        except (ValidationError, ValueError, TypeError):
+            raise ListQueryError("Invalid cursor")
+    return queryset
+
+
+def cursor_for(row, order_field, ordering):
+    position = {'pk': row.pk}
+    if order_field != 'id':
+        position['ordering'] = ordering
+        position['value'] = row._meta.get_field(order_field).value_to_string(row)
+    return encode_cursor(position)
+
+
+class ListQuery:
+    """
+    A parsed list request: the filtered and ordered queryset plus paging.
+
+    ``payload()`` and ``apayload()`` run it from sync and async views.
+    Serializers supported by fastpath.py are rendered from ``values_list()``
+    rows instead of model instances.
+    """
+
+    def __init__(self, params, queryset, serializer_class, related=(), spec=None):
+        self.serializer_class = serializer_class
+        self.fields = parse_fields(params, serializer_class)
+        self.limit = parse_limit(params)
+        self.order_field, descending = spec.parse_ordering(params) if spec else ('id', False)
+        self.ordering = ('-' if descending else '') + self.order_field
+        cursor = params.get('cursor')
+        self.position = decode_cursor(cursor) if cursor else None
+        if self.position is not None and self.position.get('ordering', 'id') != self.ordering:
+            raise ListQueryError("Cursor does not match ordering")
+        if spec:
+            queryset = spec.filter(queryset, params)
+        queryset = order_by_keyset(queryset, self.order_field, descending, self.position)
+
+        self.plan = compile_rows(serializer_class, queryset, self.fields)
+        if self.plan is None:
+            if self.fields:
+                related = [name for name in related if name.split('__')[0] in self.fields]
+                # Annotations can't be deferred, only model columns
+                columns = {field.name for field in queryset.model._meta.concrete_fields}
+                queryset = queryset.only(*[name for name in self.fields if name in columns], self.order_field)
+            if related:
+                queryset = queryset.select_related(*related)
+        self.queryset = queryset
+
+    @property
+    def paginated(self):
+        return self.limit is not None or self.position is not None
+
+    @property
+    def page_size(self):
+        return self.limit or DEFAULT_PAGE_SIZE
+
+    @property
+    def keys(self):
+        # Extra columns fetched with fast path rows to build the next cursor
+        return ('pk',) if self.order_field == 'id' else ('pk', self.order_field)
+
+    def next_url(self, request, last_row):
+        next_cursor = cursor_for(last_row, self.order_field, self.ordering)
+        return replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+
+    def serialize(self, rows):
+        return self.serializer_class(rows, many=True, fields=self.fields).data
+
+    def page(self, request, rows):
+        """``{"next", "results"}`` from up to ``page_size + 1`` fetched rows."""
+        next_url = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last_row = rows[-1]
+            if self.plan is not None:
+                # cursor_for() only reads the key fields, so an unsaved instance is enough
+                last_row = self.queryset.model(**dict(zip(self.keys, last_row[1])))
+            next_url = self.next_url(request, last_row)
+        results = [row for row, _ in rows] if self.plan is not None else self.serialize(rows)
+        return {'next': next_url, 'results': results}
+
+    def payload(self, request):
+        if not self.paginated:
+            return self.plan.rows(self.queryset) if self.plan is not None else self.serialize(self.queryset)
+        # Jeden dodatkowy wiersz mówi, czy istnieje następna strona
+        window = self.queryset[:self.page_size + 1]
+        rows = self.plan.rows(window, extra=self.keys) if self.plan is not None else list(window)
+        return self.page(request, rows)
+
+    async def apayload(self, request):
+        if self.plan is None:
+            return await sync_to_async(self.payload)(request)
+        if not self.paginated:
+            return await self.plan.arows(self.queryset)
+        return self.page(request, await self.plan.arows(self.queryset[:self.page_size + 1], extra=self.keys))
+
+
+def list_response(request, queryset, serializer_class, related=(), spec=None):
+    """
+    Serialize ``queryset`` for a list endpoint.
+
+    Without ``cursor``/``limit`` the whole queryset is returned as a plain list,
+    as before. With either of them the rows are paginated by keyset
+    (``WHERE id > last_id ORDER BY id LIMIT n``) and wrapped in
+    ``{"next": ..., "results": [...]}``; ``next`` is None on the last page.
+    ``?fields=a,b`` narrows both the SELECT and the serialized output.
+    ``related`` lists foreign keys rendered by nested serializers; they are
+    joined with ``select_related`` unless projected away. ``spec`` (see
+    filters.ListSpec) adds filtering, ``?search=`` and ``?ordering=``.
+    """
+    try:
+        query = ListQuery(request.query_params, queryset, serializer_class, related, spec)
+    except ListQueryError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(query.payload(request))
@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import ledger
+from .cache import forget_products, invalidate
+from .models import Product
+from .orders import InsufficientStock
+from .versioning import VersionConflict, versioned_update
+
+
+def save_product_changes(product, changes, stock_delta=None, check_version=False):
+    """
+    Write the validated ``changes`` of ``product`` in a single UPDATE.
+
+    ``stock_delta`` moves the stock relative to its level in the database
+    (``stock_quantity = stock_quantity + delta``), so concurrent pickers
+    neither wait for nor overwrite each other; it may not take the stock
+    below zero. With ``check_version`` (the client sent ``If-Match``), or
+    when ``stock_quantity`` is set outright, the row is only written if it
+    is still at ``product.version``: the ledger needs the level being
+    replaced. Returns the product as stored.
+    """
+    changes = dict(changes)
+    for field in ('sku', 'barcode'):
+        if field in changes and not changes[field]:
+            # Same as Product.save(): a blank code is replaced by a generated one
+            changes[field] = getattr(product, f'generate_{field}')()
+
+    queryset = Product.objects.filter(pk=product.pk)
+    if stock_delta:
+        changes['stock_quantity'] = F('stock_quantity') + stock_delta
+        if stock_delta < 0:
+            queryset = queryset.filter(stock_quantity__gte=-stock_delta)
+        adjustment = stock_delta
+    elif 'stock_quantity' in changes:
+        check_version = True
+        adjustment = changes['stock_quantity'] - product.stock_quantity
+    else:
+        adjustment = 0
+
+    with transaction.atomic():
+        if not versioned_update(queryset, product.version if check_version else None, **changes):
+            current = Product.objects.filter(pk=product.pk).values_list('version', 'stock_quantity').first()
+            if current is None:
+                raise Product.DoesNotExist
+            if check_version and current[0] != product.version:
+                raise VersionConflict
+            raise InsufficientStock({'error': "Insufficient stock", 'shortages': [
+                {'product': product.pk, 'requested': str(-stock_delta), 'available': str(current[1])}]})
+        ledger.record([ledger.movement(product.pk, 'ADJUSTMENT', adjustment)])
+        # QuerySet.update() doesn't send post_save
+        invalidate('products')
+        forget_products([product.pk])
+
+    if check_version and not stock_delta:
+        # Nobody else wrote in between: the stored row is the one read plus the changes
+        for field, value in changes.items():
+            setattr(product, field, value)
+        product.version += 1
+    else:
+        product.refresh_from_db()
+    return product
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, When
+
+from . import ledger
+from .cache import forget_products, invalidate
+from .models import OrderItem, Product, Return
+
+# Most returns one request may decide
+MAX_BULK_RETURNS = 5000
+
+# Only pending returns can be decided
+DECISIONS = ('APPROVED', 'REJECTED')
+
+
+def decide_returns(ids, decision, notes=None):
+    """
+    Approve or reject the pending returns among ``ids``.
+
+    The returns of the order items concerned are locked with SELECT ...
+    FOR UPDATE and the decided ones get their status with one UPDATE. An
+    approved return puts the whole quantity of its order item back in
+    stock, so an order item is restocked once: a second return of an item
+    already approved (earlier or in the same batch) is skipped and stays
+    pending. Only items of shipped orders can be approved; the stock of an
+    unshipped order is still reserved and goes back when it is cancelled or
+    deleted (orders.release_stock). The quantities are summed per product and applied with a
+    single ``UPDATE ... SET stock_quantity = stock_quantity + CASE ...``,
+    and every approved return gets a RETURN ledger movement. Returns the
+    decided ids, the skipped returns with their status, and the quantity
+    restocked per product.
+    """
+    with transaction.atomic():
+        item_ids = set(Return.objects.filter(pk__in=ids).values_list('order_item_id', flat=True))
+        # Every return of these items, so concurrent approvals of one item wait for each other
+        locked = list(Return.objects.select_for_update().filter(order_item_id__in=item_ids).order_by('pk')
+                      .values_list('pk', 'status', 'order_item_id'))
+        requested = set(ids)
+        rows = [row for row in locked if row[0] in requested]
+        returned = {item_id for _, status, item_id in locked if status == 'APPROVED'}
+        # Shipped is final (orders.TRANSITIONS), so the order rows need no lock
+        shipped = set(OrderItem.objects.filter(pk__in=item_ids, order__status='SHIPPED')
+                      .values_list('pk', flat=True)) if decision == 'APPROVED' else set()
+        decided, skipped = [], []
+        for pk, status, item_id in rows:
+            if status != 'PENDING':
+                skipped.append({'id': pk, 'status': status})
+            elif decision == 'APPROVED' and item_id not in shipped:
+                skipped.append({'id': pk, 'status': status, 'reason': "Order not shipped"})
+            elif decision == 'APPROVED' and item_id in returned:
+                skipped.append({'id': pk, 'status': status, 'reason': "Order item already returned"})
+            else:
+                decided.append((pk, item_id))
+                if decision == 'APPROVED':
+                    returned.add(item_id)
+        restocked = defaultdict(Decimal)
+
+        if decided:
+            changes = {'status': decision}
+            if notes is not None:
+                changes['notes'] = notes
+            Return.objects.filter(pk__in=[pk for pk, _ in decided], status='PENDING').update(**changes)
+
+        if decided and decision == 'APPROVED':
+            items = OrderItem.objects.in_bulk([item_id for _, item_id in decided])
+            for _, item_id in decided:
+                restocked[items[item_id].product_id] += items[item_id].quantity
+            Product.objects.filter(pk__in=restocked).update(
+                stock_quantity=F('stock_quantity') + Case(
+                    *[When(pk=pk, then=quantity) for pk, quantity in restocked.items()],
+                    output_field=Product._meta.get_field('stock_quantity'),
+                ),
+                version=F('version') + 1,
+            )
+            ledger.record([
+                ledger.movement(items[item_id].product_id, 'RETURN', items[item_id].quantity,
+                                order_item_id=item_id, note=f"Return {pk}")
+                for pk, item_id in decided
+            ])
+            invalidate('products')
+            forget_products(restocked)
+
+    return {
+        'status': decision,
+        'updated': [pk for pk, _ in decided],
+        'skipped': skipped,
+        'restocked': {str(pk): str(quantity) for pk, quantity in sorted(restocked.items())},
+    }
@@ -0,0 +1,194 @@
+"""
+Read-replica routing.
+
+``ReplicaMiddleware`` turns on replica reads for GET/HEAD requests (list
+views, stats, exports); ``ReplicaRouter`` then sends their queries to the
+aliases in ``settings.DATABASE_REPLICAS`` round-robin. Replicas lagging
+more than ``REPLICA_MAX_LAG_SECONDS`` behind the primary are skipped; if
+all of them lag, reads fall back to ``default``. Writes, and every query
+outside a GET request (mutating views, commands), use ``default``.
+
+After a mutating request the middleware pins that client's reads to the
+primary for ``REPLICA_PIN_SECONDS``, so a client sees its own writes
+(read-your-writes). The pin is sent both as a cookie and as the
+``X-Primary-Until`` response header: browsers calling the API cross-site
+don't send the cookie back, so the frontend echoes the header instead.
+"""
+import asyncio
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger('inventory.routers')
+
+PIN_COOKIE = 'wms_primary_until'
+PIN_HEADER = 'X-Primary-Until'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let the queries of this block (thread or async task) read from replicas."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def max_lag():
+    return getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def mysql_replica_status(cursor):
+    # SHOW REPLICA STATUS is MySQL 8.0.22+ / MariaDB 10.5.1+; older servers only know the SLAVE spelling
+    try:
+        cursor.execute('SHOW REPLICA STATUS')
+    except DatabaseError:
+        cursor.execute('SHOW SLAVE STATUS')
+    return cursor.fetchone()
+
+
+def measure_lag(alias):
+    """Replication lag of ``alias`` in seconds; ``math.inf`` if it is unreachable or not replicating."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                row = mysql_replica_status(cursor)
+                if row is None:
+                    return 0.0  # not configured as a replica (e.g. a managed read endpoint)
+                columns = [column[0] for column in cursor.description]
+                name = 'Seconds_Behind_Source' if 'Seconds_Behind_Source' in columns else 'Seconds_Behind_Master'
+                lag = row[columns.index(name)]
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())')
+                lag = cursor.fetchone()[0] or 0.0
+            else:
+                # SQLite and others can't tell; local stand-ins count as up to date
+                lag = 0.0
+    except DatabaseError as exc:
+        logger.warning("Cannot measure the replication lag of %s: %s", alias, exc)
+        return math.inf
+    return math.inf if lag is None else float(lag)
+
+
+class LagMonitor:
+    """Replication lag per alias, measured at most once per ``interval`` seconds."""
+
+    def __init__(self, measure=measure_lag, interval=5.0):
+        self.measure = measure
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._lags = {}
+
+    def lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._lags.get(alias)
+        if checked is not None and now - checked[0] < self.interval:
+            return checked[1]
+        if in_event_loop():
+            # No blocking query on the event loop: use the last value, or assume the replica is fine
+            return checked[1] if checked is not None else 0.0
+        lag = self.measure(alias)
+        with self._lock:
+            self._lags[alias] = (now, lag)
+        if lag > max_lag():
+            logger.warning("Replica %s excluded from reads: %s s behind the primary (limit %s s)", alias, lag, max_lag())
+        return lag
+
+
+class ReplicaRouter:
+    def __init__(self, monitor=None):
+        self.monitor = monitor or LagMonitor()
+        self._turn = itertools.count()
+
+    def replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self.replicas()
+        if not replicas or not _replica_reads.get():
+            return None
+        start = next(self._turn)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.monitor.lag(alias) <= max_lag():
+                return alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return False if db in self.replicas() else None
+
+
+class ReplicaMiddleware:
+    """Enable replica reads for GET/HEAD requests and pin a client to the primary after it writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def use_replicas(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        pinned_until = 0
+        for value in (request.COOKIES.get(PIN_COOKIE), request.headers.get(PIN_HEADER)):
+            try:
+                pinned_until = max(pinned_until, float(value or 0))
+            except ValueError:
+                pass
+        return time.time() >= pinned_until
+
+    def finish(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            seconds = pin_seconds()
+            pinned_until = f'{time.time() + seconds:.3f}'
+            response.set_cookie(PIN_COOKIE, pinned_until, max_age=seconds, httponly=True, samesite='Lax')
+            response[PIN_HEADER] = pinned_until
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.use_replicas(request)):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so ORM calls in worker threads see the flag
+        with replica_reads(self.use_replicas(request)):
+            response = await self.get_response(request)
+        return self.finish(request, response)
@@ -0,0 +1,171 @@
+"""
+Product lookup by scanned code (barcode or SKU).
+
+Both columns have unique indexes, so a batch of codes is one
+``WHERE barcode IN (...) OR sku IN (...)`` query. Found products are kept
+in a bounded LRU cache in the process (``SCAN_CACHE_SIZE`` codes), so a
+warm lookup is a dict access plus one ``get_many`` of the cache backend
+instead of a database round trip. Each entry is tagged with its product's
+token from the cache backend (``cache.product_key``); every product write
+(``update_product``, ``delete_product``, orders, bulk imports, returns)
+drops the tokens of the products it changed with ``cache.forget_products``,
+so only their entries go stale, in every process sharing the cache backend.
+Entries also expire after ``SCAN_CACHE_SECONDS``: that bounds how long a
+process keeps a product changed elsewhere when the backend is per process
+(LocMem), or when a write commits while its row is being fetched. Unknown
+codes are not cached.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import cache
+from .fastpath import compile_rows
+from .models import Product
+from .versioning import version_etag
+
+# Most codes one batch request may look up
+MAX_SCAN_CODES = 1000
+
+
+def cache_size():
+    return getattr(settings, 'SCAN_CACHE_SIZE', 10000)
+
+
+def cache_seconds():
+    return getattr(settings, 'SCAN_CACHE_SECONDS', 30)
+
+
+class LRUCache:
+    """Thread-safe mapping that drops its least recently used keys beyond ``cache_size()``."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set_many(self, entries):
+        size = cache_size()
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# code -> (product pk, token, expiry on the monotonic clock, row, ETag)
+hot = LRUCache()
+
+_plan = None
+
+
+def plan():
+    global _plan
+    if _plan is None:
+        from .serializers import ProductSerializer  # serializers.py imports MAX_SCAN_CODES
+        _plan = compile_rows(ProductSerializer, Product.objects.all())
+    return _plan
+
+
+def products_matching(codes):
+    return Product.objects.filter(Q(barcode__in=codes) | Q(sku__in=codes))
+
+
+def unexpired(codes):
+    """The ``{code: entry}`` of ``codes`` that have an entry younger than ``cache_seconds()``."""
+    now = time.monotonic()
+    entries = {}
+    for code in codes:
+        entry = hot.get(code)
+        if entry is not None and entry[2] > now:
+            entries[code] = entry
+    return entries
+
+
+def cached(codes, entries, tokens):
+    """Split ``codes`` into the ``{code: (row, etag)}`` whose token is current and the codes to fetch."""
+    found, missing = {}, []
+    for code in codes:
+        entry = entries.get(code)
+        if entry is not None and tokens.get(cache.product_key(entry[0])) == entry[1]:
+            found[code] = entry[3:]
+        else:
+            missing.append(code)
+    cache.hits['scan'] += len(found)
+    cache.misses['scan'] += len(missing)
+    return found, missing
+
+
+def token_keys(entries):
+    return {cache.product_key(entry[0]) for entry in entries.values()}
+
+
+def new_tokens(keys, tokens):
+    # Products nobody looked up since their last write get a fresh token
+    return {key: time.time_ns() for key in keys if key not in tokens}
+
+
+def store(codes, rows, tokens):
+    """Match fetched ``(row, (version,))`` pairs to ``codes`` and cache them; a barcode wins over a SKU."""
+    expires = time.monotonic() + cache_seconds()
+    by_sku, by_barcode = {}, {}
+    for row, (row_version,) in rows:
+        entry = (row['id'], tokens[cache.product_key(row['id'])], expires, row, version_etag(row_version))
+        by_sku[row['sku']] = entry
+        if row['barcode']:
+            by_barcode[row['barcode']] = entry
+    found, entries = {}, {}
+    for code in codes:
+        entry = by_barcode.get(code) or by_sku.get(code)
+        if entry is not None:
+            entries[code] = entry
+            found[code] = entry[3:]
+    hot.set_many(entries)
+    return found
+
+
+def lookup(codes):
+    """``{code: (product row, ETag)}`` for the ``codes`` that match a product."""
+    entries = unexpired(codes)
+    backend = cache.get_cache()
+    found, missing = cached(codes, entries, backend.get_many(token_keys(entries)))
+    if missing:
+        rows = plan().rows(products_matching(missing), extra=('version',))
+        keys = {cache.product_key(row['id']) for row, _ in rows}
+        tokens = backend.get_many(keys)
+        created = new_tokens(keys, tokens)
+        backend.set_many(created, timeout=None)
+        found.update(store(missing, rows, {**tokens, **created}))
+    return found
+
+
+async def alookup(codes):
+    """``lookup()`` for async views."""
+    entries = unexpired(codes)
+    backend = cache.get_cache()
+    found, missing = cached(codes, entries, await backend.aget_many(token_keys(entries)))
+    if missing:
+        rows = await plan().arows(products_matching(missing), extra=('version',))
+        keys = {cache.product_key(row['id']) for row, _ in rows}
+        tokens = await backend.aget_many(keys)
+        created = new_tokens(keys, tokens)
+        await backend.aset_many(created, timeout=None)
+        found.update(store(missing, rows, {**tokens, **created}))
+    return found
@@ -0,0 +1,124 @@
+"""
+Synthetic warehouse data for benchmarks and local development.
+
+Everything is written with ``bulk_create``. Ids of the new rows are read
+back as ``id > previous maximum``, which works on MySQL too, where bulk
+inserts don't return primary keys. The seed should therefore not run
+concurrently with other writers.
+"""
+import datetime
+import random
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import ledger
+from .identifiers import allocate_barcodes, allocate_skus
+from .models import Customer, Order, OrderItem, Product, Return, StockMovement
+
+CATEGORIES = ['Electronics', 'Food', 'Clothing', 'Tools', 'Garden', 'Toys', 'Office', 'Health', None]
+FIRST_NAMES = ['Anna', 'Jan', 'Maria', 'Piotr', 'Katarzyna', 'Tomasz', 'Ewa', 'Michał', 'Agnieszka', 'Paweł']
+LAST_NAMES = ['Nowak', 'Kowalski', 'Wiśniewski', 'Wójcik', 'Kamiński', 'Lewandowski', 'Zieliński', 'Szymański']
+ORDER_STATUSES = [code for code, _ in Order.STATUS_CHOICES]
+RETURN_STATUSES = [code for code, _ in Return.STATUS_CHOICES]
+
+
+def max_id(model):
+    return model.objects.aggregate(top=Max('id'))['top'] or 0
+
+
+def new_ids(model, previous_max):
+    return list(model.objects.filter(id__gt=previous_max).order_by('id').values_list('id', flat=True))
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Let bulk_create keep the given auto_now_add dates instead of overwriting them with now()."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def seed(products=1000, customers=200, orders=1000, max_items=5, return_ratio=0.05, days=365,
+         batch_size=1000, random_seed=None):
+    """Insert the given volumes of rows in one transaction; returns a dict of created counts."""
+    rng = random.Random(random_seed)
+    run = uuid.uuid4().hex[:8]
+    now = timezone.now()
+
+    with transaction.atomic():
+        before = max_id(Product)
+        skus, barcodes = allocate_skus(products), allocate_barcodes(products)
+        Product.objects.bulk_create([
+            Product(name=f"Product {run}-{i}", sku=skus[i], barcode=barcodes[i],
+                    category=rng.choice(CATEGORIES),
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                    stock_quantity=rng.randint(0, 1000))
+            for i in range(products)
+        ], batch_size=batch_size)
+        product_rows = list(Product.objects.filter(id__gt=before).values_list('id', 'price', 'stock_quantity'))
+
+        before = max_id(Customer)
+        Customer.objects.bulk_create([
+            Customer(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                     email=f"seed-{run}-{i}@example.com", phone=f"+48{rng.randint(100000000, 999999999)}")
+            for i in range(customers)
+        ], batch_size=batch_size)
+        customer_ids = new_ids(Customer, before)
+
+        # Items are planned first so each order's total matches its items
+        plans = []
+        for _ in range(orders if product_rows and customer_ids else 0):
+            lines = rng.sample(product_rows, min(rng.randint(1, max_items), len(product_rows)))
+            items = [(pk, Decimal(rng.randint(1, 10)), price) for pk, price, _ in lines]
+            total = sum(quantity * price for _, quantity, price in items)
+            plans.append((now - datetime.timedelta(seconds=rng.randint(0, days * 86400)), items, total))
+
+        before = max_id(Order)
+        with explicit_dates(Order._meta.get_field('order_date')):
+            Order.objects.bulk_create([
+                Order(customer_id=rng.choice(customer_ids), order_date=order_date,
+                      status=rng.choice(ORDER_STATUSES), total=total)
+                for order_date, _, total in plans
+            ], batch_size=batch_size)
+        order_ids = new_ids(Order, before)
+
+        before = max_id(OrderItem)
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order_id, product_id=pk, quantity=quantity, price=price)
+            for order_id, (_, items, _) in zip(order_ids, plans)
+            for pk, quantity, price in items
+        ], batch_size=batch_size)
+        items = list(OrderItem.objects.filter(id__gt=before).values_list('id', 'order_id', 'product_id', 'quantity'))
+        order_dates = {order_id: order_date for order_id, (order_date, _, _) in zip(order_ids, plans)}
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=product_id, kind='SHIPMENT', quantity=-quantity,
+                          order_item_id=item_id, created_at=order_dates[order_id])
+            for item_id, order_id, product_id, quantity in items
+        ], batch_size=batch_size)
+
+        # Opening receipts cover the current stock plus everything shipped since, so the ledger adds up
+        shipped = Counter()
+        for _, _, product_id, quantity in items:
+            shipped[product_id] += quantity
+        opening = now - datetime.timedelta(days=days, seconds=1)
+        ledger.record([ledger.movement(pk, 'RECEIPT', stock + shipped[pk], created_at=opening)
+                       for pk, _, stock in product_rows])
+
+        returned = rng.sample(items, int(len(items) * return_ratio))
+        Return.objects.bulk_create([
+            Return(order_item_id=item_id, status=rng.choice(RETURN_STATUSES), notes="Seeded return")
+            for item_id, _, _, _ in returned
+        ], batch_size=batch_size)
+
+    return {'products': len(product_rows), 'customers': len(customer_ids), 'orders': len(order_ids),
+            'order_items': len(items), 'returns': len(returned)}
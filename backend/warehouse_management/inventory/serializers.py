@@ -1,7 +1,21 @@
+from decimal import Decimal
+
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Product, Customer, Order, Return, OrderItem, Role
+from .models import Product, Customer, Order, Return, OrderItem, Role, StockMovement, Job
+from .returns import DECISIONS, MAX_BULK_RETURNS
+from .scan import MAX_SCAN_CODES
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    # Optional `fields` argument limits the serialized output to the given field names
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsModelSerializer):
     # Remove read_only=True to allow updating these fields
     sku = serializers.CharField(required=False, allow_blank=True)
     barcode = serializers.CharField(required=False, allow_blank=True)
@@ -12,18 +26,38 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['id', 'name', 'sku', 'category', 'price', 'stock_quantity', 'barcode']
 
-class CustomerSerializer(serializers.ModelSerializer):
+class ProductUpdateSerializer(ProductSerializer):
+    # PATCH may move the stock relative to its current level instead of setting it
+    stock_delta = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, write_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['stock_delta']
+
+    def validate(self, attrs):
+        if 'stock_delta' in attrs and 'stock_quantity' in attrs:
+            raise serializers.ValidationError("Send either stock_quantity or stock_delta, not both.")
+        return attrs
+
+class CustomerSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Customer
         fields = ['id', 'first_name', 'last_name', 'email', 'phone', 'address', 'created_at', 'updated_at']
 
+class CustomerUpsertSerializer(serializers.ModelSerializer):
+    # Customer matched by email: no unique check, an existing email is the customer itself
+    email = serializers.EmailField(max_length=254)
+
+    class Meta:
+        model = Customer
+        fields = ['first_name', 'last_name', 'email', 'phone', 'address']
+
 class CustomerUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = ['first_name', 'last_name', 'email', 'phone', 'address', 'updated_at']
         read_only_fields = ['updated_at']  # Prevents manual modification of updated_at
 
-class OrdersSerializer(serializers.ModelSerializer):
+class OrdersSerializer(DynamicFieldsModelSerializer):
     customer = CustomerSerializer()
 
     class Meta:
@@ -31,18 +65,58 @@ class OrdersSerializer(serializers.ModelSerializer):
         fields = ['id', 'customer', 'order_date', 'status', 'total']
 
         
-class ReturnSerializer(serializers.ModelSerializer):
+class ReturnSerializer(DynamicFieldsModelSerializer):
      id = serializers.IntegerField(read_only=True)  
      class Meta:
          model = Return
          fields = ['id', 'status', 'order_item', 'return_date', 'notes']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsModelSerializer):
      id = serializers.IntegerField(read_only=True)
      class Meta:
          model = OrderItem
          fields = ['id', 'order', 'product', 'quantity', 'price']
 
+class OrderLineSerializer(serializers.Serializer):
+    # One line of a new order; price is taken from the product
+    product = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+
+class OrderSelectionSerializer(serializers.Serializer):
+    # Orders picked by a list of ids or by the filters of the orders list (status, customer, date_from, ...)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    filter = serializers.DictField(child=serializers.CharField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Pass either 'ids' or 'filter'.")
+        return attrs
+
+class OrderStatusChangeSerializer(OrderSelectionSerializer):
+    status = serializers.CharField()
+
+    def validate_status(self, value):
+        value = value.upper()
+        if value not in dict(Order.STATUS_CHOICES):
+            raise serializers.ValidationError(f"Invalid status '{value}'")
+        return value
+
+class ScanSerializer(serializers.Serializer):
+    codes = serializers.ListField(child=serializers.CharField(max_length=100), allow_empty=False,
+                                  max_length=MAX_SCAN_CODES)
+
+class ReturnDecisionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                max_length=MAX_BULK_RETURNS)
+    status = serializers.CharField()
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_status(self, value):
+        value = value.upper()
+        if value not in DECISIONS:
+            raise serializers.ValidationError(f"Status must be one of {', '.join(DECISIONS)}")
+        return value
+
 class OrderUpdateSerializer(serializers.ModelSerializer):
     customer_first_name = serializers.CharField(write_only=True)
     customer_last_name = serializers.CharField(write_only=True)
@@ -54,4 +128,31 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
 class RoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Role
-        fields = ['id', 'role_name']  # Zwracamy id i name roli
\ No newline at end of file
+        fields = ['id', 'role_name']  # Zwracamy id i name roli
+
+class StockMovementSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'product', 'kind', 'quantity', 'created_at', 'order_item', 'note']
+
+class ProductStockSerializer(DynamicFieldsModelSerializer):
+    # Stock at the requested moment, annotated by ledger.stock_levels()
+    stock_at = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'sku', 'category', 'stock_at']
+
+class JobSerializer(serializers.ModelSerializer):
+    # Params are left out: an import job carries its whole payload
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'attempts', 'max_attempts', 'created_at', 'started_at',
+                  'finished_at', 'error', 'result', 'result_url']
+
+    def get_result_url(self, job):
+        if not job.result_file:
+            return None
+        return reverse('get_job_result', kwargs={'id': job.id})
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import forget_products, invalidate
+from .models import Customer, Order, OrderItem, Product, Role
+from .totals import refresh_totals
+
+# Cached response namespaces affected by changes of each model
+CACHE_NAMESPACES = {
+    Product: ('products',),
+    Customer: ('customers',),
+    Role: ('roles',),
+}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_responses(sender, **kwargs):
+    namespaces = CACHE_NAMESPACES.get(sender)
+    if namespaces:
+        invalidate(*namespaces)
+    if sender is Product:
+        forget_products([kwargs['instance'].pk])
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_order_total(sender, instance, origin=None, **kwargs):
+    # Items deleted along with their order leave nothing to total
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return
+    refresh_totals([instance.order_id])
@@ -0,0 +1,81 @@
+import datetime
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, Product
+
+# Default threshold of the "Low Stock Alerts" card
+LOW_STOCK_THRESHOLD = Decimal('10')
+# Days of revenue history returned by default and at most
+REVENUE_DAYS = 30
+MAX_REVENUE_DAYS = 366
+
+CENT = Decimal('0.01')
+
+
+def money(value):
+    return str((value or Decimal('0')).quantize(CENT))
+
+
+def inventory_stats(low_stock_threshold):
+    """Per-category and overall stock figures from a single grouped query."""
+    stock_value = ExpressionWrapper(F('price') * F('stock_quantity'),
+                                    output_field=DecimalField(max_digits=22, decimal_places=4))
+    rows = (Product.objects.values('category')
+            .annotate(products=Count('id'),
+                      quantity=Sum('stock_quantity'),
+                      value=Sum(stock_value),
+                      low_stock=Count('id', filter=Q(stock_quantity__lte=low_stock_threshold)))
+            .order_by('category'))
+
+    categories = []
+    totals = {'products': 0, 'quantity': Decimal('0'), 'value': Decimal('0'), 'low_stock': 0}
+    for row in rows:
+        for key in totals:
+            totals[key] += row[key] or 0
+        categories.append({
+            'category': row['category'],
+            'products': row['products'],
+            'stock_quantity': money(row['quantity']),
+            'stock_value': money(row['value']),
+            'low_stock': row['low_stock'],
+        })
+
+    return {
+        'products': totals['products'],
+        'stock_quantity': money(totals['quantity']),
+        'stock_value': money(totals['value']),
+        'low_stock': totals['low_stock'],
+        'categories': categories,
+    }
+
+
+def order_stats(days):
+    """Order counts and revenue per status, plus daily revenue for the last ``days`` days."""
+    by_status = {code: {'count': 0, 'revenue': Decimal('0')} for code, _ in Order.STATUS_CHOICES}
+    for row in Order.objects.values('status').annotate(count=Count('id'), revenue=Sum('total')).order_by():
+        by_status[row['status']] = {'count': row['count'], 'revenue': row['revenue'] or Decimal('0')}
+
+    since = timezone.now() - datetime.timedelta(days=days)
+    daily = (Order.objects.filter(order_date__gte=since).exclude(status='CANCELLED')
+             .annotate(day=TruncDate('order_date'))
+             .values('day')
+             .annotate(orders=Count('id'), revenue=Sum('total'))
+             .order_by('day'))
+
+    return {
+        'orders': sum(entry['count'] for entry in by_status.values()),
+        # Cancelled orders don't count towards revenue
+        'revenue': money(sum(entry['revenue'] for code, entry in by_status.items() if code != 'CANCELLED')),
+        'by_status': {code: {'count': entry['count'], 'revenue': money(entry['revenue'])}
+                      for code, entry in by_status.items()},
+        'revenue_by_day': [{'date': row['day'].isoformat(), 'orders': row['orders'], 'revenue': money(row['revenue'])}
+                           for row in daily],
+    }
+
+
+def dashboard_stats(low_stock_threshold=LOW_STOCK_THRESHOLD, days=REVENUE_DAYS):
+    return {'inventory': inventory_stats(low_stock_threshold), 'orders': order_stats(days)}
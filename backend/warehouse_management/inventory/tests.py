@@ -1,3 +1,1365 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from . import async_views, benchmarks, cache, export, forecast, identifiers, jobs, ledger, metrics, scan, seeding
+from .orders import place_order
+from .products import save_product_changes
+from .totals import recompute_totals
+from .versioning import VersionConflict
+from .middleware import PerformanceMiddleware
+from .routers import PIN_COOKIE, PIN_HEADER, LagMonitor, ReplicaMiddleware, ReplicaRouter, measure_lag, replica_reads
+from .fastpath import compile_rows
+from .renderers import FastJSONRenderer
+from .serializers import CustomerSerializer, OrderItemSerializer, OrdersSerializer, ProductSerializer, ProductStockSerializer, ReturnSerializer
+from .management.commands import check_query_plans
+from .models import CodeBlock, Customer, Job, Order, OrderItem, Product, ReorderForecast, Return, Role, StockMovement, StockSnapshot
+
+
+class WarehouseTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        # Cached responses would outlive the rolled back test transaction
+        cache.get_cache().clear()
+
+
+def create_orders(count, offset=0):
+    """Create ``count`` orders, each with its own customer, product, item and return."""
+    for i in range(offset, offset + count):
+        customer = Customer.objects.create(first_name=f"First {i}", last_name=f"Last {i}",
+                                           email=f"customer{i}@example.com")
+        product = Product.objects.create(name=f"Product {i}", price=Decimal('5.00'), stock_quantity=10)
+        order = Order.objects.create(customer=customer, total=Decimal('5.00'))
+        item = OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+        Return.objects.create(order_item=item)
+
+
+class ListPaginationTests(WarehouseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f"Product {i}", sku=f"SKU-{i:08d}", barcode=f"{i:012d}",
+                    price=Decimal('9.99'), stock_quantity=i)
+            for i in range(5)
+        ])
+
+    def test_unpaginated_list_is_unchanged(self):
+        response = self.client.get(reverse('get_products'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 5)
+
+    def test_cursor_walks_every_row_once(self):
+        url = reverse('get_products') + '?limit=2'
+        seen = []
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, list(Product.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_fields_projection(self):
+        response = self.client.get(reverse('get_products'), {'fields': 'sku,id', 'limit': 1})
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'sku'])
+
+    def test_invalid_parameters(self):
+        for params in ({'fields': 'nope'}, {'limit': 'x'}, {'limit': 0}, {'cursor': 'garbage'}):
+            response = self.client.get(reverse('get_products'), params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ListQueryCountTests(WarehouseTestCase):
+    """Every list endpoint must run the same number of queries for 2 rows as for 20."""
+
+    LIST_URLS = ['get_products', 'get_orders', 'get_customers', 'get_returns', 'get_orderitems']
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assertConstantQueries(self, params=None):
+        create_orders(2)
+        small = {name: self.count_queries(reverse(name), params) for name in self.LIST_URLS}
+        create_orders(18, offset=2)
+        large = {name: self.count_queries(reverse(name), params) for name in self.LIST_URLS}
+        self.assertEqual(small, large)
+
+    def test_full_list(self):
+        self.assertConstantQueries()
+
+    def test_paginated_list(self):
+        self.assertConstantQueries({'limit': 50})
+
+    def test_order_projection_keeps_customer_join(self):
+        create_orders(3)
+        with self.assertNumQueries(1):
+            rows = self.client.get(reverse('get_orders'), {'fields': 'id,customer'}).json()
+        self.assertEqual(rows[0]['customer']['email'], 'customer0@example.com')
+
+    def test_update_order_response_does_not_reload_customer(self):
+        create_orders(1)
+        order = Order.objects.get()
+        # SELECT of the order joined with its customer, then the UPDATE
+        with self.assertNumQueries(2):
+            response = self.client.put(reverse('update_order', args=[order.id]), {'status': 'processing'},
+                                       content_type='application/json')
+        self.assertEqual(response.json()['status'], 'PROCESSING')
+        self.assertEqual(response.json()['customer']['email'], 'customer0@example.com')
+
+
+class ExportTests(WarehouseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_orders(5)
+
+    def export(self, table, **params):
+        response = self.client.get(reverse('export_table', args=[table]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_matches_list_endpoint(self):
+        lines = self.export('orders').decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.client.get(reverse('get_orders')).json())
+
+    def test_json_array_across_chunks(self):
+        with mock.patch.object(export, 'EXPORT_CHUNK_SIZE', 2), self.assertNumQueries(3):
+            body = self.export('products', format='json', fields='id')
+        self.assertEqual(json.loads(body), list(Product.objects.order_by('pk').values('id')))
+
+    def test_empty_table(self):
+        Return.objects.all().delete()
+        self.assertEqual(json.loads(self.export('returns', format='json')), [])
+
+    def test_unknown_table_and_format(self):
+        self.assertEqual(self.client.get(reverse('export_table', args=['users'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_table', args=['products']), {'format': 'xml'}).status_code, 400)
+
+
+class BulkProductTests(WarehouseTestCase):
+    def post(self, rows, **params):
+        url = reverse('bulk_products')
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.post(url, rows, content_type='application/json')
+
+    def test_create_and_update_in_one_request(self):
+        existing = Product.objects.create(name="Old", sku="SKU-OLD", stock_quantity=1)
+        rows = [{'name': f"New {i}", 'stock_quantity': i} for i in range(5)]
+        rows.append({'id': existing.id, 'name': "Renamed", 'stock_quantity': 7})
+        response = self.post(rows, batch_size=2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 5, 'updated': 1, 'errors': []})
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.name, existing.sku, existing.stock_quantity), ("Renamed", "SKU-OLD", 7))
+        codes = Product.objects.values_list('sku', 'barcode')
+        self.assertTrue(all(sku and barcode for sku, barcode in codes))
+
+    def test_per_row_errors(self):
+        Product.objects.create(name="Taken", sku="SKU-TAKEN", stock_quantity=1)
+        response = self.post([
+            {'name': "Valid", 'stock_quantity': 1},
+            {'stock_quantity': 1},
+            {'name': "Clash", 'sku': "SKU-TAKEN", 'stock_quantity': 1},
+            {'name': "Twin A", 'sku': "SKU-TWIN", 'stock_quantity': 1},
+            {'name': "Twin B", 'sku': "SKU-TWIN", 'stock_quantity': 1},
+            {'id': 999999, 'name': "Ghost", 'stock_quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['created'], 1)
+        self.assertEqual([error['index'] for error in body['errors']], [1, 2, 3, 4, 5])
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_rejects_non_list_payload(self):
+        self.assertEqual(self.post({'name': "Single"}).status_code, 400)
+        self.assertEqual(self.post([{'name': ""}]).status_code, 400)
+
+
+class IdentifierTests(WarehouseTestCase):
+    def test_ean13_check_digit(self):
+        self.assertEqual(identifiers.ean13_check_digit('400638133393'), '1')
+        barcode = identifiers.next_barcode()
+        self.assertEqual(len(barcode), 13)
+        self.assertEqual(barcode[-1], identifiers.ean13_check_digit(barcode[:12]))
+
+    def test_codes_are_unique_across_blocks_and_allocators(self):
+        with mock.patch.object(identifiers, 'BLOCK_SIZE', 3):
+            first = identifiers.SerialAllocator('sku')
+            second = identifiers.SerialAllocator('sku')
+            serials = first.take(4) + second.take(5) + first.take(2)
+        self.assertEqual(len(set(serials)), len(serials))
+        self.assertEqual(CodeBlock.objects.filter(name='sku').count(), 1)
+
+    def test_save_assigns_generated_codes(self):
+        product = Product.objects.create(name="Generated", stock_quantity=0)
+        self.assertRegex(product.sku, r'^SKU-[0-9A-Z]{10}$')
+        self.assertRegex(product.barcode, r'^20\d{11}$')
+
+
+class PlaceOrderTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = {'first_name': "Jan", 'last_name': "Kowalski", 'email': "jan@example.com"}
+        self.apple = Product.objects.create(name="Apple", price=Decimal('2.50'), stock_quantity=10)
+        self.pear = Product.objects.create(name="Pear", price=Decimal('4.00'), stock_quantity=3)
+
+    def post(self, items, **extra):
+        return self.client.post(reverse('add_order'), {'customer': self.customer, 'items': items, **extra},
+                                content_type='application/json')
+
+    def test_places_order_and_reserves_stock(self):
+        response = self.post([
+            {'product': self.apple.id, 'quantity': '2'},
+            {'product': self.pear.id, 'quantity': '3'},
+            {'product': self.apple.id, 'quantity': '1'},
+        ], total='0.01')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['total'], '19.50')
+        self.assertEqual([(item['product'], item['quantity']) for item in body['items']],
+                         [(self.apple.id, '3.00'), (self.pear.id, '3.00')])
+        self.apple.refresh_from_db()
+        self.pear.refresh_from_db()
+        self.assertEqual((self.apple.stock_quantity, self.pear.stock_quantity), (7, 0))
+
+    def test_oversell_is_refused_without_side_effects(self):
+        response = self.post([{'product': self.apple.id, 'quantity': '1'},
+                              {'product': self.pear.id, 'quantity': '4'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['shortages'][0]['product'], self.pear.id)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Customer.objects.exists())
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.stock_quantity, 10)
+
+    def test_invalid_lines(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{'product': self.apple.id, 'quantity': '0'}]).status_code, 400)
+        self.assertEqual(self.post([{'product': 999999, 'quantity': '1'}]).status_code, 400)
+        self.assertEqual(self.post([{'product': self.apple.id, 'quantity': '1'}], status='lost').status_code, 400)
+        for body in ([{'customer': self.customer}], "order", 5):
+            response = self.client.post(reverse('add_order'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_only_unshipped_statuses_at_placement(self):
+        for value in ('cancelled', 'shipped'):
+            response = self.post([{'product': self.apple.id, 'quantity': '1'}], status=value)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('status', response.json())
+        self.assertEqual(self.post([{'product': self.apple.id, 'quantity': '1'}], status='processing').status_code, 201)
+        self.assertEqual(Order.objects.get().status, 'PROCESSING')
+        self.assertFalse(Customer.objects.exclude(email=self.customer['email']).exists())
+        self.assertEqual(Product.objects.get(pk=self.apple.pk).stock_quantity, 9)
+
+
+class QueryPlanTests(WarehouseTestCase):
+    def test_plan_parsers(self):
+        self.assertEqual(check_query_plans.sqlite_full_scans(
+            "2 0 0 SCAN inventory_product\n5 0 0 SEARCH inventory_order USING INDEX order_status_date_idx (status=?)"
+        ), ['inventory_product'])
+        self.assertEqual(check_query_plans.mysql_full_scans(json.dumps({'query_block': {'nested_loop': [
+            {'table': {'table_name': 'inventory_order', 'access_type': 'ref'}},
+            {'table': {'table_name': 'inventory_customer', 'access_type': 'ALL'}},
+        ]}})), ['inventory_customer'])
+
+    @skipUnless(connection.vendor == 'sqlite', "MySQL may pick full scans on empty tables")
+    def test_view_queries_use_indexes(self):
+        call_command('check_query_plans', stdout=io.StringIO())
+
+
+class ListFilterTests(WarehouseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_orders(6)
+        Product.objects.filter(name__in=["Product 0", "Product 1"]).update(category="Fruit", stock_quantity=2)
+        Order.objects.filter(customer__email="customer3@example.com").update(status='SHIPPED')
+        Order.objects.filter(customer__email="customer4@example.com").update(order_date="2025-03-01T12:00:00Z")
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_product_filters_and_search(self):
+        self.assertEqual(len(self.get('get_products', category="Fruit")), 2)
+        self.assertEqual(len(self.get('get_products', low_stock='5')), 2)
+        self.assertEqual([row['name'] for row in self.get('get_products', search="product 5")], ["Product 5"])
+
+    def test_order_filters(self):
+        shipped = self.get('get_orders', status='shipped,cancelled')
+        self.assertEqual([row['customer']['email'] for row in shipped], ["customer3@example.com"])
+        march = self.get('get_orders', date_from='2025-03-01', date_to='2025-03-01')
+        self.assertEqual([row['customer']['email'] for row in march], ["customer4@example.com"])
+        self.assertEqual(len(self.get('get_orders', search='customer5@')), 1)
+
+    def test_keyset_pages_follow_ordering(self):
+        expected = [row['name'] for row in self.get('get_products', ordering='-name')]
+        self.assertEqual(expected, sorted(expected, reverse=True))
+        url, seen = reverse('get_products') + '?ordering=-name&limit=4', []
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(row['name'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, expected)
+
+    def test_keyset_pages_on_datetime(self):
+        expected = [row['id'] for row in self.get('get_orders', ordering='order_date')]
+        first = self.get('get_orders', ordering='order_date', limit=3)
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in first['results'] + second['results']], expected)
+
+    def test_invalid_filters(self):
+        for name, params in [('get_orders', {'status': 'lost'}), ('get_orders', {'date_from': 'yesterday'}),
+                             ('get_products', {'low_stock': 'many'}), ('get_products', {'ordering': 'price'})]:
+            self.assertEqual(self.client.get(reverse(name), params).status_code, 400, params)
+        page = self.get('get_products', ordering='name', limit=1)
+        mismatched = page['next'].replace('ordering=name', 'ordering=sku')
+        self.assertEqual(self.client.get(mismatched).status_code, 400)
+
+
+class StatsTests(WarehouseTestCase):
+    def test_dashboard_stats(self):
+        create_orders(3)
+        Product.objects.filter(name="Product 0").update(category="Fruit", stock_quantity=50)
+        Order.objects.filter(customer__email="customer2@example.com").update(status='CANCELLED')
+
+        with self.assertNumQueries(3):
+            stats = self.client.get(reverse('get_stats'), {'low_stock': '10'}).json()
+
+        inventory = stats['inventory']
+        self.assertEqual((inventory['products'], inventory['low_stock']), (3, 2))
+        self.assertEqual(inventory['stock_value'], '350.00')
+        self.assertEqual([row['category'] for row in inventory['categories']], [None, "Fruit"])
+        orders = stats['orders']
+        self.assertEqual(orders['orders'], 3)
+        self.assertEqual(orders['by_status']['CANCELLED']['count'], 1)
+        self.assertEqual(orders['revenue'], '10.00')
+        self.assertEqual(sum(day['orders'] for day in orders['revenue_by_day']), 2)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse('get_stats'), {'days': 'week'}).status_code, 400)
+
+
+class ResponseCacheTests(WarehouseTestCase):
+    def test_cached_until_product_changes(self):
+        product = Product.objects.create(name="Cached", stock_quantity=1)
+        url = reverse('get_products')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+        self.client.put(reverse('update_product', args=[product.id]),
+                        {'name': "Renamed", 'stock_quantity': 1}, content_type='application/json')
+        self.assertEqual(self.client.get(url).json()[0]['name'], "Renamed")
+
+    def test_bulk_writes_invalidate(self):
+        url = reverse('get_products')
+        self.assertEqual(self.client.get(url).json(), [])
+        self.client.post(reverse('bulk_products'), [{'name': "Bulk", 'stock_quantity': 1}],
+                         content_type='application/json')
+        self.assertEqual(len(self.client.get(url).json()), 1)
+
+    def test_if_none_match(self):
+        url = reverse('get_roles')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.client.post(reverse('create_role'), {'role_name': "Picker"}, content_type='application/json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_counters_and_query_params(self):
+        hits, misses = cache.hits['customers'], cache.misses['customers']
+        self.client.get(reverse('get_customers'))
+        self.client.get(reverse('get_customers'))
+        self.client.get(reverse('get_customers'), {'search': 'a'})
+        self.assertEqual((cache.hits['customers'] - hits, cache.misses['customers'] - misses), (1, 2))
+
+
+class StockLedgerTests(WarehouseTestCase):
+    def stock_at(self, moment, product):
+        return ledger.stock_levels(moment).get(pk=product.pk).stock_at
+
+    def test_api_writes_append_movements(self):
+        response = self.client.post(reverse('post_product'), {'name': "Tea", 'price': '3.00', 'stock_quantity': '10'},
+                                    content_type='application/json')
+        product = Product.objects.get(pk=response.json()['id'])
+        self.client.put(reverse('update_product', args=[product.id]), {'name': "Tea", 'stock_quantity': '12'},
+                        content_type='application/json')
+        self.client.post(reverse('add_order'), {
+            'customer': {'first_name': "Ann", 'last_name': "Nowak", 'email': "ann@example.com"},
+            'items': [{'product': product.id, 'quantity': '5'}],
+        }, content_type='application/json')
+
+        movements = StockMovement.objects.filter(product=product).order_by('pk')
+        self.assertEqual([(m.kind, m.quantity) for m in movements],
+                         [('RECEIPT', 10), ('ADJUSTMENT', 2), ('SHIPMENT', -5)])
+        self.assertIsNotNone(movements[2].order_item_id)
+        product.refresh_from_db()
+        self.assertEqual(self.stock_at(timezone.now(), product), product.stock_quantity)
+
+    def test_stock_at_uses_nearest_snapshot(self):
+        product = Product.objects.create(name="Rice", stock_quantity=0)
+        day = datetime.timedelta(days=1)
+        start = timezone.now() - 10 * day
+        ledger.record([
+            ledger.movement(product.id, 'RECEIPT', Decimal('100'), created_at=start),
+            ledger.movement(product.id, 'SHIPMENT', Decimal('-30'), created_at=start + 2 * day),
+            ledger.movement(product.id, 'SHIPMENT', Decimal('-20'), created_at=start + 5 * day),
+        ])
+        self.assertEqual(ledger.take_snapshots(start + 3 * day), 1)
+        self.assertEqual(ledger.take_snapshots(start + 3 * day), 0)
+        # A snapshot that disagrees with the history proves later answers start from it
+        StockSnapshot.objects.filter(product=product).update(quantity=Decimal('60'))
+
+        self.assertEqual(self.stock_at(start + day, product), 100)
+        self.assertEqual(self.stock_at(start + 4 * day, product), 60)
+        self.assertEqual(self.stock_at(start + 6 * day, product), 40)
+
+        response = self.client.get(reverse('get_stock'), {'at': (start + 6 * day).isoformat(), 'search': "Rice"})
+        self.assertEqual(response.json()[0]['stock_at'], '40.00')
+        movements = self.client.get(reverse('get_stock_movements'), {'product': product.id, 'kind': 'shipment'})
+        self.assertEqual(len(movements.json()), 2)
+
+    def test_bulk_import_records_receipts_and_adjustments(self):
+        existing = Product.objects.create(name="Flour", stock_quantity=5)
+        self.client.post(reverse('bulk_products'), [
+            {'name': "Sugar", 'stock_quantity': '8'},
+            {'id': existing.id, 'name': "Flour", 'stock_quantity': '3'},
+        ], content_type='application/json')
+        self.assertEqual(sorted(StockMovement.objects.values_list('product__name', 'kind', 'quantity')),
+                         [("Flour", 'ADJUSTMENT', -2), ("Sugar", 'RECEIPT', 8)])
+
+    def test_admin_cannot_edit_stock_or_the_ledger(self):
+        from django.contrib.auth.models import User as AdminUser
+        self.client.force_login(AdminUser.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        product = Product.objects.create(name="Tea", price=Decimal('3.00'), stock_quantity=10)
+        url = reverse('admin:inventory_product_change', args=[product.id])
+        self.client.post(url, {'name': "Renamed", 'sku': product.sku, 'stock_quantity': '999'})
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.stock_quantity), ("Renamed", 10))
+
+        ledger.record([ledger.movement(product.id, 'RECEIPT', 10)])
+        movement = StockMovement.objects.get()
+        self.assertEqual(self.client.get(reverse('admin:inventory_stockmovement_changelist')).status_code, 200)
+        self.client.post(reverse('admin:inventory_stockmovement_change', args=[movement.id]), {'quantity': '50'})
+        self.client.post(reverse('admin:inventory_stockmovement_delete', args=[movement.id]), {'post': 'yes'})
+        self.assertEqual(StockMovement.objects.get().quantity, 10)
+        self.assertEqual(self.client.get(reverse('admin:inventory_stocksnapshot_add')).status_code, 403)
+
+
+class MetricsTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+
+    def test_requests_are_recorded(self):
+        create_orders(2)
+        response = self.client.get(reverse('get_orders'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+, total;dur=[\d.]+$')
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('wms_request_db_queries_count{route="get/orders/",method="GET"} 1', body)
+        self.assertIn('wms_request_db_queries_sum{route="get/orders/",method="GET"} 1', body)
+        self.assertIn('wms_responses_total{route="get/orders/",method="GET",status="200"} 1', body)
+        self.assertIn(f'wms_response_size_bytes_sum{{route="get/orders/",method="GET"}} {len(response.content)}', body)
+
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.settings(SLOW_REQUEST_SECONDS=0), self.assertLogs('inventory.performance', 'WARNING') as logs:
+            self.client.get(reverse('get_returns'))
+        self.assertIn('inventory_return', logs.output[0])
+
+
+class BenchmarkTests(WarehouseTestCase):
+    def test_seed_is_consistent_with_the_ledger(self):
+        created = seeding.seed(products=20, customers=5, orders=30, random_seed=1)
+        self.assertEqual(created['products'], Product.objects.count())
+        self.assertEqual(created['order_items'], OrderItem.objects.count())
+        order = Order.objects.order_by('?').first()
+        self.assertEqual(order.total, sum(item.quantity * item.price for item in order.orderitem_set.all()))
+        for product in ledger.stock_levels(timezone.now()):
+            self.assertEqual(product.stock_at, product.stock_quantity)
+
+    def test_every_route_has_a_plan(self):
+        self.assertEqual(benchmarks.unplanned_routes(), [])
+
+    def test_scale_is_rolled_back(self):
+        results = benchmarks.benchmark_scale(10, ['get_orders', 'delete_order'], repeat=2)
+        self.assertEqual(results['get_orders']['queries'], 1)
+        self.assertEqual(results['delete_order']['errors'], 0)
+        self.assertFalse(Order.objects.exists())
+
+    def test_compare_flags_regressions(self):
+        baseline = {'scales': {'100': {'get_orders': {'p95_ms': 10, 'peak_kib': 100, 'queries': 1}}}}
+        report = {'scales': {'100': {'get_orders': {'p95_ms': 12, 'peak_kib': 100, 'queries': 2}}}}
+        self.assertEqual(benchmarks.compare(report, baseline, tolerance=0.25),
+                         ["get_orders @ 100: queries 1 -> 2"])
+
+
+class FastPathTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        customer = Customer.objects.create(first_name="Zoë", last_name="O\u2028Brien", email="zoe@example.com")
+        self.product = Product.objects.create(name='Line\u2029break "quoted" \\ ✓', price=Decimal('0.5'),
+                                              stock_quantity=Decimal('3'))
+        Product.objects.create(name="No price", category=None)
+        order = Order.objects.create(customer=customer, total=None)
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=Decimal('2'), price=Decimal('9.99'))
+        Return.objects.create(order_item=item, notes=None)
+
+    def assertSameOutput(self, queryset, serializer_class, fields=None):
+        plan = compile_rows(serializer_class, queryset, fields)
+        self.assertIsNotNone(plan)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, fields=fields).data)
+        self.assertEqual(FastJSONRenderer().render(plan.rows(queryset)), expected)
+
+    def test_rows_match_serializers(self):
+        self.assertSameOutput(Product.objects.order_by('pk'), ProductSerializer)
+        self.assertSameOutput(Product.objects.order_by('pk'), ProductSerializer, fields=['id', 'price'])
+        self.assertSameOutput(Customer.objects.all(), CustomerSerializer)
+        self.assertSameOutput(Order.objects.all(), OrdersSerializer)
+        self.assertSameOutput(OrderItem.objects.all(), OrderItemSerializer)
+        self.assertSameOutput(Return.objects.all(), ReturnSerializer)
+        self.assertSameOutput(ledger.stock_levels(timezone.now()).order_by('pk'), ProductStockSerializer)
+
+    def test_unsupported_serializers_use_drf(self):
+        class NameSerializer(ProductSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(ProductSerializer.Meta):
+                fields = ['id', 'label']
+
+            def get_label(self, product):
+                return product.name.upper()
+
+        self.assertIsNone(compile_rows(NameSerializer, Product.objects.all()))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'when': timezone.now(), 'amount': Decimal('1.10'), 'text': "a\u2028b\x01", 'items': [1, 2.5, None]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        # orjson refuses non-string keys; the standard renderer takes over
+        self.assertEqual(FastJSONRenderer().render({1: 'a'}), b'{"1":"a"}')
+
+    def test_paginated_list_uses_fast_path(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('get_products'), {'limit': 1, 'ordering': 'name'})
+        self.assertEqual(response.json()['results'], ProductSerializer([self.product], many=True).data)
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(response.json()['next'], None)
+        self.assertEqual([row['name'] for row in response.json()['results']], ["No price"])
+
+
+class AsyncViewTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        create_orders(3)
+        Role.objects.create(role_name="Magazynier")
+        self.factory = AsyncRequestFactory()
+
+    async def assertSameResponse(self, view, name, query=None, **kwargs):
+        url = reverse(name, kwargs=kwargs or None)
+        expected = await self.async_client.get(url, query or {})
+        response = await view(self.factory.get(url, query or {}), **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        self.assertEqual(response.content, expected.content)
+
+    async def test_async_views_match_sync_views(self):
+        await self.assertSameResponse(async_views.get_products, 'get_products')
+        await self.assertSameResponse(async_views.get_products, 'get_products', {'limit': 2, 'ordering': '-name'})
+        await self.assertSameResponse(async_views.get_products, 'get_products', {'limit': 'x'})
+        await self.assertSameResponse(async_views.get_orders, 'get_orders', {'limit': 2, 'fields': 'id,customer'})
+        await self.assertSameResponse(async_views.get_customers, 'get_customers', {'search': 'customer1'})
+        await self.assertSameResponse(async_views.get_returns, 'get_returns')
+        await self.assertSameResponse(async_views.get_OrderItems, 'get_orderitems')
+        await self.assertSameResponse(async_views.get_stock, 'get_stock', {'limit': 1})
+        await self.assertSameResponse(async_views.get_stock_movements, 'get_stock_movements')
+        await self.assertSameResponse(async_views.get_stats, 'get_stats')
+        await self.assertSameResponse(async_views.get_reorder_suggestions, 'get_reorder_suggestions', {'limit': 1})
+        await self.assertSameResponse(async_views.get_roles, 'get_roles')
+
+    async def test_async_detail_views_match_sync_views(self):
+        order = await Order.objects.select_related('customer').afirst()
+        await self.assertSameResponse(async_views.get_order, 'get_order', id=order.id)
+        await self.assertSameResponse(async_views.get_customer, 'get_customer', id=order.customer_id)
+        await self.assertSameResponse(async_views.get_product, 'get_product', id=0)
+        product = await Product.objects.afirst()
+        await self.assertSameResponse(async_views.scan_product, 'scan_product', code=product.barcode)
+        await self.assertSameResponse(async_views.scan_product, 'scan_product', code='unknown')
+
+    async def test_middleware_tracks_async_queries(self):
+        metrics.registry.reset()
+        middleware = PerformanceMiddleware(async_views.get_orders)
+        response = await middleware(self.factory.get('/get/orders/'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('wms_request_db_queries_sum{route="unmatched",method="GET"} 1', metrics.registry.render())
+
+
+class FakeMonitor:
+    def __init__(self, **lags):
+        self.lags = lags
+
+    def lag(self, alias):
+        return self.lags[alias]
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'], REPLICA_MAX_LAG_SECONDS=5, REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.monitor = FakeMonitor(replica_0=0, replica_1=0)
+        self.router = ReplicaRouter(self.monitor)
+
+    def reads(self, count=4):
+        with replica_reads():
+            return [self.router.db_for_read(Product) for _ in range(count)]
+
+    def test_only_read_scope_uses_replicas(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_0', 'inventory'))
+        self.assertIsNone(self.router.allow_migrate('default', 'inventory'))
+
+    def test_round_robin(self):
+        self.assertEqual(self.reads(), ['replica_0', 'replica_1', 'replica_0', 'replica_1'])
+
+    def test_lagging_replicas_fall_back(self):
+        self.monitor.lags['replica_0'] = 30
+        self.assertEqual(self.reads(), ['replica_1'] * 4)
+        self.monitor.lags['replica_1'] = float('inf')
+        self.assertEqual(self.reads(), ['default'] * 4)
+
+    def test_lag_is_measured_once_per_interval(self):
+        measure = mock.Mock(return_value=1.5)
+        monitor = LagMonitor(measure, interval=60)
+        self.assertEqual([monitor.lag('replica_0') for _ in range(3)], [1.5] * 3)
+        measure.assert_called_once_with('replica_0')
+        self.assertEqual(measure_lag('default'), 0.0)
+
+    def test_lag_query_falls_back_to_show_slave_status(self):
+        def execute(sql):
+            if 'REPLICA' in sql:  # MySQL before 8.0.22
+                raise DatabaseError("You have an error in your SQL syntax")
+
+        cursor = mock.MagicMock(description=[('Slave_IO_State',), ('Seconds_Behind_Master',)])
+        cursor.execute.side_effect = execute
+        cursor.fetchone.return_value = ('Waiting for source', 7)
+        replica = mock.MagicMock(vendor='mysql')
+        replica.cursor.return_value.__enter__.return_value = cursor
+        with mock.patch('inventory.routers.connections', {'replica_0': replica}):
+            self.assertEqual(measure_lag('replica_0'), 7.0)
+            self.assertEqual([call.args[0] for call in cursor.execute.call_args_list],
+                             ['SHOW REPLICA STATUS', 'SHOW SLAVE STATUS'])
+            cursor.execute.side_effect = DatabaseError("gone away")
+            with self.assertLogs('inventory.routers', 'WARNING') as logs:
+                self.assertEqual(LagMonitor(interval=60).lag('replica_0'), float('inf'))
+        self.assertIn("Cannot measure the replication lag of replica_0", logs.output[0])
+        self.assertIn("Replica replica_0 excluded from reads", logs.output[1])
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        decisions = []
+
+        def view(request):
+            decisions.append(self.router.db_for_read(Product))
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = ReplicaMiddleware(view)
+        factory = RequestFactory()
+        middleware(factory.get('/get/products/'))
+        response = middleware(factory.post('/post/products/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        pinned = factory.get('/get/products/')
+        pinned.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        middleware(pinned)
+        expired = factory.get('/get/products/')
+        expired.COOKIES[PIN_COOKIE] = '1'
+        middleware(expired)
+        # Cross-site clients echo the header instead of the cookie
+        self.assertEqual(response[PIN_HEADER], response.cookies[PIN_COOKIE].value)
+        middleware(factory.get('/get/products/', headers={PIN_HEADER: response[PIN_HEADER]}))
+        middleware(factory.get('/get/products/', headers={PIN_HEADER: 'soon'}))
+        self.assertEqual(decisions, ['replica_0', None, None, 'replica_1', None, 'replica_0'])
+
+
+class BulkOrderTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        create_orders(4)
+        self.orders = list(Order.objects.order_by('pk'))
+        for order, status in zip(self.orders, ['PENDING', 'PROCESSING', 'PROCESSING', 'SHIPPED']):
+            order.status = status
+            order.save()
+
+    def change_status(self, body):
+        return self.client.post(reverse('bulk_order_status'), body, content_type='application/json')
+
+    def test_transition_by_ids(self):
+        pending, first, second, shipped = [order.id for order in self.orders]
+        with CaptureQueriesContext(connection) as context:
+            response = self.change_status({'ids': [pending, first, second, shipped, 999], 'status': 'shipped'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'status': 'SHIPPED',
+            'updated': [first, second],
+            'skipped': [{'id': pending, 'status': 'PENDING'}, {'id': shipped, 'status': 'SHIPPED'}],
+            'missing': [999],
+        })
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Order.objects.filter(status='SHIPPED').count(), 3)
+
+    def test_transition_by_filter(self):
+        response = self.change_status({'filter': {'status': 'pending'}, 'status': 'CANCELLED'})
+        self.assertEqual(response.json()['updated'], [self.orders[0].id])
+        self.assertEqual(Order.objects.get(pk=self.orders[0].id).status, 'CANCELLED')
+
+    def test_invalid_requests(self):
+        for body in ({'ids': [1], 'filter': {'status': 'PENDING'}, 'status': 'SHIPPED'},
+                     {'status': 'SHIPPED'},
+                     {'ids': [1], 'status': 'LOST'},
+                     {'filter': {'stauts': 'PENDING'}, 'status': 'SHIPPED'},
+                     {'filter': {'date_from': 'yesterday'}, 'status': 'SHIPPED'}):
+            self.assertEqual(self.change_status(body).status_code, 400, body)
+        self.assertEqual(Order.objects.filter(status='SHIPPED').count(), 1)
+
+    def test_bulk_delete(self):
+        ids = [order.id for order in self.orders[:2]]
+        response = self.client.delete(reverse('bulk_delete_orders'), {'ids': ids + [999]},
+                                      content_type='application/json')
+        self.assertEqual(response.json(), {'deleted': ids, 'missing': [999]})
+        self.assertFalse(OrderItem.objects.filter(order_id__in=ids).exists())
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_cancelled_and_deleted_orders_release_stock(self):
+        customer = self.orders[0].customer
+        product = Product.objects.create(name="Reserved", price=Decimal('2.00'), stock_quantity=10)
+        placed = [place_order(customer, [{'product': product.id, 'quantity': Decimal(quantity)}]) for quantity in '123']
+        Order.objects.filter(pk=placed[2].pk).update(status='SHIPPED')
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 4)
+
+        with CaptureQueriesContext(connection) as context:
+            self.change_status({'ids': [placed[0].id, placed[2].id], 'status': 'CANCELLED'})
+        product_updates = [query for query in context.captured_queries
+                           if query['sql'].startswith('UPDATE "inventory_product"')]
+        self.assertEqual(len(product_updates), 1)
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 5)
+        # Deleting the cancelled order gives nothing back a second time
+        self.client.delete(reverse('bulk_delete_orders'), {'ids': [placed[0].id, placed[1].id]},
+                           content_type='application/json')
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 7)
+        self.assertEqual(product.version, 6)
+        self.assertEqual(ledger.stock_levels(timezone.now()).get(pk=product.pk).stock_at, 7 - 10)
+
+        order = place_order(customer, [{'product': product.id, 'quantity': Decimal('4')}])
+        self.client.delete(reverse('delete_order', args=[order.id]))
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 7)
+
+        order = place_order(customer, [{'product': product.id, 'quantity': Decimal('4')}])
+        url = reverse('update_order', args=[order.id])
+        for _ in range(2):
+            self.client.put(url, {'status': 'cancelled'}, content_type='application/json')
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 7)
+
+    def test_update_order_follows_transitions(self):
+        customer = self.orders[0].customer
+        product = Product.objects.create(name="Reserved", price=Decimal('2.00'), stock_quantity=10)
+        order = place_order(customer, [{'product': product.id, 'quantity': Decimal('4')}])
+        url = reverse('update_order', args=[order.id])
+
+        def put(status):
+            return self.client.put(url, {'status': status}, content_type='application/json').status_code
+
+        self.assertEqual(put('cancelled'), 200)
+        self.assertEqual(put('pending'), 409)
+        self.assertEqual(put('cancelled'), 200)  # unchanged status: nothing to do
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 10)
+        self.assertEqual(StockMovement.objects.filter(kind='ADJUSTMENT').count(), 1)
+
+        shipped = place_order(customer, [{'product': product.id, 'quantity': Decimal('1')}])
+        self.assertEqual(self.client.put(reverse('update_order', args=[shipped.id]), {'status': 'shipped'},
+                                         content_type='application/json').status_code, 409)
+        self.assertEqual(Order.objects.get(pk=shipped.pk).status, 'PENDING')
+
+    def test_update_order_rejects_invalid_status(self):
+        order = self.orders[0]
+        customer = order.customer
+        url = reverse('update_order', args=[order.id])
+        for value in (None, 5, ['SHIPPED'], {'status': 'SHIPPED'}, 'lost'):
+            response = self.client.put(url, {'status': value, 'customer_first_name': 'Changed',
+                                             'customer_last_name': 'Name'}, content_type='application/json')
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn('status', response.json())
+        self.assertEqual(Order.objects.get(pk=order.pk).status, order.status)
+        self.assertEqual(Customer.objects.get(pk=customer.pk).first_name, customer.first_name)
+
+
+class VersionedUpdateTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name="Tape", sku="TAPE", price=Decimal('2.00'), stock_quantity=10)
+
+    def patch(self, body, **headers):
+        return self.client.patch(reverse('update_product', args=[self.product.id]), body,
+                                 content_type='application/json', headers=headers)
+
+    def test_patch_writes_only_sent_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.patch({'name': "Duct tape"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"v2"')
+        update = next(query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE'))
+        self.assertNotIn('stock_quantity', update)
+        self.assertNotIn('price', update)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_stock_delta(self):
+        self.assertEqual(self.patch({'stock_delta': '-3'}).json()['stock_quantity'], '7.00')
+        self.assertEqual(self.patch({'stock_delta': '5'}).json()['stock_quantity'], '12.00')
+        self.assertEqual(list(StockMovement.objects.order_by('pk').values_list('kind', 'quantity')),
+                         [('ADJUSTMENT', Decimal('-3')), ('ADJUSTMENT', Decimal('5'))])
+
+        response = self.patch({'stock_delta': '-20'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['shortages'][0]['available'], '12.00')
+        self.assertEqual(self.patch({'stock_delta': '1', 'stock_quantity': '4'}).status_code, 400)
+
+    def test_delta_is_relative_to_the_stored_stock(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.patch({'stock_delta': '-4'})
+        save_product_changes(stale, {}, Decimal('-4'))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 2)
+
+    def test_if_match(self):
+        etag = self.client.get(reverse('get_product', args=[self.product.id]))['ETag']
+        self.assertEqual(self.patch({'price': '3.00'}, if_match=etag)['ETag'], '"v2"')
+        response = self.patch({'price': '4.00'}, if_match=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).price, Decimal('3.00'))
+
+        self.client.post(reverse('add_order'), {
+            'customer': {'first_name': "Ann", 'last_name': "Nowak", 'email': "ann@example.com"},
+            'items': [{'product': self.product.id, 'quantity': '1'}],
+        }, content_type='application/json')
+        self.assertEqual(self.patch({'stock_quantity': '50'}, if_match='"v2"').status_code, 412)
+
+    def test_absolute_stock_needs_the_version_read(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.patch({'stock_delta': '-4'})
+        with self.assertRaises(VersionConflict):
+            save_product_changes(stale, {'stock_quantity': Decimal('20')})
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 6)
+
+    def test_order_if_match(self):
+        create_orders(1)
+        order = Order.objects.get()
+        url = reverse('update_order', args=[order.id])
+        etag = self.client.get(reverse('get_order', args=[order.id]))['ETag']
+        response = self.client.patch(url, {'status': 'processing'}, content_type='application/json',
+                                     headers={'If-Match': etag})
+        self.assertEqual(response['ETag'], '"v2"')
+        self.client.post(reverse('bulk_order_status'), {'ids': [order.id], 'status': 'SHIPPED'},
+                         content_type='application/json')
+        response = self.client.patch(url, {'status': 'CANCELLED'}, content_type='application/json',
+                                     headers={'If-Match': '"v2"'})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Order.objects.get().status, 'SHIPPED')
+
+
+class CustomerUpsertTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name="Mug", price=Decimal('8.00'), stock_quantity=100)
+
+    def order(self, **customer):
+        return self.client.post(reverse('add_order'), {
+            'customer': {'first_name': "Jan", 'last_name': "Kowalski", **customer},
+            'items': [{'product': self.product.id, 'quantity': '1'}],
+        }, content_type='application/json')
+
+    def test_add_order_matches_customer_by_email(self):
+        first = self.order(email="jan@example.com")
+        second = self.order(first_name="Janek", email="jan@example.com")
+        self.assertEqual(first.json()['customer']['id'], second.json()['customer']['id'])
+        self.assertEqual(Customer.objects.get().first_name, "Jan")
+
+    def test_customer_inserted_concurrently_is_reused(self):
+        from django.db.models import QuerySet
+        from .customers import resolve_customer
+        other = Customer.objects.create(first_name="Jan", last_name="Kowalski", email="jan@example.com")
+        # The lookup ran before the other request committed its insert
+        with mock.patch.object(QuerySet, 'first', return_value=None):
+            customer = resolve_customer({'first_name': "Janek", 'last_name': "K", 'email': "jan@example.com"})
+        self.assertEqual(customer.pk, other.pk)
+        self.assertEqual(Customer.objects.get().first_name, "Jan")
+
+    def test_namesakes_are_different_customers(self):
+        self.assertEqual(self.order(email="jan1@example.com").status_code, 201)
+        self.assertEqual(self.order(email="jan2@example.com").status_code, 201)
+        self.assertEqual(self.order(email="jan1@example.com").status_code, 201)
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_invalid_customer(self):
+        self.assertEqual(self.order(email="not-an-email").status_code, 400)
+        self.assertEqual(self.order().status_code, 400)
+        self.assertFalse(Customer.objects.exists())
+
+    def test_bulk_import_upserts_by_email(self):
+        existing = Customer.objects.create(first_name="Old", last_name="Name", email="old@example.com")
+        self.assertEqual(len(self.client.get(reverse('get_customers')).json()), 1)
+        response = self.client.post(reverse('bulk_customers'), [
+            {'first_name': "New", 'last_name': "Name", 'email': "old@example.com", 'phone': "123"},
+            {'first_name': "Ann", 'last_name': "Nowak", 'email': "ann@example.com"},
+            {'first_name': "Ann", 'last_name': "Again", 'email': "ann@example.com"},
+            {'first_name': "Bad", 'last_name': "Email", 'email': "nope"},
+        ], content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated']), (1, 1))
+        self.assertEqual([error['index'] for error in body['errors']], [2, 3])
+        updated = Customer.objects.get(email="old@example.com")
+        self.assertEqual((updated.pk, updated.first_name, updated.phone), (existing.pk, "New", "123"))
+        self.assertEqual(updated.created_at, existing.created_at)
+        self.assertEqual(len(self.client.get(reverse('get_customers')).json()), 2)
+
+    def test_bulk_import_rejects_empty_payload(self):
+        self.assertEqual(self.client.post(reverse('bulk_customers'), [], content_type='application/json').status_code, 400)
+
+
+class JobTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        results = tempfile.TemporaryDirectory()
+        self.addCleanup(results.cleanup)
+        settings_override = override_settings(JOB_RESULTS_DIR=Path(results.name))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def run_jobs(self):
+        call_command('run_jobs', processes=0, once=True, stdout=io.StringIO())
+
+    def create_job(self, kind, params):
+        return self.client.post(reverse('create_job'), {'kind': kind, 'params': params}, content_type='application/json')
+
+    def test_export_job(self):
+        create_orders(3)
+        response = self.create_job('export', {'table': 'orders', 'format': 'json'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'QUEUED')
+        url = response['Location']
+        result_url = reverse('get_job_result', args=[response.json()['id']])
+        self.assertEqual(self.client.get(result_url).status_code, 409)
+
+        self.run_jobs()
+        job = self.client.get(url).json()
+        self.assertEqual((job['status'], job['progress'], job['result']), ('DONE', 100, {'rows': 3}))
+        self.assertEqual(job['result_url'], result_url)
+        download = self.client.get(result_url)
+        self.assertEqual(download['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(b''.join(download.streaming_content)), self.client.get(reverse('get_orders')).json())
+
+    def test_import_job(self):
+        self.create_job('import_products', {'rows': [{'name': "Queued", 'stock_quantity': '4'}]})
+        self.run_jobs()
+        self.assertEqual(Job.objects.get().result, {'created': 1, 'updated': 0, 'errors': []})
+        self.assertTrue(Product.objects.filter(name="Queued").exists())
+
+    def test_invalid_jobs(self):
+        for kind, params in (('nope', {}), ('export', {'table': 'users'}), ('export', {'table': 'orders', 'fields': 'x'}),
+                             ('import_products', {'rows': []}), ('export', [])):
+            self.assertEqual(self.create_job(kind, params).status_code, 400, (kind, params))
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_then_failed(self):
+        def fail(params, job_run):
+            raise RuntimeError("boom")
+
+        with mock.patch.dict(jobs.HANDLERS, {'fail': jobs.Handler(fail, None)}):
+            job = jobs.enqueue('fail', max_attempts=2)
+            self.run_jobs()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('QUEUED', 1))
+            self.assertIn("RuntimeError: boom", job.error)
+            self.assertGreater(job.run_after, timezone.now())
+
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.run_jobs()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+
+    def test_claim_and_requeue_stale(self):
+        first, second = jobs.enqueue('export', {'table': 'products'}), jobs.enqueue('export', {'table': 'products'})
+        self.assertEqual(jobs.claim('test', limit=5), [first.pk, second.pk])
+        self.assertEqual(jobs.claim('test'), [])
+        Job.objects.filter(pk=first.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim('test'), [first.pk])
+
+    def test_database_errors_do_not_stop_the_worker(self):
+        job = jobs.enqueue('recompute_totals')
+        claim, calls = jobs.claim, []
+
+        def flaky_claim(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return claim(*args)
+
+        err = io.StringIO()
+        with mock.patch.object(jobs, 'claim', flaky_claim), \
+                mock.patch('inventory.management.commands.run_jobs.time.sleep') as sleep, \
+                mock.patch('inventory.management.commands.run_jobs.close_old_connections'):
+            call_command('run_jobs', processes=0, once=True, stdout=io.StringIO(), stderr=err)
+        self.assertIn("database is locked", err.getvalue())
+        sleep.assert_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'DONE')
+
+    def test_heartbeat_survives_database_errors(self):
+        job = jobs.enqueue('recompute_totals')
+        Job.objects.filter(pk=job.pk).update(status='RUNNING')
+        heartbeat = jobs.Heartbeat(job.pk, 0)
+        filter_jobs, calls = Job.objects.filter, []
+
+        def flaky_filter(*args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            heartbeat.stopped.set()
+            return filter_jobs(*args, **kwargs)
+
+        # run() in this thread; it must not close the test's connection
+        with mock.patch.object(Job.objects, 'filter', flaky_filter), mock.patch.object(jobs, 'connection'), \
+                mock.patch.object(jobs, 'close_old_connections'), self.assertLogs('inventory.jobs', 'ERROR'):
+            heartbeat.run()
+        self.assertIsNotNone(Job.objects.get(pk=job.pk).heartbeat_at)
+
+
+class OrderTotalTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        create_orders(1)
+        self.order = Order.objects.get()
+        self.product = Product.objects.get()
+
+    def total(self):
+        return Order.objects.get(pk=self.order.pk).total
+
+    def test_item_changes_update_the_total(self):
+        item = OrderItem.objects.create(order=self.order, product=self.product, quantity=Decimal('3'), price=Decimal('1.10'))
+        self.assertEqual(self.total(), Decimal('8.30'))
+        item.quantity = 1
+        item.save()
+        self.assertEqual(self.total(), Decimal('6.10'))
+        item.delete()
+        self.assertEqual(self.total(), Decimal('5.00'))
+        OrderItem.objects.filter(order=self.order).get().delete()
+        self.assertEqual(self.total(), 0)
+
+    def test_deleting_the_order_skips_recomputation(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.delete(reverse('delete_order', args=[self.order.id]))
+        self.assertFalse([query for query in context.captured_queries if query['sql'].startswith('UPDATE "inventory_order"')])
+
+    def test_backfill_corrects_drifted_totals(self):
+        create_orders(4, offset=1)
+        Order.objects.filter(pk__in=Order.objects.order_by('pk').values_list('pk', flat=True)[:3]).update(total=Decimal('99.99'))
+        empty = Order.objects.create(customer=self.order.customer, total=Decimal('12.34'))
+        self.assertEqual(recompute_totals(chunk_size=2), {'orders': 6, 'corrected': 3})
+        self.assertEqual(set(Order.objects.exclude(pk=empty.pk).values_list('total', flat=True)), {Decimal('5.00')})
+        self.assertEqual(Order.objects.get(pk=empty.pk).total, Decimal('12.34'))
+
+        out = io.StringIO()
+        call_command('recompute_order_totals', stdout=out)
+        self.assertIn("corrected 0 totals", out.getvalue())
+
+    def test_update_order_total(self):
+        url = reverse('update_order', args=[self.order.id])
+        self.assertEqual(self.client.put(url, {'total': '5.0'}, content_type='application/json').status_code, 200)
+        response = self.client.put(url, {'total': '7.00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.total(), Decimal('5.00'))
+
+        empty = Order.objects.create(customer=self.order.customer)
+        url = reverse('update_order', args=[empty.id])
+        self.assertEqual(self.client.put(url, {'total': '0.1'}, content_type='application/json').json()['total'], '0.10')
+        self.assertEqual(Order.objects.get(pk=empty.pk).total, Decimal('0.10'))
+        self.assertEqual(self.client.put(url, {'total': '1.005'}, content_type='application/json').status_code, 400)
+
+    def test_fractional_line_total_round_trips(self):
+        product = Product.objects.create(name="Cable", price=Decimal('2.33'), stock_quantity=10)
+        response = self.client.post(reverse('add_order'), {
+            'customer': {'first_name': "Jan", 'last_name': "Nowak", 'email': "jan@example.com"},
+            'items': [{'product': product.id, 'quantity': '1.5'}],
+        }, content_type='application/json')
+        order_id = response.json()['id']
+        total = self.client.get(reverse('get_order', args=[order_id])).json()['total']
+        self.assertEqual(total, '3.50')
+        url = reverse('update_order', args=[order_id])
+        self.assertEqual(self.client.put(url, {'total': total}, content_type='application/json').status_code, 200)
+        self.assertEqual(recompute_totals()['corrected'], 0)
+
+    def test_recompute_job(self):
+        Order.objects.update(total=0)
+        job = jobs.enqueue('recompute_totals', {'chunk_size': 10})
+        call_command('run_jobs', processes=0, once=True, stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'orders': 1, 'corrected': 1})
+        self.assertEqual(self.total(), Decimal('5.00'))
+
+
+class ReturnDecisionTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        create_orders(3)
+        Order.objects.update(status='SHIPPED')
+        self.returns = list(Return.objects.select_related('order_item').order_by('pk'))
+        # A second return of the first product
+        first = self.returns[0].order_item
+        item = OrderItem.objects.create(order=first.order, product=first.product, quantity=Decimal('2'), price=first.price)
+        self.returns.append(Return.objects.create(order_item=item))
+
+    def decide(self, body):
+        return self.client.post(reverse('bulk_return_status'), body, content_type='application/json')
+
+    def test_approval_restocks_once_per_product(self):
+        product = self.returns[0].order_item.product
+        rejected = self.returns[2]
+        rejected.status = 'REJECTED'
+        rejected.save()
+        ids = [self.returns[0].id, self.returns[3].id, rejected.id, 999]
+        with CaptureQueriesContext(connection) as context:
+            response = self.decide({'ids': ids, 'status': 'approved', 'notes': "Damaged box"})
+
+        self.assertEqual(response.json(), {
+            'status': 'APPROVED',
+            'updated': [self.returns[0].id, self.returns[3].id],
+            'skipped': [{'id': rejected.id, 'status': 'REJECTED'}],
+            'restocked': {str(product.id): '3.00'},
+            'missing': [999],
+        })
+        product_updates = [query for query in context.captured_queries
+                           if query['sql'].startswith('UPDATE "inventory_product"')]
+        self.assertEqual(len(product_updates), 1)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, Decimal('13'))
+        self.assertEqual(Return.objects.get(pk=self.returns[0].id).notes, "Damaged box")
+        movements = StockMovement.objects.filter(kind='RETURN').order_by('pk')
+        self.assertEqual([(m.order_item_id, m.quantity) for m in movements],
+                         [(self.returns[0].order_item_id, 1), (self.returns[3].order_item_id, 2)])
+
+        # Already decided returns stay as they are
+        again = self.decide({'ids': [self.returns[0].id], 'status': 'REJECTED'}).json()
+        self.assertEqual(again['skipped'], [{'id': self.returns[0].id, 'status': 'APPROVED'}])
+
+    def test_order_item_is_restocked_once(self):
+        first = self.returns[1]
+        duplicate = Return.objects.create(order_item=first.order_item)
+        response = self.decide({'ids': [first.id, duplicate.id], 'status': 'APPROVED'}).json()
+        self.assertEqual(response['updated'], [first.id])
+        self.assertEqual(response['skipped'], [
+            {'id': duplicate.id, 'status': 'PENDING', 'reason': "Order item already returned"}])
+        later = Return.objects.create(order_item=first.order_item)
+        self.assertEqual(self.decide({'ids': [later.id], 'status': 'APPROVED'}).json()['updated'], [])
+        self.assertEqual(Product.objects.get(pk=first.order_item.product_id).stock_quantity, 11)
+        self.assertEqual(StockMovement.objects.filter(kind='RETURN').count(), 1)
+        # A duplicate can still be rejected
+        self.assertEqual(self.decide({'ids': [later.id], 'status': 'REJECTED'}).json()['updated'], [later.id])
+
+    def test_return_of_unshipped_order_is_not_restocked(self):
+        product = Product.objects.create(name="Reserved", price=Decimal('2.00'), stock_quantity=10)
+        order = place_order(self.returns[0].order_item.order.customer,
+                            [{'product': product.id, 'quantity': Decimal('4')}])
+        pending = Return.objects.create(order_item=order.orderitem_set.get())
+        response = self.decide({'ids': [pending.id], 'status': 'APPROVED'}).json()
+        self.assertEqual(response['updated'], [])
+        self.assertEqual(response['skipped'], [{'id': pending.id, 'status': 'PENDING', 'reason': "Order not shipped"}])
+        # Cancelling gives the reserved units back, once
+        self.client.put(reverse('update_order', args=[order.id]), {'status': 'cancelled'},
+                        content_type='application/json')
+        self.assertEqual(self.decide({'ids': [pending.id], 'status': 'APPROVED'}).json()['updated'], [])
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_quantity, 10)
+        self.assertEqual(StockMovement.objects.filter(kind='RETURN').count(), 0)
+
+    def test_rejection_leaves_stock(self):
+        response = self.decide({'ids': [self.returns[1].id], 'status': 'REJECTED'})
+        self.assertEqual(response.json()['restocked'], {})
+        self.assertEqual(Return.objects.get(pk=self.returns[1].id).status, 'REJECTED')
+        self.assertEqual(self.returns[1].order_item.product.stock_quantity, 10)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_invalid_requests(self):
+        for body in ({'ids': [], 'status': 'APPROVED'}, {'ids': [1], 'status': 'PENDING'}, {'status': 'APPROVED'}):
+            self.assertEqual(self.decide(body).status_code, 400, body)
+
+    def test_admin_list_joins_related_rows(self):
+        from django.contrib.auth.models import User as AdminUser
+        self.client.force_login(AdminUser.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        url = reverse('admin:inventory_return_changelist')
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        create_orders(5, offset=3)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+        self.assertEqual(len(small), len(large))
+
+
+@override_settings(FORECAST_HISTORY_DAYS=10, REORDER_LEAD_TIME_DAYS=2, REORDER_REVIEW_DAYS=3, REORDER_SERVICE_Z=1.0)
+class ReorderForecastTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        customer = Customer.objects.create(first_name="Jan", last_name="Kowalski", email="jan@example.com")
+        self.fast = Product.objects.create(name="Fast", price=Decimal('1.00'), stock_quantity=3)
+        self.slow = Product.objects.create(name="Slow", price=Decimal('1.00'), stock_quantity=100)
+
+        def sell(product, quantity, days_ago, status='PENDING'):
+            order = Order.objects.create(customer=customer, status=status)
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+            noon = datetime.datetime.combine(self.today - datetime.timedelta(days=days_ago), datetime.time(12))
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.make_aware(noon))
+
+        sell(self.fast, 3, 0)
+        sell(self.fast, 1, 0)
+        sell(self.fast, 4, 1)
+        sell(self.fast, 50, 0, status='CANCELLED')
+        sell(self.slow, 1, 5)
+        sell(self.slow, 9, 10)  # before the analysed period
+
+    def test_daily_demand_matrix(self):
+        product_ids, matrix = forecast.daily_demand(10, self.today)
+        self.assertEqual(product_ids.tolist(), [self.fast.id, self.slow.id])
+        self.assertEqual(matrix.tolist(), [[0] * 8 + [4, 4], [0] * 4 + [1] + [0] * 5])
+
+    def test_suggestions(self):
+        result = forecast.compute_suggestions(self.today)
+        self.assertEqual(result['products_analysed'], 2)
+        # Fast: average 0.8 a day, std 1.69; reorder point 0.8 * 2 + 1.69 * sqrt(2)
+        self.assertEqual(result['suggestions'], [{
+            'product': self.fast.id, 'sku': self.fast.sku, 'name': "Fast", 'stock_quantity': '3.00',
+            'average_daily_demand': 0.8, 'demand_7d': 1.14, 'demand_28d': 0.8, 'demand_std': 1.69,
+            'days_of_cover': 3.8, 'reorder_point': 3.99, 'suggested_quantity': 4,
+        }])
+
+    def test_endpoint_serves_the_stored_result(self):
+        url = reverse('get_reorder_suggestions')
+        first = self.client.get(url).json()
+        self.assertEqual(first['count'], 1)
+        Product.objects.filter(pk=self.slow.pk).update(stock_quantity=0)
+        # Shared through the database, not the process-local cache
+        cache.get_cache().clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json(), first)
+        with override_settings(FORECAST_MAX_AGE_SECONDS=0):
+            self.assertEqual(self.client.get(url).json()['count'], 2)
+        self.assertEqual(ReorderForecast.objects.count(), 1)
+        self.assertEqual(self.client.get(url, {'limit': 'all'}).status_code, 400)
+
+        out = io.StringIO()
+        call_command('refresh_reorder_suggestions', stdout=out)
+        self.assertIn("2 due for reordering", out.getvalue())
+        self.assertEqual(self.client.get(url, {'limit': 1}).json()['count'], 2)
+        self.assertEqual(len(self.client.get(url, {'limit': 1}).json()['suggestions']), 1)
+
+    def test_refresh_job(self):
+        job = jobs.enqueue('refresh_forecast')
+        call_command('run_jobs', processes=0, once=True, stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual(job.result['suggestions'], 1)
+        self.assertEqual(ReorderForecast.objects.get().result['computed_at'], job.result['computed_at'])
+
+
+class ScanLookupTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        scan.hot.clear()
+        create_orders(3)
+        self.products = list(Product.objects.order_by('pk'))
+
+    def scan(self, code):
+        return self.client.get(reverse('scan_product', args=[code]))
+
+    def test_lookup_by_barcode_or_sku(self):
+        product = self.products[0]
+        response = self.scan(product.barcode)
+        self.assertEqual(response.json(), ProductSerializer(product).data)
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(self.scan(product.sku).json()['id'], product.id)
+        self.assertEqual(self.scan('unknown').status_code, 404)
+
+    def test_warm_lookup_skips_the_database(self):
+        self.scan(self.products[0].barcode)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.scan(self.products[0].barcode).status_code, 200)
+
+    def test_product_writes_invalidate(self):
+        product = self.products[0]
+        self.scan(product.barcode)
+        self.client.patch(reverse('update_product', args=[product.id]), {'name': "Renamed"}, content_type='application/json')
+        response = self.scan(product.barcode)
+        self.assertEqual(response.json()['name'], "Renamed")
+        self.assertEqual(response['ETag'], '"v2"')
+        self.client.delete(reverse('delete_product', args=[product.id]))
+        self.assertEqual(self.scan(product.barcode).status_code, 404)
+
+    def test_writes_invalidate_only_their_products(self):
+        first, second = self.products[:2]
+        for product in (first, second):
+            self.scan(product.barcode)
+        place_order(Customer.objects.first(), [{'product': first.id, 'quantity': Decimal('2')}])
+        with self.assertNumQueries(0):
+            self.scan(second.barcode)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.scan(first.barcode).json()['stock_quantity'], '8.00')
+
+    def test_entries_expire(self):
+        product = self.products[0]
+        with override_settings(SCAN_CACHE_SECONDS=0):
+            self.scan(product.barcode)
+        with self.assertNumQueries(1):
+            self.scan(product.barcode)
+        with self.assertNumQueries(0):
+            self.scan(product.barcode)
+
+    @override_settings(SCAN_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        for product in self.products:
+            self.scan(product.barcode)
+        self.assertEqual(len(scan.hot), 2)
+        self.assertIsNone(scan.hot.get(self.products[0].barcode))
+
+    def test_batch_lookup(self):
+        codes = [self.products[0].barcode, self.products[1].sku, 'unknown', self.products[0].barcode]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('scan_products'), {'codes': codes}, content_type='application/json')
+        self.assertEqual(response.json(), {
+            'products': {codes[0]: ProductSerializer(self.products[0]).data, codes[1]: ProductSerializer(self.products[1]).data},
+            'missing': ['unknown'],
+        })
+        with self.assertNumQueries(1):
+            self.client.post(reverse('scan_products'), {'codes': codes + [self.products[2].sku]}, content_type='application/json')
+        for body in ({'codes': []}, {'codes': ['x'] * (scan.MAX_SCAN_CODES + 1)}, {}):
+            self.assertEqual(self.client.post(reverse('scan_products'), body, content_type='application/json').status_code, 400)
@@ -0,0 +1,82 @@
+"""
+Order totals derived from their items.
+
+``Order.total`` is ``SUM(quantity * price)`` over the order's items. It is
+kept current by the ``OrderItem`` signals (see signals.py), one UPDATE per
+changed item, and can be recomputed for the whole table with the
+``recompute_order_totals`` command or the ``recompute_totals`` job. Orders
+without items keep the total they were given.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from .models import Order, OrderItem
+
+# Orders per UPDATE of the backfill
+TOTAL_CHUNK_SIZE = 5000
+
+TOTAL = DecimalField(max_digits=10, decimal_places=2)
+
+CENT = Decimal('0.01')
+
+
+def to_cents(amount):
+    # Half up, like ROUND() on MySQL DECIMAL and SQLite, so Python and SQL totals agree
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def order_items():
+    return OrderItem.objects.filter(order=OuterRef('pk'))
+
+
+def items_total():
+    """The items total of the order in the outer query, as a correlated subquery (NULL without items)."""
+    # Rounded to the column's scale, so the drift check compares equal values as equal on every backend
+    sums = order_items().order_by().values('order').annotate(
+        total=Round(Sum(F('quantity') * F('price'), output_field=TOTAL), 2, output_field=TOTAL))
+    return Subquery(sums.values('total'), output_field=TOTAL)
+
+
+def order_total(order_id):
+    """Items total of one order, rounded to cents like ``items_total()``; None if it has no items."""
+    total = OrderItem.objects.filter(order_id=order_id).aggregate(
+        total=Sum(F('quantity') * F('price'), output_field=TOTAL))['total']
+    return None if total is None else to_cents(total)
+
+
+def refresh_totals(order_ids):
+    """Set the total of ``order_ids`` from their items, in one UPDATE; an order left without items totals 0."""
+    return Order.objects.filter(pk__in=order_ids).update(
+        total=Coalesce(items_total(), Value(0), output_field=TOTAL))
+
+
+def recompute_totals(chunk_size=TOTAL_CHUNK_SIZE, progress=None):
+    """
+    Recompute the totals of every order with items, ``chunk_size`` orders per statement.
+
+    Each chunk is a primary key range, fixed with one
+    ``UPDATE ... SET total = (SELECT SUM(...)) WHERE id BETWEEN ... AND total <> (SELECT SUM(...))``
+    in its own transaction, so only drifted rows are written and no lock
+    is held for long. ``progress(done, total)`` is called after each chunk.
+    Returns the number of orders looked at and of totals corrected.
+    """
+    count = Order.objects.count() if progress else 0
+    done = corrected = 0
+    last_pk = 0
+    while True:
+        ids = list(Order.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        chunk = Order.objects.filter(pk__gte=ids[0], pk__lte=ids[-1])
+        with transaction.atomic():
+            corrected += (chunk.filter(Exists(order_items()))
+                          .exclude(total=items_total())
+                          .update(total=items_total()))
+        done += len(ids)
+        last_pk = ids[-1]
+        if progress:
+            progress(done, count)
+    return {'orders': done, 'corrected': corrected}
@@ -1,5 +1,6 @@
+from contextlib import nullcontext
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse
 from .models import Customer
 from .models import Product
 from .models import Role
@@ -7,63 +8,186 @@ from .models import Order
 from .models import OrderItem
 from .models import Return
 from .models import User
+from .models import StockMovement
+from .models import Job
+from django.db import router, transaction
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework import status
-from .serializers import ProductSerializer, CustomerSerializer, OrdersSerializer, ReturnSerializer, OrderItemSerializer, RoleSerializer
+from rest_framework import serializers, status
+from .serializers import ProductSerializer, CustomerSerializer, OrdersSerializer, ReturnSerializer, OrderItemSerializer, RoleSerializer, OrderLineSerializer
+from .serializers import ProductStockSerializer, StockMovementSerializer, OrderSelectionSerializer, OrderStatusChangeSerializer
+from .serializers import CustomerUpsertSerializer, JobSerializer, ProductUpdateSerializer, ReturnDecisionSerializer, ScanSerializer
+from .pagination import ListQueryError, list_response
+from .cache import cached_response
+from . import jobs, ledger
+from .filters import CUSTOMER_LIST, MOVEMENT_LIST, ORDER_LIST, PRODUCT_LIST, parse_decimal, parse_int, parse_moment
+from .forecast import MAX_SUGGESTION_LIMIT, SUGGESTION_LIMIT, suggestion_page
+from .stats import LOW_STOCK_THRESHOLD, MAX_REVENUE_DAYS, REVENUE_DAYS, dashboard_stats
+from .orders import InsufficientStock, OrderPlacementError, TRANSITIONS, delete_orders, place_order, release_stock, transition_orders
+from .products import save_product_changes
+from .customers import import_customers, resolve_customer
+from .returns import decide_returns
+from .scan import lookup
+from .totals import order_total
+from .versioning import VersionConflict, etag, if_match, precondition_failed_status, versioned_update
+from .bulk import BULK_BATCH_SIZE, MAX_BULK_BATCH_SIZE, MAX_BULK_ROWS, bulk_save_products
 
 
 
 @api_view(['GET'])
 def get_returns(request):
-     returns = Return.objects.all()
-     Serializer = ReturnSerializer(returns, many=True)
-     return Response(Serializer.data)
+     return list_response(request, Return.objects.all(), ReturnSerializer)
  
 @api_view(['GET'])
 def get_OrderItems(request):
-     orderItems = OrderItem.objects.all()
-     Serializer = OrderItemSerializer(orderItems, many=True)
-     return Response(Serializer.data)
+     return list_response(request, OrderItem.objects.all(), OrderItemSerializer)
 
+@cached_response('customers')
 @api_view(['GET'])
 def get_customers(request):
-    customers = Customer.objects.all()
-    serializer = CustomerSerializer(customers, many=True)
-    return Response(serializer.data)
+    return list_response(request, Customer.objects.all(), CustomerSerializer, spec=CUSTOMER_LIST)
     
+@cached_response('products')
 @api_view(['GET'])
 def get_products(request):
-    products = Product.objects.all()
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    return list_response(request, Product.objects.all(), ProductSerializer, spec=PRODUCT_LIST)
 
 
 @api_view(['GET'])
 def get_orders(request):
-    orders = Order.objects.all()
-    serializer = OrdersSerializer(orders, many=True)
-    return Response(serializer.data)
+    return list_response(request, Order.objects.all(), OrdersSerializer, related=['customer'], spec=ORDER_LIST)
+
+@api_view(['GET'])
+def get_product(request, id):
+    try:
+        product = Product.objects.get(pk=id)
+    except Product.DoesNotExist:
+        return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ProductSerializer(product).data, headers={'ETag': etag(product)})
+
+@api_view(['GET'])
+def scan_product(request, code):
+    # Product by barcode or SKU, from the in-process scan cache when warm (inventory/scan.py)
+    found = lookup([code]).get(code)
+    if found is None:
+        return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    row, tag = found
+    return Response(row, headers={'ETag': tag})
 
 @api_view(['POST'])
-def post_product(request):
-    if request.method == 'POST':
-        serializer = ProductSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+def scan_products(request):
+    # Body: {"codes": [...]}; products by code, plus the codes matching no product
+    serializer = ScanSerializer(data=request.data)
+    if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    codes = list(dict.fromkeys(serializer.validated_data['codes']))
+    found = lookup(codes)
+    return Response({
+        'products': {code: found[code][0] for code in codes if code in found},
+        'missing': [code for code in codes if code not in found],
+    })
+
+@api_view(['GET'])
+def get_customer(request, id):
+    try:
+        customer = Customer.objects.get(pk=id)
+    except Customer.DoesNotExist:
+        return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
+    data = CustomerSerializer(customer).data
+    data['orders'] = customer.order_set.count()  # Liczba zamówień klienta
+    return Response(data)
+
+@api_view(['GET'])
+def get_order(request, id):
+    try:
+        order = Order.objects.select_related('customer').get(pk=id)
+    except Order.DoesNotExist:
+        return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+    data = OrdersSerializer(order).data
+    data['items'] = OrderItemSerializer(order.orderitem_set.order_by('pk'), many=True).data
+    return Response(data, headers={'ETag': etag(order)})
+
+@api_view(['GET'])
+def get_stock(request):
+    # Stock of each product at ?at= (default: now), from the nearest snapshot plus later movements
+    try:
+        moment = parse_moment(end=True)(request.query_params['at']) if 'at' in request.query_params else timezone.now()
+    except ListQueryError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return list_response(request, ledger.stock_levels(moment), ProductStockSerializer, spec=PRODUCT_LIST)
+
+@api_view(['GET'])
+def get_stock_movements(request):
+    return list_response(request, StockMovement.objects.all(), StockMovementSerializer, spec=MOVEMENT_LIST)
+
+@api_view(['GET'])
+def get_stats(request):
+    # Dashboard aggregates computed in SQL; ?low_stock= threshold, ?days= of daily revenue
+    try:
+        threshold = parse_decimal(request.query_params.get('low_stock', LOW_STOCK_THRESHOLD))
+        days = parse_int(request.query_params.get('days', REVENUE_DAYS))
+    except ListQueryError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    days = max(1, min(days, MAX_REVENUE_DAYS))
+    return Response(dashboard_stats(low_stock_threshold=threshold, days=days))
+
+@api_view(['GET'])
+def get_reorder_suggestions(request):
+    # Products due for reordering, most urgent first; ?limit= suggestions (see inventory/forecast.py)
+    try:
+        limit = parse_int(request.query_params.get('limit', SUGGESTION_LIMIT))
+    except ListQueryError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(suggestion_page(max(1, min(limit, MAX_SUGGESTION_LIMIT))))
 
 @api_view(['POST'])
-def add_order(request):
+def post_product(request):
     if request.method == 'POST':
         serializer = ProductSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                product = serializer.save()
+                ledger.record([ledger.movement(product.id, 'RECEIPT', product.stock_quantity)])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def bulk_rows(request, noun):
+    # Returns (rows, batch_size, None) or (None, None, error response)
+    rows = request.data
+    if not isinstance(rows, list) or not rows:
+        return None, None, Response({"error": f"Expected a non-empty list of {noun}"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > MAX_BULK_ROWS:
+        return None, None, Response({"error": f"At most {MAX_BULK_ROWS} {noun} per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        batch_size = int(request.query_params.get('batch_size', BULK_BATCH_SIZE))
+    except ValueError:
+        return None, None, Response({"error": "batch_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    return rows, max(1, min(batch_size, MAX_BULK_BATCH_SIZE)), None
+
+def bulk_result_response(result):
+    if not result.created and not result.updated:
+        return Response(result.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+    return Response(result.as_dict(), status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+def bulk_products(request):
+    # Body: list of products; rows with "id" are updated, the rest created
+    rows, batch_size, error = bulk_rows(request, 'products')
+    if error:
+        return error
+    return bulk_result_response(bulk_save_products(rows, batch_size=batch_size))
+
+@api_view(['POST'])
+def bulk_customers(request):
+    # Body: list of customers; an existing email updates that customer, the rest are created
+    rows, batch_size, error = bulk_rows(request, 'customers')
+    if error:
+        return error
+    return bulk_result_response(import_customers(rows, batch_size=batch_size))
+
 @api_view(['PUT', 'PATCH'])
 def update_customer(request, id):
     try:
@@ -82,18 +206,34 @@ def update_customer(request, id):
 
 
 
-@api_view(['PUT'])
+def modified_response(request, instance):
+    return Response({"error": f"{instance._meta.object_name} was modified by another request"},
+                    status=precondition_failed_status(request))
+
+@api_view(['PUT', 'PATCH'])
 def update_product(request, id):
     try:
         product = Product.objects.get(pk=id)
     except Product.DoesNotExist:
         return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    serializer = ProductSerializer(product, data=request.data)
-    if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not if_match(request, product):
+        return modified_response(request, product)
+
+    # PATCH writes only the fields sent; "stock_delta" adjusts the stock atomically
+    serializer = ProductUpdateSerializer(product, data=request.data, partial=request.method == 'PATCH')
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    changes = dict(serializer.validated_data)
+    stock_delta = changes.pop('stock_delta', None)
+    try:
+        product = save_product_changes(product, changes, stock_delta, check_version='If-Match' in request.headers)
+    except Product.DoesNotExist:
+        return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    except VersionConflict:
+        return modified_response(request, product)
+    except InsufficientStock as exc:
+        return Response(exc.detail, status=status.HTTP_409_CONFLICT)
+    return Response(ProductSerializer(product).data, headers={'ETag': etag(product)})
 
 @api_view(['DELETE'])
 def delete_product(request, id):
@@ -106,12 +246,35 @@ def delete_product(request, id):
     return Response({"message": "Product deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 
-@api_view(['PUT'])
+ORDER_TOTAL = serializers.DecimalField(max_digits=10, decimal_places=2)
+ORDER_STATUS = serializers.CharField()
+
+def parse_status(value):
+    # Same checks as the bulk status change: a string among Order.STATUS_CHOICES, any case
+    return OrderStatusChangeSerializer().validate_status(ORDER_STATUS.run_validation(value))
+
+@api_view(['PUT', 'PATCH'])
 def update_order(request, id):
     try:
-        order = Order.objects.get(pk=id)
+        order = Order.objects.select_related('customer').get(pk=id)
     except Order.DoesNotExist:
         return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+    if not if_match(request, order):
+        return modified_response(request, order)
+
+    changes = {}
+    # Update order status and ensure it's uppercase; checked before anything is saved
+    if 'status' in request.data:
+        try:
+            target = parse_status(request.data.get('status'))
+        except serializers.ValidationError as e:
+            return Response({"status": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        # Only the moves of TRANSITIONS, as in the bulk endpoint: stock is reserved once and released once
+        if target != order.status:
+            if target not in TRANSITIONS[order.status]:
+                return Response({"status": [f"An order cannot move from {order.status} to {target}"]},
+                                status=status.HTTP_409_CONFLICT)
+            changes['status'] = target
     
     # Extract customer data
     customer_first_name = request.data.get('customer_first_name')
@@ -122,75 +285,139 @@ def update_order(request, id):
         customer = order.customer
         customer.first_name = customer_first_name
         customer.last_name = customer_last_name
-        customer.save()
+        customer.save(update_fields=['first_name', 'last_name', 'updated_at'])
     
-    # Update order status and ensure it's uppercase
-    if 'status' in request.data:
-        order.status = request.data.get('status').upper()
-    
-    # Convert total to decimal if provided
+    # The total of an order with items is computed from them (totals.py); only item-less orders take one
     if 'total' in request.data:
         try:
-            order.total = float(request.data.get('total'))
-        except (ValueError, TypeError):
+            total = ORDER_TOTAL.run_validation(request.data.get('total'))
+        except serializers.ValidationError:
             return Response({"error": "Invalid total value"}, status=status.HTTP_400_BAD_REQUEST)
+        items_total = order_total(order.pk)
+        if items_total is None:
+            changes['total'] = total
+        elif total != items_total:
+            return Response({"total": [f"The total is computed from the order items: {items_total}"]},
+                            status=status.HTTP_400_BAD_REQUEST)
     
-    order.save()
+    # Only the columns sent are written; with If-Match only if the order is still at that version
+    checked = 'If-Match' in request.headers
+    if changes:
+        selected = Order.objects.filter(pk=order.pk)
+        if 'status' in changes:
+            # The move was checked from this status; a concurrent change makes the UPDATE match nothing
+            selected = selected.filter(status=order.status)
+        cancelling = changes.get('status') == 'CANCELLED'
+        with transaction.atomic() if cancelling else nullcontext():
+            if not versioned_update(selected, order.version if checked else None, **changes):
+                if checked or 'status' in changes:
+                    return modified_response(request, order)
+                return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+            if cancelling:
+                release_stock([order.pk], 'cancelled')  # only unshipped orders can be cancelled
+        for field, value in changes.items():
+            setattr(order, field, value)
+        order.version += 1
     
     # Return the updated order
     serializer = OrdersSerializer(order)
-    return Response(serializer.data)
+    # Without If-Match someone else may have bumped the version in between
+    return Response(serializer.data, headers={'ETag': etag(order)} if checked else None)
 
 
 
 
 @api_view(['DELETE'])
 def delete_order(request, id):
-    try:
-        order = Order.objects.get(pk=id)
-    except Order.DoesNotExist:
+    # Same path as the bulk delete, so an unshipped order gives its stock back
+    if not delete_orders(Order.objects.filter(pk=id)):
         return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    order.delete()
     return Response({"message": "Order deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
+def selected_orders(data):
+    # Orders chosen by a validated OrderSelectionSerializer: explicit ids or list filters
+    if 'ids' in data:
+        return Order.objects.filter(pk__in=data['ids'])
+    unknown = sorted(set(data['filter']) - set(ORDER_LIST.filters) - {'search'})
+    if unknown:
+        # An ignored key would silently widen the selection
+        raise ListQueryError(f"Unknown filters: {', '.join(unknown)}")
+    return ORDER_LIST.filter(Order.objects.all(), data['filter'])
+
+def missing_ids(data, found):
+    return sorted(set(data.get('ids', ())) - set(found))
+
+@api_view(['POST'])
+def bulk_order_status(request):
+    # Body: {"ids": [...]} or {"filter": {...}}, plus the target "status"
+    serializer = OrderStatusChangeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    try:
+        result = transition_orders(selected_orders(data), data['status'])
+    except ListQueryError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    result['missing'] = missing_ids(data, result['updated'] + [row['id'] for row in result['skipped']])
+    return Response(result)
+
+@api_view(['DELETE'])
+def bulk_delete_orders(request):
+    serializer = OrderSelectionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    try:
+        deleted = delete_orders(selected_orders(data))
+    except ListQueryError as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'deleted': deleted, 'missing': missing_ids(data, deleted)})
+
+@api_view(['POST'])
+def bulk_return_status(request):
+    # Body: {"ids": [...], "status": "APPROVED" | "REJECTED", "notes": optional}
+    serializer = ReturnDecisionSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    result = decide_returns(data['ids'], data['status'], data.get('notes'))
+    found = result['updated'] + [row['id'] for row in result['skipped']]
+    result['missing'] = missing_ids(data, found)
+    return Response(result)
+
 @api_view(['POST'])
+@transaction.atomic
 def add_order(request):
     if request.method == 'POST':
-        # Extract customer data
-        customer_data = request.data.get('customer', {})
-        
-        try:
-            # Try to find existing customer
-            customer = Customer.objects.get(
-                first_name=customer_data.get('first_name'),
-                last_name=customer_data.get('last_name')
-            )
-        except Customer.DoesNotExist:
-            # Create new customer if not found
-            customer_serializer = CustomerSerializer(data=customer_data)
-            if customer_serializer.is_valid():
-                customer = customer_serializer.save()
-            else:
-                return Response(customer_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(request.data, dict):
+            return Response({"error": "Expected an order object"}, status=status.HTTP_400_BAD_REQUEST)
+        # Customer is identified by email; created on the first order
+        customer_serializer = CustomerUpsertSerializer(data=request.data.get('customer', {}))
+        if not customer_serializer.is_valid():
+            return Response(customer_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        customer = resolve_customer(customer_serializer.validated_data)
         
         # Get status and ensure it's uppercase
-        status_value = request.data.get('status', 'PENDING').upper()
-        
-        # Create order data
-        order_data = {
-            'customer': customer.id,
-            'status': status_value,
-            'total': request.data.get('total', 0),
-            'order_date': timezone.now()
-        }
-        
-        # Create the order
-        serializer = OrdersSerializer(data=order_data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        status_value = str(request.data.get('status', 'PENDING')).upper()
+        if status_value not in dict(Order.STATUS_CHOICES):
+            return Response({"status": [f"Invalid status '{status_value}'"]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Line items; the total is computed from product prices, not taken from the client
+        lines = OrderLineSerializer(data=request.data.get('items'), many=True, allow_empty=False)
+        if not lines.is_valid():
+            return Response({"items": lines.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            order = place_order(customer, lines.validated_data, status=status_value)
+        except OrderPlacementError as exc:
+            # Don't keep a customer created for an order that was refused
+            transaction.set_rollback(True)
+            code = status.HTTP_409_CONFLICT if isinstance(exc, InsufficientStock) else status.HTTP_400_BAD_REQUEST
+            return Response(exc.detail, status=code)
+
+        data = OrdersSerializer(order).data
+        data['items'] = OrderItemSerializer(order.orderitem_set.order_by('pk'), many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
     
 @api_view(['POST'])
 def create_role(request):
@@ -201,6 +428,7 @@ def create_role(request):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+@cached_response('roles')
 @api_view(['GET'])
 def get_roles(request):
     roles = Role.objects.all()  # Pobierz wszystkie role
@@ -231,4 +459,48 @@ def delete_role(request, id):
         return Response({"error": "Role not found"}, status=status.HTTP_404_NOT_FOUND)
 
     role.delete()
-    return Response({"message": "Role deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    return Response({"message": "Role deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+def create_job(request):
+    # Body: {"kind": "export", "params": {...}}; the job is run by the run_jobs worker command
+    kind = request.data.get('kind')
+    params = request.data.get('params', {})
+    if not isinstance(kind, str) or not isinstance(params, dict):
+        return Response({"error": "Expected a job kind and a params object"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        job = jobs.enqueue(kind, params)
+    except serializers.ValidationError as exc:
+        return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': reverse('get_job', kwargs={'id': job.id})})
+
+
+def find_job(id):
+    # Job status changes every second: read it from the primary, not a lagging replica
+    return Job.objects.using(router.db_for_write(Job)).get(pk=id)
+
+
+@api_view(['GET'])
+def get_job(request, id):
+    try:
+        job = find_job(id)
+    except Job.DoesNotExist:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(JobSerializer(job).data)
+
+
+@api_view(['GET'])
+def get_job_result(request, id):
+    try:
+        job = find_job(id)
+    except Job.DoesNotExist:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != 'DONE':
+        return Response({"error": f"Job is {job.status.lower()}"}, status=status.HTTP_409_CONFLICT)
+    path = jobs.results_dir() / job.result_file
+    if not job.result_file or not path.is_file():
+        return Response({"error": "Job has no result file"}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name,
+                        content_type=jobs.result_content_type(path))
@@ -0,0 +1,25 @@
+"""
+Entry points of the ``run_jobs`` pool processes.
+
+Pool processes are spawned, not forked, so they don't share the parent's
+database connections; they unpickle these functions before Django is set
+up, which is why this module imports nothing from the app at load time.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def run_job(job_id):
+    from django.db import close_old_connections
+
+    from .jobs import execute
+
+    # No request cycle here: drop connections past CONN_MAX_AGE or broken between jobs
+    close_old_connections()
+    try:
+        return execute(job_id)
+    finally:
+        close_old_connections()
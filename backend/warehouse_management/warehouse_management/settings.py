@@ -10,12 +10,19 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_flag(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -29,7 +36,7 @@ ALLOWED_HOSTS = ['*']
 
 REST_FRAMEWORK = {
      'DEFAULT_RENDERER_CLASSES': (
-         'rest_framework.renderers.JSONRenderer',
+         'inventory.renderers.FastJSONRenderer',
      ),
  }
  
@@ -49,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.middleware.PerformanceMiddleware',
+    'inventory.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,12 +67,27 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-MIDDLEWARE.insert(1, 'corsheaders.middleware.CorsMiddleware')
+MIDDLEWARE.insert(3, 'corsheaders.middleware.CorsMiddleware')
+
+# Requests slower than this (seconds) are logged with their slowest SQL, see inventory/middleware.py
+SLOW_REQUEST_SECONDS = 0.5
+
+# Background jobs (inventory/jobs.py), run by `manage.py run_jobs`; result files are written here
+JOB_RESULTS_DIR = Path(os.environ.get('JOB_RESULTS_DIR', BASE_DIR / 'job_results'))
+
+# Serve the GET endpoints with the async views in inventory/async_views.py.
+# Enable for ASGI deployments (uvicorn warehouse_management.asgi:application);
+# keep off under WSGI, where async views would run through a sync adapter.
+ASYNC_READ_VIEWS = env_flag('ASYNC_READ_VIEWS')
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "https://warehouse-management-system-sage.vercel.app"  # Adres frontendu
 ]
+# Optimistic concurrency (inventory/versioning.py): the browser must be able to read ETag and send If-Match
+# X-Primary-Until: read-your-writes pin the frontend echoes back, see inventory/routers.py
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match', 'x-primary-until')
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Primary-Until']
 
 ROOT_URLCONF = 'warehouse_management.urls'
 
@@ -89,22 +113,92 @@ WSGI_APPLICATION = 'warehouse_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connection settings come from the environment; the defaults are the Railway MySQL instance
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.mysql')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'railway',  # Nazwa bazy danych z Railway
-        'USER': 'root',  # Użytkownik z Railway
-        'PASSWORD': 'mSyCDkPTpnQttocwMgErgmgxMwBMxpqa',  # Hasło z Railway
-        'HOST': 'maglev.proxy.rlwy.net',  # Host z Railway
-        'PORT': '33920',  # Port z Railway
-        'OPTIONS': {
-            'charset': 'utf8mb4',
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'"
-        },
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME', 'railway'),  # Nazwa bazy danych z Railway
+        'USER': os.environ.get('DB_USER', 'root'),  # Użytkownik z Railway
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'mSyCDkPTpnQttocwMgErgmgxMwBMxpqa'),  # Hasło z Railway
+        'HOST': os.environ.get('DB_HOST', 'maglev.proxy.rlwy.net'),  # Host z Railway
+        'PORT': os.environ.get('DB_PORT', '33920'),  # Port z Railway
+        # Reuse a connection for this many seconds instead of paying the TCP/TLS/auth
+        # handshake to the proxy on every request; health checks replace connections
+        # the proxy dropped. Under ASGI every request runs in its own thread, so
+        # persistent connections would pile up: there the default is 0, and
+        # PostgreSQL can use the driver pool instead (DB_POOL).
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0 if ASYNC_READ_VIEWS else 60)),
+        'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
     }
 }
 
+if DB_ENGINE == 'django.db.backends.mysql':
+    DATABASES['default']['OPTIONS'] = {
+        'charset': 'utf8mb4',
+        'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+    }
+elif DB_ENGINE == 'django.db.backends.postgresql' and env_flag('DB_POOL'):
+    # psycopg connection pool shared by all threads (WSGI and ASGI); needs CONN_MAX_AGE = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Read replicas for GET requests (see inventory/routers.py): comma separated
+# hosts, or database files when DB_ENGINE is SQLite
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(','))):
+    location = 'NAME' if DB_ENGINE == 'django.db.backends.sqlite3' else 'HOST'
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        location: replica.strip(),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica_')]
+DATABASE_ROUTERS = ['inventory.routers.ReplicaRouter']
+# Replicas further behind the primary are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+# After a write, the client reads from the primary for this long
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process; point 'default' at Redis/Memcached to share
+# cached responses and invalidations between workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'warehouse-management',
+    }
+}
 
+# Cache alias and lifetime (seconds) of cached GET responses, see inventory/cache.py
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Products per process kept by the barcode/SKU scan lookup and the seconds each
+# stays cached, see inventory/scan.py
+SCAN_CACHE_SIZE = int(os.environ.get('SCAN_CACHE_SIZE', 10000))
+SCAN_CACHE_SECONDS = int(os.environ.get('SCAN_CACHE_SECONDS', 30))
+
+# Reorder suggestions (inventory/forecast.py): days of order history analysed,
+# supplier lead time and review period in days, safety stock z-score (1.65 ~ 95%
+# service level), and the age (seconds) after which a request recomputes them.
+# Results are stored in the database, so `manage.py refresh_reorder_suggestions`
+# or a 'refresh_forecast' job scheduled more often than that serves every worker.
+FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 90))
+REORDER_LEAD_TIME_DAYS = int(os.environ.get('REORDER_LEAD_TIME_DAYS', 7))
+REORDER_REVIEW_DAYS = int(os.environ.get('REORDER_REVIEW_DAYS', 14))
+REORDER_SERVICE_Z = float(os.environ.get('REORDER_SERVICE_Z', 1.65))
+FORECAST_MAX_AGE_SECONDS = int(os.environ.get('FORECAST_MAX_AGE_SECONDS', 3600))
 
 
 # Password validation
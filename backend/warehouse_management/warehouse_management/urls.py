@@ -1,26 +1,56 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
+from inventory.export import export_table
+from inventory.metrics import metrics_view
 from inventory.views import (
-    get_products, get_customers, post_product, get_orders, update_order, delete_order,
-    update_product, delete_product, add_order, update_customer, get_returns, get_OrderItems, create_role, get_roles, update_role, delete_role
+    post_product, bulk_products, bulk_customers, update_order, delete_order, bulk_order_status, bulk_delete_orders,
+    update_product, delete_product, add_order, update_customer, create_role, update_role, delete_role,
+    create_job, get_job, get_job_result, bulk_return_status, scan_products,
 )
 
+# Read endpoints: async views under ASGI (settings.ASYNC_READ_VIEWS), DRF views otherwise
+if settings.ASYNC_READ_VIEWS:
+    from inventory import async_views as read_views
+else:
+    from inventory import views as read_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('get/customers/', get_customers, name='get_customers'),
-    path('get/products/', get_products, name='get_products'),
+    path('get/customers/', read_views.get_customers, name='get_customers'),
+    path('get/customers/<int:id>/', read_views.get_customer, name='get_customer'),
+    path('get/products/', read_views.get_products, name='get_products'),
+    path('get/products/<int:id>/', read_views.get_product, name='get_product'),
+    path('get/products/scan/<str:code>/', read_views.scan_product, name='scan_product'),
+    path('post/products/scan/', scan_products, name='scan_products'),
     path('post/products/', post_product, name='post_product'),
-    path('get/orders/', get_orders, name='get_orders'),
+    path('post/products/bulk/', bulk_products, name='bulk_products'),
+    path('get/orders/', read_views.get_orders, name='get_orders'),
+    path('get/orders/<int:id>/', read_views.get_order, name='get_order'),
+    path('post/orders/', add_order, name='add_order'),
     path('update/products/<int:id>/', update_product, name='update_product'),
     path('delete/products/<int:id>/', delete_product, name='delete_product'),
+    path('post/customers/bulk/', bulk_customers, name='bulk_customers'),
     path('update/customers/<int:id>/', update_customer, name='update_customer'), 
-    path('get/returns/', get_returns, name='get_returns'),
-    path('get/orderitems/', get_OrderItems, name='get_returns'),
+    path('get/returns/', read_views.get_returns, name='get_returns'),
+    path('update/returns/bulk/status/', bulk_return_status, name='bulk_return_status'),
+    path('stats/', read_views.get_stats, name='get_stats'),
+    path('get/reorder-suggestions/', read_views.get_reorder_suggestions, name='get_reorder_suggestions'),
+    path('get/stock/', read_views.get_stock, name='get_stock'),
+    path('get/stock-movements/', read_views.get_stock_movements, name='get_stock_movements'),
+    path('get/orderitems/', read_views.get_OrderItems, name='get_orderitems'),
     path('update/orders/<int:id>/', update_order, name='update_order'),
+    path('update/orders/bulk/status/', bulk_order_status, name='bulk_order_status'),
+    path('delete/orders/bulk/', bulk_delete_orders, name='bulk_delete_orders'),
     path('delete/orders/<int:id>/', delete_order, name='delete_order'),
     path('api/roles/', create_role, name='create_role'),
-    path('api/roles/list/', get_roles, name='get_roles'),
+    path('api/roles/list/', read_views.get_roles, name='get_roles'),
     path('api/roles/<int:id>/', update_role, name='update_role'),
     path('api/roles/delete/<int:id>/', delete_role, name='delete_role'),
+    path('export/<str:table>/', export_table, name='export_table'),
+    path('post/jobs/', create_job, name='create_job'),
+    path('get/jobs/<int:id>/', get_job, name='get_job'),
+    path('get/jobs/<int:id>/result/', get_job_result, name='get_job_result'),
+    path('metrics', metrics_view, name='metrics'),
 
 ]
@@ -10,6 +10,7 @@ import {
 import { Package, Users, ShoppingCart, AlertTriangle } from "lucide-react";
 import { useEffect, useState } from "react";
 import axios from "axios";
+import "@/lib/replica-pin";
 
 export default function AdminDashboardPage() {
   const [totalProducts, setTotalProducts] = useState(0);
@@ -27,6 +27,7 @@ import {
   LineChart,
 } from "lucide-react";
 import axios from "axios";
+import "@/lib/replica-pin";
 import Link from "next/link";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
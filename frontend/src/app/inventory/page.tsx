@@ -6,6 +6,7 @@ import type React from "react";
 import { ThemeToggle } from "@/components/theme-toggle";
 import { useState, useEffect, useMemo } from "react";
 import axios from "axios";
+import "@/lib/replica-pin";
 import {
   Truck,
   ClipboardList,
@@ -52,6 +52,7 @@ import {
 } from "@/components/ui/dropdown-menu";
 import { Badge } from "@/components/ui/badge";
 import axios from "axios";
+import "@/lib/replica-pin";
 
 function StatusBadge({ status }: { status: string }) {
   let variant: "outline" | "secondary" | "destructive" | "default" = "outline";
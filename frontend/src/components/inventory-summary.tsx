@@ -2,6 +2,7 @@
 
 import { useEffect, useState } from "react";
 import axios from "axios";
+import "@/lib/replica-pin";
 import { Badge } from "@/components/ui/badge";
 import { Progress } from "@/components/ui/progress";
 import { Package2, AlertTriangle, AlertCircle } from "lucide-react";
@@ -20,10 +21,11 @@ export function InventorySummary() {
   useEffect(() => {
     const fetchProducts = async () => {
       try {
-        const response = await axios.get("http://localhost:8000/get/products/");
-        console.log(response.data);
-        const lastFiveProducts = response.data.slice(-4);
-        setProducts(lastFiveProducts);
+        // Only the four newest products are shown
+        const response = await axios.get("http://localhost:8000/get/products/", {
+          params: { ordering: "-id", limit: 4 },
+        });
+        setProducts(response.data.results.reverse());
       } catch (error) {
         console.error("Error fetching product data:", error);
       } finally {
@@ -2,6 +2,7 @@
 
 import { useEffect, useState } from "react";
 import axios from "axios";
+import "@/lib/replica-pin";
 import { format } from "date-fns";
 import {
   CalendarIcon,
@@ -9,6 +9,7 @@ import {
   ArrowDownIcon,
 } from "lucide-react";
 import axios from "axios";
+import "@/lib/replica-pin";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { useEffect, useState } from "react";
 import { motion } from "framer-motion";
@@ -26,22 +27,14 @@ export function StatsCards() {
     const fetchData = async () => {
       try {
         setLoading(true);
-        const [productsRes, ordersRes] = await Promise.all([
-          axios.get("http://localhost:8000/get/products/"),
-          axios.get("http://localhost:8000/get/orders/"),
-        ]);
+        // Aggregates are computed by the backend
+        const statsRes = await axios.get("http://localhost:8000/stats/", {
+          params: { low_stock: 10 },
+        });
 
-        setTotalProducts(productsRes.data.length);
-        const lowStockProducts = productsRes.data.filter(
-          (product: { stock_quantity: number }) => product.stock_quantity <= 10
-        );
-        setLowStockCount(lowStockProducts.length);
-
-        // Orders
-        const pendingCount = ordersRes.data.filter(
-          (order: { status: string }) => order.status === "PENDING"
-        ).length;
-        setPendingOrders(pendingCount);
+        setTotalProducts(statsRes.data.inventory.products);
+        setLowStockCount(statsRes.data.inventory.low_stock);
+        setPendingOrders(statsRes.data.orders.by_status.PENDING.count);
 
         setLoading(false);
       } catch (error) {
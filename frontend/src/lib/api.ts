@@ -1,3 +1,5 @@
+import { pinHeaders } from "@/lib/replica-pin";
+
 // API base URL - adjust this to match your Django backend URL
 const API_BASE_URL = "http://localhost:8000";
 
@@ -49,7 +51,7 @@ export interface Return {
 
 // API functions
 export async function getProducts(): Promise<Product[]> {
-  const response = await fetch(`${API_BASE_URL}/get/products/`);
+  const response = await fetch(`${API_BASE_URL}/get/products/`, { headers: pinHeaders() });
   if (!response.ok) {
     throw new Error("Failed to fetch products");
   }
@@ -57,7 +59,7 @@ export async function getProducts(): Promise<Product[]> {
 }
 
 export async function getOrders(): Promise<Order[]> {
-  const response = await fetch(`${API_BASE_URL}/get/orders/`);
+  const response = await fetch(`${API_BASE_URL}/get/orders/`, { headers: pinHeaders() });
   if (!response.ok) {
     throw new Error("Failed to fetch orders");
   }
@@ -65,7 +67,7 @@ export async function getOrders(): Promise<Order[]> {
 }
 
 export async function getCustomers(): Promise<Customer[]> {
-  const response = await fetch(`${API_BASE_URL}/get/customers/`);
+  const response = await fetch(`${API_BASE_URL}/get/customers/`, { headers: pinHeaders() });
   if (!response.ok) {
     throw new Error("Failed to fetch customers");
   }
@@ -73,7 +75,7 @@ export async function getCustomers(): Promise<Customer[]> {
 }
 
 export async function getReturns(): Promise<Return[]> {
-  const response = await fetch(`${API_BASE_URL}/get/returns/`);
+  const response = await fetch(`${API_BASE_URL}/get/returns/`, { headers: pinHeaders() });
   if (!response.ok) {
     throw new Error("Failed to fetch returns");
   }
@@ -81,7 +83,7 @@ export async function getReturns(): Promise<Return[]> {
 }
 
 export async function getOrderItems(): Promise<OrderItem[]> {
-  const response = await fetch(`${API_BASE_URL}/get/orderitems/`);
+  const response = await fetch(`${API_BASE_URL}/get/orderitems/`, { headers: pinHeaders() });
   if (!response.ok) {
     throw new Error("Failed to fetch order items");
   }
@@ -0,0 +1,42 @@
+import axios from "axios";
+
+// Read-your-writes with database replicas: after a write the API answers with
+// X-Primary-Until, and reads sending it back go to the primary until then
+// (backend/warehouse_management/inventory/routers.py). The API is called
+// cross-site, so its cookie with the same value never comes back.
+export const PIN_HEADER = "X-Primary-Until";
+
+let primaryUntil = "";
+
+export function rememberPin(value: string | null | undefined) {
+  // The server compares the value with its own clock and ignores it once expired
+  if (value && (!primaryUntil || parseFloat(value) > parseFloat(primaryUntil))) {
+    primaryUntil = value;
+  }
+}
+
+export function pinHeaders(): Record<string, string> {
+  return primaryUntil ? { [PIN_HEADER]: primaryUntil } : {};
+}
+
+// Every component uses the default axios instance: install the interceptors once
+const installed = axios as typeof axios & { replicaPin?: boolean };
+if (!installed.replicaPin) {
+  installed.replicaPin = true;
+  axios.interceptors.request.use((config) => {
+    if (primaryUntil) {
+      config.headers.set(PIN_HEADER, primaryUntil);
+    }
+    return config;
+  });
+  axios.interceptors.response.use(
+    (response) => {
+      rememberPin(response.headers[PIN_HEADER.toLowerCase()]);
+      return response;
+    },
+    (error) => {
+      rememberPin(error?.response?.headers?.[PIN_HEADER.toLowerCase()]);
+      return Promise.reject(error);
+    }
+  );
+}